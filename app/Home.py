@@ -19,12 +19,16 @@ st.markdown(
     2. average intensity values 
     3. kinetic properties of response values 
 
+    Analyses run in the background, so other pages can be used meanwhile.
+
     ---
 
     ### *Plot One Imaging Session Data*
 
     Loads the avg intensity values from one imaging session and generates
-    time series plots for all odors and all samples imaged.
+    time series plots for all odors and all samples imaged. Long sessions
+    can be plotted with fast WebGL rendering, downsampled to the plot width.
+    All plots can be exported to one HTML report.
 
     ---
 
@@ -32,7 +36,12 @@ st.markdown(
 
     Plots the response properties for all odors with significant responses
     from the uploaded imaging sessions. All samples imaged are shown as 
-    individual points grouped by animal ID.
+    individual points grouped by animal ID. Sessions can be added to a
+    dataset compiled earlier in the same folder without re-uploading it.
+    Large datasets are shown as summary boxes per session instead. All
+    plots can be exported to one HTML report. Datasets are compiled in the
+    background, and a compilation still running after a refresh is shown
+    again by loading the same folder.
 
     ---
 
@@ -40,6 +49,34 @@ st.markdown(
 
     Plots the response properties for all odors with significant responses
     from one animal across multiple imaging sessions (time on x-axis). Mean
-    values over time are shown by connected lines or individual dots.
+    values over time are shown by connected lines or individual dots. New
+    sessions can be added to a dataset compiled earlier in the same folder.
+    All plots can be exported to one HTML report. Datasets are compiled in
+    the background, and a compilation still running after a refresh is
+    shown again by loading the same folder.
+
+    ---
+
+    ### *Plot Population PCA*
+
+    Loads the avg intensity values from one imaging session and plots the
+    population response to each odor as a trajectory in principal component
+    space.
+
+    ---
+
+    ### *Plot Sample Correlations*
+
+    Loads the signal and noise correlations saved by *Load and Analyze txt
+    Files* and displays them as sample × sample heatmaps.
+
+    ---
+
+    ### *Query Catalog*
+
+    Searches the responses of all sessions in the roi_catalog.sqlite catalog,
+    e.g. all samples from one animal responding to an odor with a latency
+    under 1 s. Sessions are added when analyzed or from uploaded
+    _analysis.xlsx files.
     """
 )
@@ -0,0 +1,3 @@
+"""Contains benchmarks of the app, run from the app folder, e.g.
+python -m benchmarks.import_time.
+"""
@@ -0,0 +1,226 @@
+"""Contains the import-time benchmark, which measures how long each page and
+src module takes to import in a fresh Python process, and which packages the
+time is spent in.
+
+Run from the app folder:
+
+    python -m benchmarks.import_time [targets ...] [--repeat 3] [--top 5]
+        [--json results.json]
+
+Targets are module names (e.g. src.processing) or page paths (e.g.
+pages/1_Load_and_Analyze_txt_Files.py); all pages and src modules are
+measured by default. Pages are imported without running their main().
+"""
+
+import argparse
+import json
+import platform
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+# a line of python -X importtime output, e.g.
+# "import time:       350 |     102984 |       streamlit.cursor"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def get_targets() -> list:
+    """Gets the pages and src modules of the app.
+
+    Returns:
+        The page paths, relative to the app folder, followed by the src module
+            names.
+    """
+
+    pages = [
+        str(path.relative_to(APP_DIR))
+        for path in sorted(Path(APP_DIR, "pages").glob("*.py"))
+        if path.name != "__init__.py"
+    ]
+    modules = [
+        f"src.{path.stem}"
+        for path in sorted(Path(APP_DIR, "src").glob("*.py"))
+        if path.name != "__init__.py"
+    ]
+
+    return pages + modules
+
+
+def parse_importtime(output: str) -> list:
+    """Parses the output of python -X importtime.
+
+    Args:
+        output: The stderr of the Python process.
+
+    Returns:
+        A list of (module, self time, cumulative time, depth) tuples, with
+            times in microseconds, in import order.
+    """
+
+    imports = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append(
+                (
+                    module,
+                    int(self_us),
+                    int(cumulative_us),
+                    (len(indent) - 1) // 2,
+                )
+            )
+
+    return imports
+
+
+def run_importtime(code: str) -> list:
+    """Runs Python code in a fresh process with import timing turned on.
+
+    Args:
+        code: The code to run.
+
+    Returns:
+        The imports parsed by parse_importtime().
+    """
+
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    return parse_importtime(completed.stderr)
+
+
+def get_import_code(target: str) -> str:
+    """Gets the code importing a page or module.
+
+    Args:
+        target: A module name or a page path.
+
+    Returns:
+        The code to run.
+    """
+
+    if target.endswith(".py"):
+        return f"import runpy; runpy.run_path({target!r}, run_name='bench')"
+
+    return f"import {target}"
+
+
+def time_import(target: str, startup_modules: set, repeat: int = 3) -> dict:
+    """Measures the import time of a page or module, keeping the fastest of
+    several runs.
+
+    Args:
+        target: A module name or a page path.
+        startup_modules: The modules imported when Python starts, which are
+            left out.
+        repeat: The number of runs.
+
+    Returns:
+        A dict with the target, its total import time in ms, and the self
+            time in ms of each package and module it imports, slowest first.
+    """
+
+    best = None
+    for _ in range(repeat):
+        imports = [
+            x
+            for x in run_importtime(get_import_code(target))
+            if x[0] not in startup_modules
+        ]
+        total_us = sum(x[1] for x in imports)
+        if best is None or total_us < best[0]:
+            best = (total_us, imports)
+
+    total_us, imports = best
+    packages = defaultdict(int)
+    for module, self_us, _, _ in imports:
+        packages[module.split(".")[0]] += self_us
+
+    return {
+        "target": target,
+        "total_ms": round(total_us / 1000, 1),
+        "packages": {
+            package: round(self_us / 1000, 1)
+            for package, self_us in sorted(
+                packages.items(), key=lambda x: x[1], reverse=True
+            )
+        },
+        "modules": {
+            module: round(self_us / 1000, 1)
+            for module, self_us, _, _ in sorted(
+                imports, key=lambda x: x[1], reverse=True
+            )
+        },
+    }
+
+
+def print_results(results: list, top: int):
+    """Prints the total import time and slowest packages of each target.
+
+    Args:
+        results: The dicts made by time_import().
+        top: The number of packages shown per target.
+    """
+
+    width = max(len(x["target"]) for x in results)
+    for result in results:
+        slowest = ", ".join(
+            f"{package} {ms:.0f}"
+            for package, ms in list(result["packages"].items())[:top]
+        )
+        print(f"{result['target']:<{width}}  {result['total_ms']:>7.0f} ms")
+        print(f"{'':<{width}}  slowest (ms): {slowest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measures the import time of the app's pages and "
+        "modules."
+    )
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help="Module names or page paths. Defaults to every page and src "
+        "module.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs per target (default 3)."
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=5,
+        help="Slowest packages shown per target (default 5).",
+    )
+    parser.add_argument("--json", help="Path of a .json file to save to.")
+    args = parser.parse_args()
+
+    startup_modules = {x[0] for x in run_importtime("pass")}
+    results = [
+        time_import(target, startup_modules, args.repeat)
+        for target in args.targets or get_targets()
+    ]
+    print_results(results, args.top)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"python": platform.python_version(), "results": results},
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
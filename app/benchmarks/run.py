@@ -0,0 +1,527 @@
+"""Contains the end-to-end benchmark suite, which times each stage of the
+app's pipeline on synthetic data and measures its peak memory, so that
+results can be compared across commits.
+
+Run from the app folder:
+
+    python -m benchmarks.run [--preset small|medium|large] [--only names]
+        [--repeat 3] [--json results.json] [--compare old.json]
+
+The synthetic data is made by benchmarks.synthetic in a temporary folder.
+Each benchmark's setup is run before every repeat and isn't timed. The
+parse and shared caches are turned off, so every run does the full work.
+Peak memory is measured with tracemalloc in a separate run, and doesn't
+include the worker processes reading .xlsx files.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# turns the caches off before the src modules read the environment
+os.environ["ROI_APP_CACHE_MB"] = "0"
+os.environ["ROI_APP_SHARED_CACHE_MB"] = "0"
+
+from benchmarks.synthetic import (
+    SyntheticUpload,
+    make_analysis_set,
+    make_session_folder,
+)
+from src.experiment import RawFolder
+from src.jobs import Job
+from src.processing import (
+    import_all_excel_data,
+    make_odor_measure_fig,
+    set_up_plots,
+    sort_measurements_df,
+)
+from src.utils import flatten
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+MEASURES = [
+    "Baseline",
+    "Blank-subtracted DeltaF/F(%)",
+    "Blank sub AUC",
+    "Latency (s)",
+    "Time to peak (s)",
+]
+
+# excel_export rewrites each .xlsx file once per sample, as the app does, so
+# its run time grows with the square of the number of samples
+PRESETS = {
+    "small": {
+        "sessions": 4,
+        "samples": 6,
+        "odors": 8,
+        "reps": 2,
+        "frames": 330,
+    },
+    "medium": {
+        "sessions": 8,
+        "samples": 20,
+        "odors": 8,
+        "reps": 3,
+        "frames": 330,
+    },
+    "large": {
+        "sessions": 24,
+        "samples": 60,
+        "odors": 8,
+        "reps": 4,
+        "frames": 660,
+    },
+}
+
+
+class BenchData(object):
+    """The synthetic data the benchmarks run on.
+
+    Attributes:
+        root (Path): The temporary folder holding the data.
+        params (dict): The numbers of sessions, samples, odors, trials per
+            odor and frames.
+        session_folder (Path): The raw imaging session folder.
+        analysis_files (dict): The _analysis.xlsx paths of the acute and
+            chronic datasets.
+    """
+
+    def __init__(self, root: str, params: dict, seed: int = 0):
+        """Initializes an instance of BenchData(), writing the synthetic
+        data.
+
+        Args:
+            root: The folder to write the data in.
+            params: The numbers of sessions, samples, odors, trials per odor
+                and frames.
+            seed: The seed of the random number generator.
+        """
+
+        self.root = Path(root)
+        self.params = params
+        self.session_folder = make_session_folder(
+            Path(root, "raw"),
+            n_samples=params["samples"],
+            n_odors=params["odors"],
+            n_reps=params["reps"],
+            n_frames=params["frames"],
+            seed=seed,
+        )
+        self.analysis_files = {
+            dataset_type: make_analysis_set(
+                Path(root, dataset_type),
+                dataset_type,
+                params["sessions"],
+                params["samples"],
+                params["odors"],
+                params["frames"],
+                seed,
+            )
+            for dataset_type in ["acute", "chronic"]
+        }
+
+    def make_raw_folder(self, folder: str = None) -> RawFolder:
+        """Makes a RawFolder for the session folder and reads its solenoid
+        order.
+
+        Args:
+            folder: A copy of the session folder to use instead.
+
+        Returns:
+            The RawFolder.
+        """
+
+        data = RawFolder(
+            str(folder or self.session_folder),
+            "220101",
+            "123456-7-8",
+            "ROI1",
+            "Cell",
+            False,
+        )
+        data.get_solenoid_order()
+
+        return data
+
+    def ingest(self, folder: str = None) -> RawFolder:
+        """Makes a RawFolder and reads all its .txt files.
+
+        Args:
+            folder: A copy of the session folder to use instead.
+
+        Returns:
+            The RawFolder, with all_data_df filled in.
+        """
+
+        data = self.make_raw_folder(folder)
+        data.organize_all_data_df(
+            data.iterate_txt_files(data.get_txt_file_paths())
+        )
+
+        return data
+
+    def copy_session_folder(self) -> Path:
+        """Copies the session folder, so that files can be written to it
+        without changing the original.
+
+        Returns:
+            The path of the copy.
+        """
+
+        copy_path = Path(self.root, "export", self.session_folder.name)
+        shutil.rmtree(copy_path.parent, ignore_errors=True)
+        shutil.copytree(self.session_folder, copy_path)
+
+        return copy_path
+
+    def get_uploads(self, dataset_type: str) -> list:
+        """Opens the _analysis.xlsx files of a dataset as uploaded files.
+
+        Args:
+            dataset_type: Chronic or acute experiment type.
+
+        Returns:
+            A list of SyntheticUploads.
+        """
+
+        return [SyntheticUpload(x) for x in self.analysis_files[dataset_type]]
+
+    def compile(self, dataset_type: str) -> list:
+        """Compiles a dataset.
+
+        Args:
+            dataset_type: Chronic or acute experiment type.
+
+        Returns:
+            The dict_list made by import_all_excel_data().
+        """
+
+        dict_list, _, _ = import_all_excel_data(
+            dataset_type,
+            self.get_uploads(dataset_type),
+            measures=MEASURES,
+            job=Job(0, "benchmark", dataset_type, ()),
+        )
+
+        return dict_list
+
+
+def bench_ingestion(data: BenchData):
+    """Reading the .txt files of a session."""
+
+    return lambda: data.ingest()
+
+
+def bench_analyze_signal(data: BenchData):
+    """RawFolder.analyze_signal() for every sample of a session."""
+
+    raw_folder = data.ingest()
+    avg_means_list = [
+        raw_folder.collect_per_sample(raw_folder.all_data_df, sample)[1]
+        for sample in raw_folder.n_column_labels
+    ]
+
+    def run():
+        for avg_means in avg_means_list:
+            raw_folder.analyze_signal(avg_means)
+
+    return run
+
+
+def bench_excel_export(data: BenchData):
+    """Analyzing every sample of a session and writing its three .xlsx
+    files, as Load and Analyze txt Files does."""
+
+    raw_folder = data.ingest(data.copy_session_folder())
+
+    def run():
+        for n_count in range(raw_folder.total_n):
+            raw_folder.process_txt_data(n_count, raw_folder.sample_type)
+
+    return run
+
+
+def bench_import(dataset_type: str):
+    """Makes the benchmark of compiling a dataset.
+
+    Args:
+        dataset_type: Chronic or acute experiment type.
+
+    Returns:
+        The benchmark function.
+    """
+
+    def bench(data: BenchData):
+        files = data.get_uploads(dataset_type)
+
+        return lambda: import_all_excel_data(
+            dataset_type,
+            files,
+            measures=MEASURES,
+            job=Job(0, "benchmark", dataset_type, ()),
+        )
+
+    bench.__doc__ = f"import_all_excel_data() of the {dataset_type} dataset."
+
+    return bench
+
+
+def bench_sort_measurements(dataset_type: str):
+    """Makes the benchmark of saving a compiled dataset's summary .xlsx file.
+
+    Args:
+        dataset_type: Chronic or acute experiment type.
+
+    Returns:
+        The benchmark function.
+    """
+
+    def bench(data: BenchData):
+        dataset = data.compile(dataset_type)[2]
+        out_path = Path(data.root, "summary")
+        out_path.mkdir(exist_ok=True)
+
+        return lambda: sort_measurements_df(
+            out_path,
+            f"{dataset_type}_summary.xlsx",
+            dataset,
+            MEASURES,
+            animal_id="100000-1-1" if dataset_type == "chronic" else None,
+        )
+
+    bench.__doc__ = f"sort_measurements_df() of the {dataset_type} dataset."
+
+    return bench
+
+
+def bench_measure_plots(dataset_type: str):
+    """Makes the benchmark of making every odor and measurement plot of a
+    compiled dataset.
+
+    Args:
+        dataset_type: Chronic or acute experiment type.
+
+    Returns:
+        The benchmark function.
+    """
+
+    def bench(data: BenchData):
+        dict_list = data.compile(dataset_type)
+        sig_odors = sorted(set(flatten(dict_list[1])))
+        if dataset_type == "chronic":
+            plot_params = set_up_plots(
+                dict_list[0], dataset_type, dict_list[2], dict_list[3], "Day"
+            )
+        else:
+            plot_params = set_up_plots(
+                dict_list[0], dataset_type, dict_list[2]
+            )
+
+        def run():
+            for odor in sig_odors:
+                for measure in MEASURES[1:]:
+                    make_odor_measure_fig(odor, measure, **plot_params)
+
+        return run
+
+    bench.__doc__ = (
+        f"make_odor_measure_fig() for every odor and plotted measurement of "
+        f"the {dataset_type} dataset."
+    )
+
+    return bench
+
+
+def bench_avg_amps_plots(data: BenchData):
+    """plot_avg_amps() for every sample of a session, as Plot One Imaging
+    Session Data does."""
+
+    from src.plotting import plot_avg_amps
+
+    raw_folder = data.ingest()
+    avg_means_dfs = [
+        raw_folder.collect_per_sample(raw_folder.all_data_df, sample)[1]
+        .reset_index()
+        .rename_axis(columns=None)
+        for sample in raw_folder.n_column_labels
+    ]
+    odors = [x for x in avg_means_dfs[0].columns if x != "Frame"]
+
+    def run():
+        for avg_means_df in avg_means_dfs:
+            plot_avg_amps(avg_means_df, odors)
+
+    return run
+
+
+BENCHMARKS = {
+    "ingestion": bench_ingestion,
+    "analyze_signal": bench_analyze_signal,
+    "excel_export": bench_excel_export,
+    "import_acute": bench_import("acute"),
+    "import_chronic": bench_import("chronic"),
+    "sort_acute": bench_sort_measurements("acute"),
+    "sort_chronic": bench_sort_measurements("chronic"),
+    "plots_acute": bench_measure_plots("acute"),
+    "plots_chronic": bench_measure_plots("chronic"),
+    "plots_avg_amps": bench_avg_amps_plots,
+}
+
+
+def run_benchmark(bench, data: BenchData, repeat: int = 3) -> dict:
+    """Times a benchmark, then measures its peak memory in one more run.
+
+    Args:
+        bench: The benchmark function, which does the untimed setup and
+            returns the function to time.
+        data: The synthetic data.
+        repeat: The number of timed runs.
+
+    Returns:
+        A dict with the fastest and mean run time in s, and the peak memory
+            allocated in MB.
+    """
+
+    times = []
+    for _ in range(repeat):
+        run = bench(data)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    run = bench(data)
+    tracemalloc.start()
+    run()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "min_s": round(min(times), 4),
+        "mean_s": round(sum(times) / len(times), 4),
+        "peak_mb": round(peak_bytes / 1024**2, 2),
+    }
+
+
+def get_git_commit() -> str | None:
+    """Gets the commit the app is at, if it's in a git repository.
+
+    Returns:
+        The short commit hash, or None.
+    """
+
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=APP_DIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+
+    return completed.stdout.strip() or None
+
+
+def print_results(results: dict, old_results: dict = None):
+    """Prints the results of each benchmark, with the change from earlier
+    results if given.
+
+    Args:
+        results: The dicts made by run_benchmark(), by benchmark name.
+        old_results: Earlier results to compare to, in the same format.
+    """
+
+    width = max(len(name) for name in results)
+    print(f"{'':<{width}}  {'min (s)':>9}  {'mean (s)':>9}  {'peak (MB)':>9}")
+    for name, result in results.items():
+        line = (
+            f"{name:<{width}}  {result['min_s']:>9.3f}  "
+            f"{result['mean_s']:>9.3f}  {result['peak_mb']:>9.1f}"
+        )
+        old_result = (old_results or {}).get(name)
+        if old_result:
+            line += (
+                f"  time {result['min_s'] / old_result['min_s'] - 1:+.0%}, "
+                f"memory {result['peak_mb'] / old_result['peak_mb'] - 1:+.0%}"
+            )
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times each stage of the app's pipeline on synthetic "
+        "data."
+    )
+    parser.add_argument(
+        "--preset",
+        choices=list(PRESETS),
+        default="small",
+        help="The size of the synthetic data (default small).",
+    )
+    for param in PRESETS["small"]:
+        parser.add_argument(
+            f"--{param}", type=int, help=f"Overrides the preset's {param}."
+        )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        help="The benchmarks to run. Runs all by default.",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs (default 3)."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Path of a .json file to save to.")
+    parser.add_argument(
+        "--compare", help="Path of a .json file of earlier results."
+    )
+    args = parser.parse_args()
+
+    params = {
+        param: getattr(args, param)
+        if getattr(args, param) is not None
+        else value
+        for param, value in PRESETS[args.preset].items()
+    }
+    old_results = None
+    if args.compare:
+        with open(args.compare) as f:
+            old_results = json.load(f)["results"]
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="roi_bench_") as root:
+        print(f"Making synthetic data: {params}")
+        data = BenchData(root, params, args.seed)
+        for name in args.only or BENCHMARKS:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = run_benchmark(BENCHMARKS[name], data, args.repeat)
+
+    print_results(results, old_results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "commit": get_git_commit(),
+                    "params": params,
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                f,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
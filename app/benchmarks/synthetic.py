@@ -0,0 +1,312 @@
+"""Contains the synthetic data generator for the benchmarks, which writes
+Fiji-style imaging session folders and sets of _analysis.xlsx files with
+known odor responses, so that benchmarks don't need real data.
+
+Run from the app folder to only generate data:
+
+    python -m benchmarks.synthetic <folder> [--sessions 4] [--samples 20]
+        [--odors 8] [--reps 3] [--frames 330]
+"""
+
+import argparse
+import io
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.acquisition import DEFAULT_FRAME_PERIOD, DEFAULT_ONSET_FRAME
+from src.experiment import RawFolder
+
+# the odors that evoke responses, and the fraction of samples responding
+RESPONSE_ODORS = (1, 3, 4)
+RESPONSE_FRACTION = 0.5
+
+BASELINE = 100.0
+NOISE_SD = 1.0
+RESPONSE_AMPLITUDE = 30.0
+# frames from odor onset to response onset, and response decay constant
+RESPONSE_DELAY = 12
+RESPONSE_TAU = 30.0
+
+
+class SyntheticUpload(io.BytesIO):
+    """An in-memory file with a name, standing in for a file uploaded to
+    Streamlit.
+
+    Attributes:
+        name (str): The file name.
+    """
+
+    def __init__(self, path: str):
+        """Initializes an instance of SyntheticUpload() from a file on disk.
+
+        Args:
+            path: The path of the file.
+        """
+
+        super().__init__(Path(path).read_bytes())
+        self.name = Path(path).name
+
+
+def make_response(n_frames: int, onset_frame: int) -> np.ndarray:
+    """Makes the shape of an odor response: a step at response onset that
+    decays exponentially.
+
+    Args:
+        n_frames: The number of frames per trial.
+        onset_frame: The odor onset frame.
+
+    Returns:
+        An array of n_frames values, peaking at 1.
+    """
+
+    response = np.zeros(n_frames)
+    start = min(onset_frame + RESPONSE_DELAY, n_frames)
+    response[start:] = np.exp(-np.arange(n_frames - start) / RESPONSE_TAU)
+
+    return response
+
+
+def get_responders(
+    n_samples: int, n_odors: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Picks the samples that respond to each odor.
+
+    Args:
+        n_samples: The number of samples.
+        n_odors: The number of odors.
+        rng: The random number generator.
+
+    Returns:
+        A boolean (odors, samples) array.
+    """
+
+    responders = np.zeros((n_odors, n_samples), dtype=bool)
+    for odor in RESPONSE_ODORS:
+        if odor <= n_odors:
+            responders[odor - 1] = rng.random(n_samples) < RESPONSE_FRACTION
+
+    return responders
+
+
+def make_session_folder(
+    root: str,
+    session_date: str = "220101",
+    animal_id: str = "123456-7-8",
+    roi: str = "ROI1",
+    n_samples: int = 20,
+    n_odors: int = 8,
+    n_reps: int = 3,
+    n_frames: int = 330,
+    seed: int = 0,
+) -> Path:
+    """Writes a Fiji-style imaging session folder: one .txt file per trial
+    with one Mean column per sample, and a solenoid_order.csv file giving
+    the odor of each trial in random order.
+
+    Args:
+        root: The folder to write the session folder in.
+        session_date: The session date, as YYMMDD.
+        animal_id: The animal ID.
+        roi: The ROI name.
+        n_samples: The number of samples (Mean columns).
+        n_odors: The number of odors.
+        n_reps: The number of trials per odor.
+        n_frames: The number of frames per trial.
+        seed: The seed of the random number generator.
+
+    Returns:
+        The path of the session folder.
+    """
+
+    rng = np.random.default_rng(seed)
+    folder = Path(root, f"{session_date}--{animal_id}_{roi}")
+    folder.mkdir(parents=True, exist_ok=True)
+
+    odor_order = np.tile(np.arange(1, n_odors + 1), n_reps)
+    rng.shuffle(odor_order)
+    pd.DataFrame(
+        {"Odor": odor_order, "Trial": np.arange(1, len(odor_order) + 1)}
+    ).to_csv(
+        Path(folder, f"{session_date}_{animal_id}_{roi}_solenoid_order.csv"),
+        index=False,
+    )
+
+    responders = get_responders(n_samples, n_odors, rng)
+    response = make_response(n_frames, DEFAULT_ONSET_FRAME)
+    columns = [f"Mean{x}" for x in range(1, n_samples + 1)]
+
+    for trial_ct, odor in enumerate(odor_order):
+        traces = rng.normal(BASELINE, NOISE_SD, (n_frames, n_samples))
+        traces += (
+            RESPONSE_AMPLITUDE
+            * response[:, None]
+            * responders[odor - 1][None, :]
+        )
+        pd.DataFrame(
+            traces, columns=columns, index=np.arange(1, n_frames + 1)
+        ).to_csv(
+            Path(folder, f"{folder.name}_{trial_ct:03d}.txt"), sep="\t"
+        )
+
+    return folder
+
+
+def make_analysis_file(
+    root: str,
+    session_date: str,
+    animal_id: str,
+    roi: str,
+    n_samples: int = 20,
+    n_odors: int = 8,
+    n_frames: int = 330,
+    seed: int = 0,
+) -> Path:
+    """Writes an _analysis.xlsx file as made by Load and Analyze txt Files,
+    by analyzing synthetic average traces of each sample with
+    RawFolder.analyze_signal().
+
+    Args:
+        root: The folder to write the file in.
+        session_date: The session date, as YYMMDD.
+        animal_id: The animal ID.
+        roi: The ROI name.
+        n_samples: The number of samples (sheets).
+        n_odors: The number of odors.
+        n_frames: The number of frames per trace.
+        seed: The seed of the random number generator.
+
+    Returns:
+        The path of the file.
+    """
+
+    rng = np.random.default_rng(seed)
+    data = RawFolder(root, session_date, animal_id, roi, "Cell", False)
+    data.frame_period = DEFAULT_FRAME_PERIOD
+    data.onset_frame = DEFAULT_ONSET_FRAME
+
+    responders = get_responders(n_samples, n_odors, rng)
+    response = make_response(n_frames, DEFAULT_ONSET_FRAME)
+    # averaging over trials reduces the noise
+    traces = rng.normal(
+        BASELINE, NOISE_SD / np.sqrt(3), (n_samples, n_frames, n_odors)
+    )
+    traces += (
+        RESPONSE_AMPLITUDE
+        * rng.uniform(0.5, 1.5, (n_samples, 1, n_odors))
+        * response[None, :, None]
+        * responders.T[:, None, :]
+    )
+
+    xlsx_path = Path(root, f"{session_date}_{animal_id}_{roi}_analysis.xlsx")
+    with pd.ExcelWriter(xlsx_path) as writer:
+        for sample_ct in range(n_samples):
+            avg_means = pd.DataFrame(
+                traces[sample_ct],
+                index=pd.Index(np.arange(1, n_frames + 1), name="Frame"),
+                columns=pd.Index(np.arange(1, n_odors + 1), name="Odor"),
+            )
+            data.analyze_signal(avg_means).to_excel(
+                writer, f"Cell {sample_ct + 1}"
+            )
+
+    return xlsx_path
+
+
+def make_analysis_set(
+    root: str,
+    dataset_type: str,
+    n_sessions: int = 4,
+    n_samples: int = 20,
+    n_odors: int = 8,
+    n_frames: int = 330,
+    seed: int = 0,
+) -> list:
+    """Writes the _analysis.xlsx files of an acute or chronic dataset.
+
+    Acute sessions are from different animals, with two ROIs each. Chronic
+    sessions are from one animal and ROI, imaged once a week.
+
+    Args:
+        root: The folder to write the files in.
+        dataset_type: Chronic or acute experiment type.
+        n_sessions: The number of sessions.
+        n_samples: The number of samples per session.
+        n_odors: The number of odors.
+        n_frames: The number of frames per trace.
+        seed: The seed of the random number generator.
+
+    Returns:
+        The paths of the files, in session order.
+    """
+
+    Path(root).mkdir(parents=True, exist_ok=True)
+    first_date = date(2022, 1, 1)
+
+    paths = []
+    for session_ct in range(n_sessions):
+        if dataset_type == "chronic":
+            session_date = first_date + timedelta(weeks=session_ct)
+            animal_id, roi = "100000-1-1", "ROI1"
+        else:
+            session_date = first_date
+            animal_id = f"{100000 + session_ct // 2}-1-1"
+            roi = f"ROI{session_ct % 2 + 1}"
+
+        paths.append(
+            make_analysis_file(
+                root,
+                session_date.strftime("%y%m%d"),
+                animal_id,
+                roi,
+                n_samples,
+                n_odors,
+                n_frames,
+                seed + session_ct,
+            )
+        )
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Writes a synthetic imaging session folder and acute "
+        "and chronic sets of _analysis.xlsx files."
+    )
+    parser.add_argument("folder", help="The folder to write the data in.")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--odors", type=int, default=8)
+    parser.add_argument("--reps", type=int, default=3)
+    parser.add_argument("--frames", type=int, default=330)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    folder = make_session_folder(
+        args.folder,
+        n_samples=args.samples,
+        n_odors=args.odors,
+        n_reps=args.reps,
+        n_frames=args.frames,
+        seed=args.seed,
+    )
+    print(f"Session folder: {folder}")
+
+    for dataset_type in ["acute", "chronic"]:
+        paths = make_analysis_set(
+            Path(args.folder, dataset_type),
+            dataset_type,
+            args.sessions,
+            args.samples,
+            args.odors,
+            args.frames,
+            args.seed,
+        )
+        print(f"{len(paths)} {dataset_type} files: {paths[0].parent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,15 @@ Analysis will generate three .xlsx files:
         odor
     _raw_means.xlsx, containing the raw fluorescence intensity values for all 
         trials for each odor
+
+The sample information (including the grid geometry for Grid samples) is saved
+as _session_info.json. Optionally, sample × sample signal and noise
+correlations are saved as _correlations.npz.
 """
 
 import streamlit as st
 import os
-from stqdm import stqdm
+from pathlib import Path
 
 from src.utils import (
     make_pick_folder_button,
@@ -25,6 +29,8 @@ from src.utils import (
 )
 
 from src.experiment import RawFolder
+from src.acquisition import DEFAULT_FRAME_PERIOD, DEFAULT_ONSET_FRAME
+from src.jobs import Job, submit_job, show_jobs, poll_jobs
 
 import pdb
 
@@ -49,6 +55,17 @@ def initialize_states():
         st.session_state.run_type = False
     if "drop_trial" not in st.session_state:
         st.session_state.drop_trial = False
+    if "grid_cols" not in st.session_state:
+        st.session_state.grid_cols = None
+    # common time base (frame period, onset frame) to resample traces to
+    if "resample_to" not in st.session_state:
+        st.session_state.resample_to = None
+    if "correlations" not in st.session_state:
+        st.session_state.correlations = False
+    if "corr_float32" not in st.session_state:
+        st.session_state.corr_float32 = False
+    if "add_to_catalog" not in st.session_state:
+        st.session_state.add_to_catalog = False
 
 
 def prompt_dir():
@@ -111,7 +128,36 @@ def choose_run_type() -> str:
     return choice_type
 
 
+def choose_resampling() -> tuple | None:
+    """Asks user whether to resample traces to a common time base so that
+    sessions from rigs with different frame rates can be pooled.
+
+    Returns:
+        The (frame period, onset frame) of the common time base, or None if
+        not resampling.
+    """
+
+    if not st.checkbox(
+        "Resample traces to a common time base (for pooling data across "
+        "rigs with different frame rates)"
+    ):
+        return None
+
+    target_period = st.number_input(
+        "Common frame period (s)",
+        min_value=0.001,
+        value=DEFAULT_FRAME_PERIOD,
+        format="%.4f",
+    )
+    target_onset_frame = st.number_input(
+        "Common odor onset frame", min_value=1, value=DEFAULT_ONSET_FRAME
+    )
+
+    return target_period, int(target_onset_frame)
+
+
 def run_analysis(
+    job: Job,
     folder_path: str,
     date: str,
     animal: str,
@@ -119,10 +165,16 @@ def run_analysis(
     sample_type: str,
     run_type: str,
     drop_trial: bool,
+    correlations: bool = False,
+    corr_float32: bool = False,
+    grid_cols: int = None,
+    resample_to: tuple = None,
+    add_to_catalog: bool = False,
 ):
-    """Runs the analysis for one imaging session.
+    """Runs the analysis for one imaging session, as a background job.
 
     Args:
+        job: The background job, for reporting progress.
         folder_path: Path to the folder to run the analysis for.
         date: Date of the experiment (YYYYMMDD).
         animal: Name of the animal being analysed.
@@ -130,88 +182,115 @@ def run_analysis(
         sample_type: Type of sample being analysed.
         run_type: Type of analysis to run.
         drop_trial: Whether to drop trials.
+        correlations: Whether to calculate signal and noise correlations.
+        corr_float32: Whether to calculate correlations in float32.
+        grid_cols: For Grid samples, the number of tiles per row.
+        resample_to: The (frame period, onset frame) of the common time base
+            to resample traces to, if resampling.
+        add_to_catalog: Whether to add the results to the session catalog in
+            the parent folder.
     """
 
-    data = RawFolder(folder_path, date, animal, ROI, sample_type, drop_trial)
+    data = RawFolder(
+        folder_path, date, animal, ROI, sample_type, drop_trial, grid_cols
+    )
     # data.get_solenoid_order()  # gets odor order from solenoid txt file
 
-    with st.status("Analyzing data...", expanded=True) as status:
-        try:
-            data.get_solenoid_order()
-        except Exception as error_msg:
-            st.error(
-                f"{error_msg}: Check that the contents of the "
-                "solenoid order file look correct and that the correct number "
-                "of raw .txt files are present in the directory."
-            )
-            status.update(
-                label=f"Error: {error_msg}",
-                state="error",
-                expanded=True,
-            )
-            st.stop()
-        if run_type == "solenoid":
-            data.save_solenoid_info()  # saves solenoid order to csv
-            status.update(
-                label="Solenoid info exported to csv.",
-                state="complete",
-                expanded=False,
-            )
-
-        elif run_type == "analysis":
-            # display error message if no txt files present
-            data_files = [
-                x
-                for x in os.listdir(data.session_path)
-                if "solenoid" not in x and ".txt" in x
-            ]
-            if len(data_files) == 0:
-                status.update(
-                    label="Please make sure the Ca imaging txt files are present in "
-                    "the selected directory.",
-                    state="error",
-                    expanded=False,
-                )
-            else:
-                data.rename_txt(
-                    status
-                )  # adds _000.txt to end of first trial file
-                file_paths = data.get_txt_file_paths()
-                try:
-                    data_df = data.iterate_txt_files(file_paths)
-                except Exception as error_msg:
-                    st.error(
-                        f"{error_msg}: Check that the contents of the "
-                        "solenoid order file look correct and that the correct number "
-                        "of raw .txt files are present in the directory."
-                    )
-                    status.update(
-                        label=f"Error: {error_msg}",
-                        state="error",
-                        expanded=True,
-                    )
-                    st.stop()
-                data.organize_all_data_df(data_df)
-
-                # Drop trials from the data set.
-                if drop_trial:
-                    data.drop_trials()
-
-                # sort all data by neuron/glomerulus
-                # adds progress bar
-                bar = stqdm(
-                    range(data.total_n),
-                    desc=f"Analyzing {sample_type}",
-                )
-                for n_count in bar:
-                    bar_text = data.process_txt_data(n_count, sample_type)
-                    bar.set_description(bar_text, refresh=True)
-
-                status.update(
-                    label="Analysis finished.",
-                    state="complete",
-                    expanded=False,
-                )
+    job.set_stage("Reading solenoid order...")
+    try:
+        data.get_solenoid_order()
+    except Exception as error_msg:
+        raise ValueError(
+            f"{error_msg}: Check that the contents of the "
+            "solenoid order file look correct and that the correct number "
+            "of raw .txt files are present in the directory."
+        ) from error_msg
+    if run_type == "solenoid":
+        data.save_solenoid_info()  # saves solenoid order to csv
+        job.set_stage("Solenoid info exported to csv.")
+
+        return
+
+    # display error message if no txt files present
+    data_files = [
+        x
+        for x in os.listdir(data.session_path)
+        if "solenoid" not in x and ".txt" in x
+    ]
+    if len(data_files) == 0:
+        raise FileNotFoundError(
+            "Please make sure the Ca imaging txt files are present in the "
+            "selected directory."
+        )
+
+    # adds _000.txt to end of first trial file
+    data.rename_txt(None, log=job.set_stage)
+    file_paths = data.get_txt_file_paths()
+    job.set_stage("Reading .txt files...")
+    try:
+        data_df = data.iterate_txt_files(file_paths)
+    except Exception as error_msg:
+        raise ValueError(
+            f"{error_msg}: Check that the contents of the "
+            "solenoid order file look correct and that the correct number "
+            "of raw .txt files are present in the directory."
+        ) from error_msg
+    data.organize_all_data_df(data_df)
+
+    # Drop trials from the data set.
+    if drop_trial:
+        data.drop_trials()
+
+    if resample_to:
+        job.set_stage(
+            f"Resampling traces from {data.frame_period} s to "
+            f"{resample_to[0]} s frame period..."
+        )
+        data.resample_all_data(*resample_to)
+
+    # sort all data by neuron/glomerulus
+    job.set_stage(f"Analyzing {sample_type}", data.total_n)
+    for n_count in range(data.total_n):
+        data.process_txt_data(n_count, sample_type)
+        job.update(1)
+
+    if correlations:
+        job.set_stage("Calculating signal and noise correlations...")
+        data.save_correlations(corr_float32)
+
+    job.set_stage("Saving results...")
+    data.save_session_info()
+    data.save_sidecars()
+
+    if add_to_catalog:
+        job.set_stage("Adding session to the catalog...")
+        data.add_to_catalog(Path(data.session_path).parent)
+
+    job.set_stage("Analysis finished.")
+
+
+def start_analysis(folder_path: str, *args):
+    """Starts the analysis of one imaging session in a background job, unless
+    the folder is already being analyzed.
+
+    Args:
+        folder_path: Path to the folder to run the analysis for.
+        args: The other arguments of run_analysis().
+    """
+
+    job, is_new = submit_job(
+        Path(folder_path).name,
+        "analysis",
+        ("analysis", folder_path),
+        run_analysis,
+        folder_path,
+        *args,
+    )
+    if not is_new:
+        st.info(
+            "This folder is already being analyzed. Its progress is shown "
+            "below."
+        )
 
 
 def main():
@@ -239,18 +318,39 @@ def main():
 
                 if st.session_state.run_type == "analysis":
                     st.session_state.sample_type = choose_sample_type()
+                    if st.session_state.sample_type == "Grid":
+                        st.session_state.grid_cols = st.number_input(
+                            "Number of grid tiles per row (leave at 0 to "
+                            "infer a square grid)",
+                            min_value=0,
+                            value=0,
+                        )
                     if st.checkbox("Exclude specific trials from analysis"):
                         st.session_state.drop_trial = st.text_input(
                             "Enter trial number to drop, separated by comma if "
                             "there are multiple, e.g. 1,2,5,6"
                         )
+                    st.session_state.resample_to = choose_resampling()
+                    st.session_state.correlations = st.checkbox(
+                        "Calculate signal and noise correlations between "
+                        "samples"
+                    )
+                    if st.session_state.correlations:
+                        st.session_state.corr_float32 = st.checkbox(
+                            "Use float32 for correlations (halves memory use "
+                            "for large grids)"
+                        )
+                    st.session_state.add_to_catalog = st.checkbox(
+                        "Add results to the session catalog "
+                        "(roi_catalog.sqlite in the parent folder)"
+                    )
 
                 st.warning(
                     "If this is a re-run, please delete all the .xlsx files "
                     " from the previous run through before clicking Go!"
                 )
                 if st.button("Go!"):
-                    run_analysis(
+                    start_analysis(
                         st.session_state.dir_path,
                         date,
                         animal_id,
@@ -258,8 +358,16 @@ def main():
                         st.session_state.sample_type,
                         st.session_state.run_type,
                         st.session_state.drop_trial,
+                        st.session_state.correlations,
+                        st.session_state.corr_float32,
+                        st.session_state.grid_cols,
+                        st.session_state.resample_to,
+                        st.session_state.add_to_catalog,
                     )
 
+    show_jobs("analysis")
+    poll_jobs("analysis")
+
 
 if __name__ == "__main__":
     main()
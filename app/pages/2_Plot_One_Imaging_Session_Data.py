@@ -3,17 +3,42 @@ amplitude values from one imaging session.
 
 The page prompts the user to upload the avg_means.xlsx file containing the
 fluorescence data to be plotted. Clicking "Load Data" and "Plot Data" will
-generate one plot for each sample, with each plot containing fluorescence 
+show one plot for the selected sample, with each plot containing fluorescence 
 values for all odors as different-colored traces. Mean amplitude is plotted on
-the y axis against Frame # on the x axis.
+the y axis against Frame # on the x axis. Plots are made when their sample is
+selected and kept in the cache shared by all users. The plots of every sample
+can also be exported to one HTML report. For long sessions, the fast
+rendering mode draws the traces with WebGL, downsampled to the plot width
+within a selectable frame range.
+
+For Grid sessions, the page can instead plot spatial response maps. The user
+uploads the analysis.xlsx file (and optionally the session_info.json file
+holding the grid geometry), and one heatmap per odor is generated for the
+selected measurement.
 """
 
+import shutil
+import tempfile
+from pathlib import Path
+
 import streamlit as st
 from stqdm import stqdm
 import pdb
 
 from src.processing import load_avg_means
-from src.plotting import plot_avg_amps
+from src.experiment import ExperimentFile
+from src.shared_cache import get_shared_cache
+from src.downsample import DEFAULT_MAX_POINTS
+from src.report import IMAGE_FORMATS, can_export_images, export_session_report
+from src.sidecar import calc_checksum
+from src.grid import (
+    infer_grid_shape,
+    load_grid_shape,
+    make_measure_array,
+    make_grid_maps,
+)
+
+RENDER_MODES = ["Full resolution", "Fast (WebGL, downsampled)"]
 
 
 def set_webapp_params():
@@ -34,12 +59,40 @@ def initialize_states():
         st.session_state.pg2_load_data = False
     if "file" not in st.session_state:
         st.session_state.file = False
+    if "avg_means_sidecar" not in st.session_state:
+        st.session_state.avg_means_sidecar = None
     if "odor_list" not in st.session_state:
         st.session_state.odor_list = False
     if "pg2_plots_list" not in st.session_state:
         st.session_state.pg2_plots_list = False
+    if "pg2_report" not in st.session_state:
+        st.session_state.pg2_report = False
+    # identifies the loaded file in the shared cache
+    if "pg2_fingerprint" not in st.session_state:
+        st.session_state.pg2_fingerprint = False
     if "selected_sample" not in st.session_state:
         st.session_state.selected_sample = False
+    if "grid_files" not in st.session_state:
+        st.session_state.grid_files = False
+    if "grid_data" not in st.session_state:
+        st.session_state.grid_data = False
+    if "grid_shape" not in st.session_state:
+        st.session_state.grid_shape = None
+
+
+def choose_plot_type() -> str:
+    """Prompts user to select between trace plots and grid response maps.
+
+    Returns:
+        The selected plot type.
+    """
+
+    choice = st.radio(
+        "Select plot type:",
+        ("Mean amplitude traces", "Grid response maps"),
+    )
+
+    return choice
 
 
 def prompt_file():
@@ -55,6 +108,11 @@ def prompt_file():
     st.session_state.file = st.file_uploader(
         label="Choose a file", label_visibility="collapsed"
     )
+    st.session_state.avg_means_sidecar = st.file_uploader(
+        label="Optionally, also select the matching "
+        "YYMMDD--123456-7-8_ROIX_avg_means.arrow file for faster loading.",
+        type="arrow",
+    )
 
 
 def check_file():
@@ -71,7 +129,9 @@ def check_file():
 
 
 def generate_plots():
-    """Generates mean amplitude plots for all odors in all samples."""
+    """Sets up the mean amplitude plots for the selected odors. Each sample's
+    plot is made when the sample is displayed.
+    """
 
     if st.checkbox("Select specific odors to plot"):
         odors_to_plot = st.multiselect(
@@ -85,17 +145,21 @@ def generate_plots():
     else:
         odors_to_plot = st.session_state.odor_list
 
-    if st.button("Plot data"):
-        plots_list = {}
-
-        # adds progress bar
-        bar = stqdm(st.session_state.data.items(), desc="Plotting ")
-        for sample, avg_means_df in bar:
-            fig = plot_avg_amps(avg_means_df, odors_to_plot)
-            plots_list[sample] = fig
+    render_mode = st.radio(
+        "Rendering:",
+        options=RENDER_MODES,
+        horizontal=True,
+        help="Fast rendering draws the traces with WebGL and downsamples "
+        "them to the plot width. Select a narrower frame range to see "
+        "every frame.",
+    )
 
-        st.info("All plots generated.")
-        st.session_state.pg2_plots_list = plots_list
+    if st.button("Plot data"):
+        st.session_state.pg2_plots_list = {
+            "odors": tuple(odors_to_plot),
+            "fast": render_mode == RENDER_MODES[1],
+        }
+        st.session_state.pg2_report = False
 
 
 def display_plots():
@@ -105,20 +169,206 @@ def display_plots():
     isn't clicked again.
     """
 
+    from src.plotting import plot_avg_amps
+
     st.session_state.selected_sample = st.select_slider(
         "Select sample number to display its " "corresponding plot:",
         options=st.session_state.data.keys(),
     )
 
     if st.session_state.selected_sample:
-        st.plotly_chart(
-            st.session_state.pg2_plots_list[st.session_state.selected_sample]
+        odors_to_plot = st.session_state.pg2_plots_list["odors"]
+        avg_means_df = st.session_state.data[st.session_state.selected_sample]
+
+        if st.session_state.pg2_plots_list["fast"]:
+            first_frame = int(avg_means_df["Frame"].min())
+            last_frame = int(avg_means_df["Frame"].max())
+            frame_range = st.slider(
+                "Frames to show:",
+                min_value=first_frame,
+                max_value=last_frame,
+                value=(first_frame, last_frame),
+            )
+            plot_kwargs = {
+                "max_points": DEFAULT_MAX_POINTS,
+                "frame_range": frame_range,
+            }
+        else:
+            plot_kwargs = {}
+
+        fig = get_shared_cache().get_or_make(
+            (
+                "figure",
+                st.session_state.pg2_fingerprint,
+                st.session_state.selected_sample,
+                odors_to_plot,
+                plot_kwargs.get("frame_range"),
+            ),
+            plot_avg_amps,
+            avg_means_df,
+            list(odors_to_plot),
+            **plot_kwargs,
         )
+        st.plotly_chart(fig)
+
+
+def export_plots():
+    """Exports the plots of every sample to an HTML report, and optionally
+    PNG or SVG files, offered as downloads.
+    """
+
+    with st.expander("Export all plots"):
+        image_formats = st.multiselect(
+            "Also save each plot as:",
+            options=IMAGE_FORMATS,
+            disabled=not can_export_images(),
+            help="Saving PNG and SVG files needs the kaleido package.",
+        )
+
+        if st.button("Export report"):
+            exp_name = st.session_state.file.name.split("_avg_means")[0]
+            report_dir = tempfile.mkdtemp()
+            bar = stqdm(
+                total=len(st.session_state.data), desc="Exporting plots "
+            )
+            report_path = export_session_report(
+                Path(report_dir, f"{exp_name}_report.html"),
+                st.session_state.data,
+                st.session_state.pg2_plots_list["odors"],
+                exp_name,
+                image_formats,
+                bar,
+            )
+            st.session_state.pg2_report = report_path
+
+        if st.session_state.pg2_report:
+            report_path = st.session_state.pg2_report
+            st.download_button(
+                "Download report",
+                data=report_path.read_bytes(),
+                file_name=report_path.name,
+                mime="text/html",
+            )
+
+            image_dir = Path(report_path.parent, f"{report_path.stem}_images")
+            if image_dir.exists():
+                zip_path = shutil.make_archive(
+                    str(image_dir), "zip", image_dir
+                )
+                st.download_button(
+                    "Download images",
+                    data=Path(zip_path).read_bytes(),
+                    file_name=Path(zip_path).name,
+                    mime="application/zip",
+                )
+
+
+def prompt_grid_files():
+    """Prompts user to select the analysis.xlsx file, and optionally the
+    session_info.json file, from one Grid session.
+    """
+
+    st.markdown(
+        "Please select the .xlsx file containing the response properties of "
+        "the Grid session, named in the format "
+        "YYMMDD_123456-7-8_ROIX_analysis.xlsx. To use the grid geometry "
+        "entered during analysis, also select the "
+        "YYMMDD_123456-7-8_ROIX_session_info.json file, and for faster "
+        "loading, the YYMMDD_123456-7-8_ROIX_analysis.arrow file."
+    )
+    st.session_state.grid_files = st.file_uploader(
+        label="Choose files",
+        label_visibility="collapsed",
+        accept_multiple_files=True,
+    )
+
+
+def load_grid_data():
+    """Loads the analysis values and grid geometry of the Grid session."""
+
+    analysis_files = [
+        x
+        for x in st.session_state.grid_files
+        if x.name.endswith("_analysis.xlsx")
+    ]
+    sidecar_files = [
+        x
+        for x in st.session_state.grid_files
+        if x.name.endswith("_analysis.arrow")
+    ]
+    info_files = [
+        x for x in st.session_state.grid_files if "session_info" in x.name
+    ]
+
+    if len(analysis_files) != 1:
+        st.error(
+            "Please make sure that exactly one file ending in "
+            "'analysis.xlsx' has been uploaded."
+        )
+        st.session_state.grid_data = False
+        return
+
+    st.session_state.grid_data = ExperimentFile(
+        analysis_files[0],
+        "acute",
+        sidecar=sidecar_files[0] if sidecar_files else None,
+    ).import_excel()
+
+    st.session_state.grid_shape = None
+    if info_files:
+        st.session_state.grid_shape = load_grid_shape(info_files[0])
+
+
+def display_grid_maps():
+    """Displays the spatial response maps for the selected measurement."""
+
+    from src.plotting import plot_grid_maps
+
+    n_tiles = len(st.session_state.grid_data)
+    default_cols = (
+        st.session_state.grid_shape[1]
+        if st.session_state.grid_shape
+        else infer_grid_shape(n_tiles)[1]
+    )
+
+    measure = st.selectbox(
+        "Select measurement to map:",
+        options=[
+            "Blank-subtracted DeltaF/F(%)",
+            "Significant response?",
+            "Blank sub AUC",
+            "Latency (s)",
+            "Time to peak (s)",
+        ],
+    )
+    n_cols = st.number_input(
+        "Number of grid tiles per row",
+        min_value=1,
+        max_value=n_tiles,
+        value=min(default_cols, n_tiles),
+    )
+
+    values, odors = make_measure_array(st.session_state.grid_data, measure)
+    grid_maps = make_grid_maps(values, infer_grid_shape(n_tiles, n_cols))
+
+    st.plotly_chart(plot_grid_maps(grid_maps, odors, measure))
 
 
 def main():
     set_webapp_params()
     initialize_states()
+
+    if choose_plot_type() == "Grid response maps":
+        prompt_grid_files()
+
+        if st.session_state.grid_files and st.button("Load data"):
+            load_grid_data()
+
+        if st.session_state.grid_files and st.session_state.grid_data:
+            display_grid_maps()
+
+        return
+
     prompt_file()
 
     check_file()
@@ -126,11 +376,15 @@ def main():
     if st.session_state.file or st.session_state.pg2_load_data:
         if st.button("Load data"):
             st.session_state.data, st.session_state.odor_list = load_avg_means(
+                st.session_state.file, st.session_state.avg_means_sidecar
+            )
+            st.session_state.pg2_fingerprint = calc_checksum(
                 st.session_state.file
             )
             st.session_state.pg2_load_data = True
             # if load data is clicked again, doesn't display plots/slider
             st.session_state.pg2_plots_list = False
+            st.session_state.pg2_report = False
 
         # if data has been loaded, always show plotting buttons
         if st.session_state.pg2_load_data:
@@ -140,6 +394,7 @@ def main():
             # even if Plot data isn't clicked again
             if st.session_state.pg2_plots_list:
                 display_plots()
+                export_plots()
 
 
 if __name__ == "__main__":
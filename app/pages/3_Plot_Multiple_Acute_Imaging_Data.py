@@ -11,9 +11,6 @@ drop-down menu). Analysis will generate compiled_dataset_analysis.xlsx file
 containing the summary statistics for all imaging sessions in the dataset.
 """
 
-import plotly.io as pio
-
-pio.templates.default = "plotly_white"
 import streamlit as st
 from src.utils import (
     make_pick_folder_button,
@@ -22,11 +19,22 @@ from src.utils import (
     check_sig_odors,
 )
 
+from src.compiled_store import CompiledStore
 from src.processing import (
     import_all_excel_data,
     sort_measurements_df,
-    generate_plots,
+    set_up_plots,
     show_plots_sliders,
+    show_report_export,
+    make_compile_job_key,
+)
+from src.jobs import (
+    Job,
+    get_job_manager,
+    get_conflicting_job,
+    submit_job,
+    show_jobs,
+    poll_jobs,
 )
 
 import pdb
@@ -48,9 +56,21 @@ def initialize_states():
     # makes the avg_means data persist
     if "acute_files" not in st.session_state:
         st.session_state.acute_files = False
+    if "acute_sidecars" not in st.session_state:
+        st.session_state.acute_sidecars = []
+    # whether to add to the dataset already compiled in the folder
+    if "acute_append" not in st.session_state:
+        st.session_state.acute_append = False
+    if "acute_remove" not in st.session_state:
+        st.session_state.acute_remove = []
+    if "acute_exps" not in st.session_state:
+        st.session_state.acute_exps = False
     # checks whether Load data was clicked
     if "pg3_load_data" not in st.session_state:
         st.session_state.pg3_load_data = False
+    # the background job processing the uploaded files
+    if "acute_job" not in st.session_state:
+        st.session_state.acute_job = False
     if "sorted_sig_data" not in st.session_state:
         st.session_state.sorted_sig_data = False
     if "sig_odors" not in st.session_state:
@@ -109,71 +129,185 @@ def upload_dataset():
         label_visibility="collapsed",
         accept_multiple_files=True,
     )
+    st.session_state.acute_sidecars = st.file_uploader(
+        label="Optionally, also select the matching "
+        "YYMMDD--123456-7-8_ROIX_analysis.arrow files for faster loading.",
+        type="arrow",
+        accept_multiple_files=True,
+    )
+
 
+def choose_store_mode():
+    """Prompts user to add the uploaded files to the dataset already compiled
+    in the selected folder, if there is one.
+    """
 
-def get_data(status: st.status) -> list:
+    store = CompiledStore(st.session_state.acute_dir_path, "acute")
+    st.session_state.acute_append = False
+    st.session_state.acute_remove = []
+
+    if store.exp_names:
+        st.session_state.acute_append = st.checkbox(
+            f"Add the uploaded files to the {len(store.exp_names)} sessions "
+            "already compiled in this folder",
+            help="New sessions are added and re-uploaded sessions are "
+            "replaced, without re-importing the other sessions.",
+        )
+        if st.session_state.acute_append:
+            st.session_state.acute_remove = st.multiselect(
+                "Sessions to remove from the compiled dataset:",
+                store.exp_names,
+            )
+
+
+def get_data(
+    job: Job,
+    dir_path: str,
+    files: list,
+    sidecars: list,
+    append: bool,
+    remove: list,
+    measures: list,
+) -> dict:
     """Gets data from uploaded .xlsx files and drops non-significant response
-        data.
+        data. Runs as a background job, which also creates the summary .xlsx
+        file.
 
     Args:
-        status: st.status container to update progress message
+        job: The background job, for reporting progress.
+        dir_path: The folder holding the compiled dataset and summary file.
+        files: The uploaded .xlsx files.
+        sidecars: The uploaded _analysis.arrow files.
+        append: Whether to add the files to the dataset already compiled in
+            the folder.
+        remove: The sessions to remove from the compiled dataset.
+        measures: The names of measurements.
 
     Returns:
-        A list containing experimental data and the ids of significant
-            experiments and odors.
+        A dict holding the dict_list containing experimental data and the ids
+            of significant experiments and odors, the compiled experiment
+            names as exps, and the dir_path.
     """
 
-    st.write(
-        f"Importing data from {len(st.session_state.acute_files)} Excel "
-        f"files..."
-    )
-    dict_list, df_list = import_all_excel_data(
-        "acute", st.session_state.acute_files
-    )
+    job.set_stage(f"Importing data from {len(files)} Excel files...")
+    store = CompiledStore(dir_path, "acute")
+    if append:
+        store.remove_sessions(remove)
+    else:
+        store.clear()
 
-    sample_type = df_list[0].index.name
+    dict_list, _, _ = import_all_excel_data(
+        "acute", files, sidecars, store, measures, job
+    )
 
-    st.write("Generating summary .xlsx file...")
+    job.set_stage("Generating summary .xlsx file...")
 
     sort_measurements_df(
-        st.session_state.acute_dir_path,
+        dir_path,
         "compiled_dataset_analysis.xlsx",
-        df_list,
-        sample_type,
-        st.session_state.measures,
-        dataset_type="acute",
+        dict_list[2],
+        measures,
+    )
+
+    job.set_stage(
+        "All data loaded. Summary .xlsx file saved to the selected "
+        "directory as compiled_dataset_analysis.xlsx"
     )
 
-    return dict_list
+    return {
+        "dict_list": dict_list,
+        "exps": store.exp_names,
+        "dir_path": dir_path,
+    }
 
 
 def process_dataset():
-    """Processes data from uploaded files and creates summary .xlsx file."""
-
-    with st.status("Processing data...", expanded=True) as status:
-        st.session_state.pg3_load_data = True
-
-        (
-            st.session_state.nosig_exps,
-            odors_list,
-            st.session_state.sorted_sig_data,
-        ) = get_data(status)
-
-        status.update(
-            label="All data loaded. Summary .xlsx file saved to the selected "
-            "directory as compiled_dataset_analysis.xlsx",
-            state="complete",
-            expanded=False,
-        )
+    """Starts processing the uploaded files in a background job, unless
+    data from the same folder is already being processed with different
+    files or options."""
 
-        st.session_state.sig_odors = check_sig_odors(
-            odors_list,
-            st.session_state.nosig_exps,
-            st.session_state.acute_files,
+    job_key = make_compile_job_key(
+        "acute",
+        st.session_state.acute_dir_path,
+        st.session_state.acute_files,
+        st.session_state.acute_sidecars,
+        st.session_state.acute_append,
+        st.session_state.acute_remove,
+    )
+    if get_conflicting_job("acute", job_key) is not None:
+        st.error(
+            "Data from this folder is already being processed with different "
+            "files or options. Please wait for it to finish before loading "
+            "data again."
         )
+        return
+
+    job, is_new = submit_job(
+        f"{len(st.session_state.acute_files)} files in "
+        f"{st.session_state.acute_dir_path}",
+        "acute",
+        job_key,
+        get_data,
+        st.session_state.acute_dir_path,
+        list(st.session_state.acute_files),
+        list(st.session_state.acute_sidecars),
+        st.session_state.acute_append,
+        list(st.session_state.acute_remove),
+        list(st.session_state.measures),
+    )
+    if not is_new:
+        st.info(
+            "The same data is already being processed. Its results will be "
+            "loaded once it's done."
+        )
+    st.session_state.acute_job = job.job_id
 
-        # if load data is clicked again, doesn't display plots/slider
-        st.session_state.acute_plots_list = False
+    # if load data is clicked again, doesn't display plots/slider
+    st.session_state.pg3_load_data = False
+    st.session_state.acute_plots_list = False
+
+
+def load_results(result: dict):
+    """Loads the results of a finished processing job.
+
+    Args:
+        result: The dict returned by get_data().
+    """
+
+    st.session_state.pg3_load_data = True
+    st.session_state.acute_dir_path = result["dir_path"]
+    st.session_state.acute_exps = result["exps"]
+    (
+        st.session_state.nosig_exps,
+        odors_list,
+        st.session_state.sorted_sig_data,
+    ) = result["dict_list"]
+
+    st.session_state.sig_odors = check_sig_odors(
+        odors_list,
+        st.session_state.nosig_exps,
+        st.session_state.acute_exps,
+    )
+    st.session_state.acute_plots_list = False
+
+
+def check_jobs():
+    """Shows the background processing jobs, and loads the results of the
+    job started in this session once it's done, or of a finished job chosen
+    by the user.
+    """
+
+    job = show_jobs("acute", load_label="Load results")
+
+    if job is None and st.session_state.acute_job:
+        own_job = get_job_manager().get(st.session_state.acute_job)
+        if own_job is None or own_job.is_finished:
+            st.session_state.acute_job = False
+        if own_job is not None and own_job.status == "done":
+            job = own_job
+
+    if job is not None:
+        load_results(job.result)
 
 
 def main():
@@ -189,25 +323,27 @@ def main():
         st.session_state.acute_files = False
         st.session_state.pg3_load_data = False
 
+    if st.session_state.acute_files and st.session_state.acute_dir_path:
+        choose_store_mode()
+        if st.button("Load data"):
+            process_dataset()
+
+    check_jobs()
+
     if st.session_state.acute_files or st.session_state.pg3_load_data:
         if st.session_state.acute_dir_path:
-            if st.button("Load data"):
-                process_dataset()
-
             # if data has been loaded, always show plotting buttons
             if (
                 st.session_state.pg3_load_data
                 and len(st.session_state.nosig_exps)
-                != len(st.session_state.acute_files)
+                != len(st.session_state.acute_exps)
                 and st.session_state.acute_dir_path
             ):
                 if st.button("Plot data"):
-                    st.session_state.acute_plots_list = generate_plots(
-                        st.session_state.sig_odors,
+                    st.session_state.acute_plots_list = set_up_plots(
                         st.session_state.nosig_exps,
                         "acute",
                         st.session_state.sorted_sig_data,
-                        st.session_state.measures,
                     )
                 # display slider and plots if plots have already been generated
                 # even if Plot data isn't clicked again
@@ -217,6 +353,14 @@ def main():
                     st.session_state.sig_odors,
                     st.session_state.measures,
                 )
+                show_report_export(
+                    st.session_state.acute_plots_list,
+                    st.session_state.sig_odors,
+                    st.session_state.measures,
+                    st.session_state.acute_dir_path,
+                )
+
+    poll_jobs("acute")
 
 
 if __name__ == "__main__":
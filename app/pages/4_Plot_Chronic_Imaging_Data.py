@@ -11,9 +11,6 @@ drop-down menu). Analysis will generate compiled_dataset_analysis.xlsx file
 containing the summary statistics for all imaging sessions in the dataset.
 """
 
-import plotly.io as pio
-
-pio.templates.default = "plotly_white"
 import streamlit as st
 from src.utils import (
     make_pick_folder_button,
@@ -22,11 +19,29 @@ from src.utils import (
     check_sig_odors,
 )
 
+from src.compiled_store import CompiledStore
 from src.processing import (
     import_all_excel_data,
     sort_measurements_df,
-    generate_plots,
+    set_up_plots,
     show_plots_sliders,
+    show_report_export,
+    make_compile_job_key,
+)
+from src.longitudinal import (
+    ChronicTensor,
+    calc_response_stability,
+    calc_population_drift,
+    calc_drift_by_lag,
+    calc_response_turnover,
+)
+from src.jobs import (
+    Job,
+    get_job_manager,
+    get_conflicting_job,
+    submit_job,
+    show_jobs,
+    poll_jobs,
 )
 import pdb
 
@@ -47,9 +62,21 @@ def initialize_states():
     # makes the avg_means data persist
     if "chronic_files" not in st.session_state:
         st.session_state.chronic_files = False
+    if "chronic_sidecars" not in st.session_state:
+        st.session_state.chronic_sidecars = []
+    # whether to add to the dataset already compiled in the folder
+    if "chronic_append" not in st.session_state:
+        st.session_state.chronic_append = False
+    if "chronic_remove" not in st.session_state:
+        st.session_state.chronic_remove = []
+    if "chronic_exps" not in st.session_state:
+        st.session_state.chronic_exps = False
     # checks whether Load data was clicked
     if "pg4_load_data" not in st.session_state:
         st.session_state.pg4_load_data = False
+    # the background job processing the uploaded files
+    if "chronic_job" not in st.session_state:
+        st.session_state.chronic_job = False
     if "animal_id" not in st.session_state:
         st.session_state.animal_id = False
     if "interval" not in st.session_state:
@@ -58,6 +85,9 @@ def initialize_states():
         st.session_state.sig_data = False
     if "sorted_dates" not in st.session_state:
         st.session_state.sorted_dates = False
+    # dense (date, sample, odor, measure) array for longitudinal metrics
+    if "chronic_tensor" not in st.session_state:
+        st.session_state.chronic_tensor = False
     if "sig_odors" not in st.session_state:
         st.session_state.sig_odors = False
     if "nosig_exps" not in st.session_state:
@@ -114,75 +144,235 @@ def upload_dataset():
         label_visibility="collapsed",
         accept_multiple_files=True,
     )
+    st.session_state.chronic_sidecars = st.file_uploader(
+        label="Optionally, also select the matching "
+        "YYMMDD--123456-7-8_ROIX_analysis.arrow files for faster loading.",
+        type="arrow",
+        accept_multiple_files=True,
+    )
+
+
+def choose_store_mode():
+    """Prompts user to add the uploaded files to the dataset already compiled
+    in the selected folder, if there is one.
+    """
 
+    store = CompiledStore(st.session_state.chronic_dir_path, "chronic")
+    st.session_state.chronic_append = False
+    st.session_state.chronic_remove = []
 
-def get_data(status: st.status) -> list:
+    if store.exp_names:
+        st.session_state.chronic_append = st.checkbox(
+            f"Add the uploaded files to the {len(store.exp_names)} sessions "
+            "already compiled in this folder",
+            help="New sessions are added and re-uploaded sessions are "
+            "replaced, without re-importing the other sessions.",
+        )
+        if st.session_state.chronic_append:
+            st.session_state.chronic_remove = st.multiselect(
+                "Sessions to remove from the compiled dataset:",
+                store.exp_names,
+            )
+
+
+def get_data(
+    job: Job,
+    dir_path: str,
+    files: list,
+    sidecars: list,
+    append: bool,
+    remove: list,
+    measures: list,
+) -> dict:
     """Gets data from uploaded .xlsx files and drops non-significant response
-        data.
+        data. Runs as a background job, which also creates the summary .xlsx
+        file.
+
+    Args:
+        job: The background job, for reporting progress.
+        dir_path: The folder holding the compiled dataset and summary file.
+        files: The uploaded .xlsx files.
+        sidecars: The uploaded _analysis.arrow files.
+        append: Whether to add the files to the dataset already compiled in
+            the folder.
+        remove: The sessions to remove from the compiled dataset.
+        measures: The names of measurements.
 
     Returns:
-        A list containing experimental data and the ids of significant
-            experiments and odors.
+        A dict holding the dict_list containing experimental data and the ids
+            of significant experiments and odors, the compiled experiment
+            names as exps, the ChronicTensor as tensor, the animal_id and the
+            dir_path.
     """
 
-    st.write(
-        f"Importing data from {len(st.session_state.chronic_files)} Excel "
-        f"files from animal ID {st.session_state.animal_id}..."
+    animal_id = (
+        f"{files[0].name.split('_')[1]}_{files[0].name.split('_')[2]}"
     )
 
-    dict_list, df_list = import_all_excel_data(
-        "chronic", st.session_state.chronic_files
+    job.set_stage(
+        f"Importing data from {len(files)} Excel files from animal ID "
+        f"{animal_id}..."
     )
-    sample_type = df_list[0].index.name
 
-    st.write("Generating summary .xlsx file...")
+    store = CompiledStore(dir_path, "chronic")
+    if append:
+        store.remove_sessions(remove)
+    else:
+        store.clear()
 
-    st.session_state.animal_id = (
-        f"{st.session_state.chronic_files[0].name.split('_')[1]}_"
-        f"{st.session_state.chronic_files[0].name.split('_')[2]}"
+    dict_list, df_list, _ = import_all_excel_data(
+        "chronic", files, sidecars, store, measures, job
     )
+    sample_type = df_list[0].index.name
+
+    tensor = ChronicTensor(df_list, measures, sample_type)
+
+    job.set_stage("Generating summary .xlsx file...")
 
     sort_measurements_df(
-        st.session_state.chronic_dir_path,
+        dir_path,
         "compiled_dataset_analysis.xlsx",
-        df_list,
-        sample_type,
-        st.session_state.measures,
-        dataset_type="chronic",
-        animal_id=st.session_state.animal_id,
+        dict_list[2],
+        measures,
+        animal_id=animal_id,
     )
 
-    return dict_list
+    job.set_stage(
+        "All data loaded. Summary .xlsx file saved to the selected "
+        "directory as compiled_dataset_analysis.xlsx"
+    )
+
+    return {
+        "dict_list": dict_list,
+        "exps": store.exp_names,
+        "tensor": tensor,
+        "animal_id": animal_id,
+        "dir_path": dir_path,
+    }
 
 
 def process_dataset():
-    """Processes data from uploaded files and creates summary .xlsx file."""
-
-    with st.status("Processing data...", expanded=True) as status:
-        st.session_state.pg4_load_data = True
-
-        (
-            st.session_state.nosig_exps,
-            odors_list,
-            st.session_state.sig_data,
-            st.session_state.sorted_dates,
-        ) = get_data(status)
-
-        status.update(
-            label="All data loaded. Summary .xlsx file saved to the selected "
-            "directory as compiled_dataset_analysis.xlsx",
-            state="complete",
-            expanded=False,
+    """Starts processing the uploaded files in a background job, unless
+    data from the same folder is already being processed with different
+    files or options."""
+
+    job_key = make_compile_job_key(
+        "chronic",
+        st.session_state.chronic_dir_path,
+        st.session_state.chronic_files,
+        st.session_state.chronic_sidecars,
+        st.session_state.chronic_append,
+        st.session_state.chronic_remove,
+    )
+    if get_conflicting_job("chronic", job_key) is not None:
+        st.error(
+            "Data from this folder is already being processed with different "
+            "files or options. Please wait for it to finish before loading "
+            "data again."
         )
+        return
+
+    job, is_new = submit_job(
+        f"{len(st.session_state.chronic_files)} files in "
+        f"{st.session_state.chronic_dir_path}",
+        "chronic",
+        job_key,
+        get_data,
+        st.session_state.chronic_dir_path,
+        list(st.session_state.chronic_files),
+        list(st.session_state.chronic_sidecars),
+        st.session_state.chronic_append,
+        list(st.session_state.chronic_remove),
+        list(st.session_state.measures),
+    )
+    if not is_new:
+        st.info(
+            "The same data is already being processed. Its results will be "
+            "loaded once it's done."
+        )
+    st.session_state.chronic_job = job.job_id
+
+    # if load data is clicked again, doesn't display plots/slider
+    st.session_state.pg4_load_data = False
+    st.session_state.chronic_plots_list = False
+
+
+def load_results(result: dict):
+    """Loads the results of a finished processing job.
+
+    Args:
+        result: The dict returned by get_data().
+    """
 
-        st.session_state.sig_odors = check_sig_odors(
-            odors_list,
-            st.session_state.nosig_exps,
-            st.session_state.chronic_files,
+    st.session_state.pg4_load_data = True
+    st.session_state.chronic_dir_path = result["dir_path"]
+    st.session_state.chronic_exps = result["exps"]
+    st.session_state.chronic_tensor = result["tensor"]
+    st.session_state.animal_id = result["animal_id"]
+    (
+        st.session_state.nosig_exps,
+        odors_list,
+        st.session_state.sig_data,
+        st.session_state.sorted_dates,
+    ) = result["dict_list"]
+
+    st.session_state.sig_odors = check_sig_odors(
+        odors_list,
+        st.session_state.nosig_exps,
+        st.session_state.chronic_exps,
+    )
+    st.session_state.chronic_plots_list = False
+
+
+def check_jobs():
+    """Shows the background processing jobs, and loads the results of the
+    job started in this session once it's done, or of a finished job chosen
+    by the user.
+    """
+
+    job = show_jobs("chronic", load_label="Load results")
+
+    if job is None and st.session_state.chronic_job:
+        own_job = get_job_manager().get(st.session_state.chronic_job)
+        if own_job is None or own_job.is_finished:
+            st.session_state.chronic_job = False
+        if own_job is not None and own_job.status == "done":
+            job = own_job
+
+    if job is not None:
+        load_results(job.result)
+
+
+def display_longitudinal_metrics():
+    """Displays the response stability, representational drift and response
+    turnover metrics calculated from the chronic dataset tensor.
+    """
+
+    from src.plotting import plot_drift_matrix, plot_response_turnover
+
+    tensor = st.session_state.chronic_tensor
+
+    if len(tensor.dates) < 2:
+        st.warning(
+            "Longitudinal metrics need data from at least two imaging "
+            "sessions."
         )
+        return
 
-        # if load data is clicked again, doesn't display plots/slider
-        st.session_state.chronic_plots_list = False
+    metric_measure = st.selectbox(
+        "Select measurement for longitudinal metrics:",
+        options=["Blank-subtracted DeltaF/F(%)", "Blank sub AUC"],
+    )
+
+    drift_df = calc_population_drift(tensor, metric_measure)
+    st.plotly_chart(plot_drift_matrix(drift_df))
+    st.write("Mean population vector correlation by session lag:")
+    st.dataframe(calc_drift_by_lag(drift_df))
+
+    st.plotly_chart(plot_response_turnover(calc_response_turnover(tensor)))
+
+    st.write(f"Response stability per {tensor.sample_type.lower()}:")
+    st.dataframe(calc_response_stability(tensor, metric_measure))
 
 
 def main():
@@ -198,10 +388,15 @@ def main():
         st.session_state.chronic_files = False
         st.session_state.pg4_load_data = False
 
+    if st.session_state.chronic_files and st.session_state.chronic_dir_path:
+        choose_store_mode()
+        if st.button("Load data"):
+            process_dataset()
+
+    check_jobs()
+
     if st.session_state.chronic_files or st.session_state.pg4_load_data:
         if st.session_state.chronic_dir_path:
-            if st.button("Load data"):
-                process_dataset()
 
             # select interval type if load data has been clicked
             if st.session_state.pg4_load_data:
@@ -209,17 +404,20 @@ def main():
                     "Select timepoint interval:", ("Day", "Week", "Session")
                 )
 
+            if st.session_state.pg4_load_data and st.checkbox(
+                "Show longitudinal metrics"
+            ):
+                display_longitudinal_metrics()
+
             # if data has been loaded, always show plotting buttons
             if st.session_state.pg4_load_data and len(
                 st.session_state.nosig_exps
-            ) != len(st.session_state.chronic_files):
+            ) != len(st.session_state.chronic_exps):
                 if st.button("Plot data"):
-                    st.session_state.chronic_plots_list = generate_plots(
-                        st.session_state.sig_odors,
+                    st.session_state.chronic_plots_list = set_up_plots(
                         st.session_state.nosig_exps,
                         "chronic",
                         st.session_state.sig_data,
-                        st.session_state.measures,
                         st.session_state.sorted_dates,
                         st.session_state.interval,
                     )
@@ -231,6 +429,14 @@ def main():
                     st.session_state.sig_odors,
                     st.session_state.measures,
                 )
+                show_report_export(
+                    st.session_state.chronic_plots_list,
+                    st.session_state.sig_odors,
+                    st.session_state.measures,
+                    st.session_state.chronic_dir_path,
+                )
+
+    poll_jobs("chronic")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+"""Sets up the Streamlit app page responsible for plotting the population
+structure of the mean fluorescence traces from one imaging session.
+
+The page prompts the user to upload the avg_means.xlsx file from one imaging
+session. The trial-averaged traces of all samples and odors are stacked into
+one matrix and decomposed with randomized PCA. Each odor's population response
+is then plotted as a trajectory in PC space. Decompositions are cached per
+uploaded file so that changing the displayed PCs doesn't recompute them.
+"""
+
+import hashlib
+import streamlit as st
+
+from src.processing import load_avg_means
+from src.dimensionality import get_population_pca
+
+import pdb
+
+
+def set_webapp_params():
+    """Sets the name of the Streamlit app."""
+
+    st.set_page_config(page_title="Plot Population PCA")
+    st.title("Plot population PCA from one imaging session")
+
+
+def initialize_states():
+    """Initializes session state variables."""
+
+    # makes the avg_means data persist
+    if "pca_data" not in st.session_state:
+        st.session_state.pca_data = False
+    # checks whether Load data was clicked
+    if "pg5_load_data" not in st.session_state:
+        st.session_state.pg5_load_data = False
+    if "pca_file" not in st.session_state:
+        st.session_state.pca_file = False
+    if "pca_sidecar" not in st.session_state:
+        st.session_state.pca_sidecar = None
+    if "pca_file_hash" not in st.session_state:
+        st.session_state.pca_file_hash = False
+    if "pca_odor_list" not in st.session_state:
+        st.session_state.pca_odor_list = False
+
+
+def prompt_file():
+    """Prompts user to select the avg_means.xlsx file containing the mean
+    fluorescence values to decompose.
+    """
+
+    st.markdown(
+        "Please select the .xlsx file containing the mean amplitudes that you "
+        "want to analyze. The file should be named in the format "
+        "YYMMDD--123456-7-8_ROIX_avg_means.xlsx."
+    )
+    st.session_state.pca_file = st.file_uploader(
+        label="Choose a file", label_visibility="collapsed"
+    )
+    st.session_state.pca_sidecar = st.file_uploader(
+        label="Optionally, also select the matching "
+        "YYMMDD--123456-7-8_ROIX_avg_means.arrow file for faster loading.",
+        type="arrow",
+    )
+
+
+def check_file():
+    """Checks that the correct .xlsx file has been uploaded."""
+
+    if st.session_state.pca_file is not None:
+        if "avg_means" not in st.session_state.pca_file.name:
+            st.error(
+                "Please make sure that the correct file with name "
+                "ending in 'avg_means.xlsx' has been uploaded."
+            )
+            st.session_state.pg5_load_data = False
+            st.session_state.pca_file = False
+
+
+def display_pca():
+    """Runs (or retrieves the cached) PCA and displays the odor trajectories
+    and explained variance.
+    """
+
+    from src.plotting import plot_pc_trajectories, plot_explained_variance
+
+    odors_to_plot = st.multiselect(
+        label="Odors to include",
+        options=st.session_state.pca_odor_list,
+        default=st.session_state.pca_odor_list,
+    )
+    if len(odors_to_plot) == 0:
+        odors_to_plot = st.session_state.pca_odor_list
+
+    n_samples = len(st.session_state.pca_data)
+    n_components = st.number_input(
+        "Number of principal components",
+        min_value=2,
+        max_value=max(2, min(20, n_samples)),
+        value=min(10, max(2, n_samples)),
+    )
+
+    if n_samples < 3:
+        st.error("PCA needs data from at least 3 samples.")
+        return
+
+    with st.spinner("Running PCA..."):
+        scores, components, explained_ratio, n_frames = get_population_pca(
+            st.session_state.pca_file_hash,
+            tuple(odors_to_plot),
+            n_components,
+            st.session_state.pca_data,
+        )
+
+    n_pcs = len(explained_ratio)
+    plot_3d = st.checkbox("Plot in 3D", value=False) and n_pcs >= 3
+    pc_options = [f"PC{x}" for x in range(1, n_pcs + 1)]
+    pc_cols = st.columns(3 if plot_3d else 2)
+    pcs = tuple(
+        pc_options.index(
+            col.selectbox(
+                f"Axis {axis_ct + 1}",
+                options=pc_options,
+                index=axis_ct,
+            )
+        )
+        for axis_ct, col in enumerate(pc_cols)
+    )
+
+    st.plotly_chart(
+        plot_pc_trajectories(scores, odors_to_plot, n_frames, pcs)
+    )
+    st.plotly_chart(plot_explained_variance(explained_ratio))
+
+
+def main():
+    set_webapp_params()
+    initialize_states()
+    prompt_file()
+
+    check_file()
+
+    if st.session_state.pca_file or st.session_state.pg5_load_data:
+        if st.button("Load data"):
+            (
+                st.session_state.pca_data,
+                st.session_state.pca_odor_list,
+            ) = load_avg_means(
+                st.session_state.pca_file, st.session_state.pca_sidecar
+            )
+            st.session_state.pca_file_hash = hashlib.md5(
+                st.session_state.pca_file.getvalue()
+            ).hexdigest()
+            st.session_state.pg5_load_data = True
+
+        # if data has been loaded, always show the PCA
+        if st.session_state.pg5_load_data:
+            display_pca()
+
+
+if __name__ == "__main__":
+    main()
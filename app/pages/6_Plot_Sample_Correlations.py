@@ -0,0 +1,117 @@
+"""Sets up the Streamlit app page responsible for plotting the signal and
+noise correlations between samples from one imaging session.
+
+The page prompts the user to upload the _correlations.npz file saved by the
+Load and Analyze page. Large matrices are block-averaged down to the selected
+display size before plotting.
+"""
+
+import numpy as np
+import streamlit as st
+
+from src.correlations import load_correlations, downsample_matrix
+
+import pdb
+
+
+def set_webapp_params():
+    """Sets the name of the Streamlit app."""
+
+    st.set_page_config(page_title="Plot Sample Correlations")
+    st.title("Plot sample correlations from one imaging session")
+
+
+def initialize_states():
+    """Initializes session state variables."""
+
+    if "corr_file" not in st.session_state:
+        st.session_state.corr_file = False
+    if "corr_data" not in st.session_state:
+        st.session_state.corr_data = False
+    # checks whether Load data was clicked
+    if "pg6_load_data" not in st.session_state:
+        st.session_state.pg6_load_data = False
+
+
+def prompt_file():
+    """Prompts user to select the _correlations.npz file to plot."""
+
+    st.markdown(
+        "Please select the .npz file containing the sample correlations that "
+        "you want to plot. The file should be named in the format "
+        "YYMMDD_123456-7-8_ROIX_correlations.npz."
+    )
+    st.session_state.corr_file = st.file_uploader(
+        label="Choose a file", label_visibility="collapsed"
+    )
+
+
+def check_file():
+    """Checks that the correct .npz file has been uploaded."""
+
+    if st.session_state.corr_file is not None:
+        if "correlations" not in st.session_state.corr_file.name:
+            st.error(
+                "Please make sure that the correct file with name "
+                "ending in 'correlations.npz' has been uploaded."
+            )
+            st.session_state.pg6_load_data = False
+            st.session_state.corr_file = False
+
+
+def display_plots():
+    """Displays the selected correlation matrix and its summary values."""
+
+    from src.plotting import plot_correlation_matrix
+
+    corr_type = st.radio("Select correlation type:", ("Signal", "Noise"))
+    corr_matrix = st.session_state.corr_data[corr_type]
+    n_samples = corr_matrix.shape[0]
+
+    max_size = st.slider(
+        "Maximum display size (pixels per axis)",
+        min_value=50,
+        max_value=1000,
+        value=min(500, max(50, n_samples)),
+        step=50,
+    )
+    display_matrix, bin_size = downsample_matrix(corr_matrix, max_size)
+    if bin_size > 1:
+        st.info(
+            f"Each pixel shows the mean of {bin_size} × {bin_size} sample "
+            "pairs."
+        )
+
+    st.plotly_chart(
+        plot_correlation_matrix(
+            display_matrix, f"{corr_type} correlations", bin_size
+        )
+    )
+
+    off_diagonal = corr_matrix[~np.eye(n_samples, dtype=bool)]
+    st.write(
+        f"Mean pairwise {corr_type.lower()} correlation across {n_samples} "
+        f"samples: {np.nanmean(off_diagonal):.3f}"
+    )
+
+
+def main():
+    set_webapp_params()
+    initialize_states()
+    prompt_file()
+
+    check_file()
+
+    if st.session_state.corr_file or st.session_state.pg6_load_data:
+        if st.button("Load data"):
+            st.session_state.corr_data = load_correlations(
+                st.session_state.corr_file
+            )
+            st.session_state.pg6_load_data = True
+
+        if st.session_state.pg6_load_data:
+            display_plots()
+
+
+if __name__ == "__main__":
+    main()
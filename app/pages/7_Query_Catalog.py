@@ -0,0 +1,193 @@
+"""Sets up the Streamlit app page responsible for querying the session
+catalog.
+
+The page prompts the user to select the folder containing the
+roi_catalog.sqlite catalog, optionally adds uploaded _analysis.xlsx files to
+it, then lists the responses matching the selected animals, odors, dates and
+measurement values.
+"""
+
+from datetime import date
+
+import streamlit as st
+from stqdm import stqdm
+
+from src.catalog import Catalog, CATALOG_FNAME
+from src.utils import make_pick_folder_button, pop_folder_selector
+
+import pdb
+
+
+def set_webapp_params():
+    """Sets the name of the Streamlit app."""
+
+    st.set_page_config(page_title="Query Catalog")
+    st.title("Query the session catalog")
+
+
+def initialize_states():
+    """Initializes session state variables."""
+
+    if "catalog_dir" not in st.session_state:
+        st.session_state.catalog_dir = False
+    if "catalog_manual_path" not in st.session_state:
+        st.session_state.catalog_manual_path = False
+    if "catalog_files" not in st.session_state:
+        st.session_state.catalog_files = []
+
+
+def prompt_dir():
+    """Prompts user for the directory containing the catalog."""
+
+    st.markdown(
+        f"Please select the folder containing the {CATALOG_FNAME} catalog, "
+        "usually the parent folder of your imaging session folders. A new "
+        "catalog is made if the folder doesn't have one yet."
+    )
+
+    clicked = make_pick_folder_button()
+    if clicked:
+        st.session_state.catalog_manual_path = False
+        st.session_state.catalog_dir = pop_folder_selector()
+
+    select_manual = st.button("Enter folder path manually")
+    if select_manual or st.session_state.catalog_manual_path:
+        st.session_state.catalog_manual_path = True
+        st.session_state.catalog_dir = st.text_input(
+            "Enter full path of the folder, e.g. "
+            "/Users/Bob/Experiments/2019_GCaMP6s"
+        )
+
+
+def add_files(catalog: Catalog):
+    """Adds uploaded _analysis.xlsx files to the catalog.
+
+    Args:
+        catalog: The opened catalog.
+    """
+
+    st.session_state.catalog_files = st.file_uploader(
+        label="Add _analysis.xlsx files to the catalog (optional)",
+        accept_multiple_files=True,
+        type="xlsx",
+    )
+
+    if st.session_state.catalog_files:
+        bad_files = [
+            x.name
+            for x in st.session_state.catalog_files
+            if not x.name.endswith("_analysis.xlsx")
+        ]
+        if bad_files:
+            st.error(
+                "Please make sure that only files with names ending in "
+                f"'_analysis.xlsx' are uploaded: {', '.join(bad_files)}"
+            )
+        elif st.button("Add files"):
+            n_added = catalog.add_files(
+                st.session_state.catalog_files,
+                stqdm(
+                    total=len(st.session_state.catalog_files),
+                    desc="Adding sessions",
+                ),
+            )
+            st.info(
+                f"Added {n_added} session(s). "
+                f"{len(st.session_state.catalog_files) - n_added} file(s) "
+                "were already in the catalog."
+            )
+
+
+def query_catalog(catalog: Catalog):
+    """Prompts user for the query filters and displays the matching
+    responses.
+
+    Args:
+        catalog: The opened catalog.
+    """
+
+    sessions_df = catalog.list_sessions()
+    if sessions_df.empty:
+        st.warning("The catalog doesn't contain any sessions yet.")
+        return
+
+    with st.expander(f"{len(sessions_df)} session(s) in the catalog"):
+        st.dataframe(sessions_df, hide_index=True)
+
+    options = catalog.get_options()
+
+    measure = st.selectbox(
+        "Select measurement:",
+        options["measures"],
+        index=(
+            options["measures"].index("Latency (s)")
+            if "Latency (s)" in options["measures"]
+            else 0
+        ),
+    )
+    animal_ids = st.multiselect(
+        "Select animal IDs (leave empty for all):", options["animal_ids"]
+    )
+    odors = st.multiselect(
+        "Select odors (leave empty for all):", options["odors"]
+    )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        min_value = st.number_input("Minimum value", value=None)
+        start_date = st.date_input(
+            "From date", value=date.fromisoformat(sessions_df["date"].min())
+        )
+    with col2:
+        max_value = st.number_input("Maximum value (exclusive)", value=None)
+        end_date = st.date_input(
+            "To date", value=date.fromisoformat(sessions_df["date"].max())
+        )
+
+    significant_only = st.checkbox("Significant responses only", value=True)
+
+    response_df = catalog.query_responses(
+        measure,
+        animal_ids=animal_ids,
+        odors=odors,
+        min_value=min_value,
+        max_value=max_value,
+        significant_only=significant_only,
+        start_date=str(start_date),
+        end_date=str(end_date),
+    )
+
+    st.write(f"{len(response_df)} matching response(s)")
+    st.dataframe(response_df, hide_index=True)
+    st.download_button(
+        "Download as .csv",
+        response_df.to_csv(index=False),
+        file_name="catalog_query.csv",
+        mime="text/csv",
+    )
+
+
+def main():
+    set_webapp_params()
+    initialize_states()
+    prompt_dir()
+
+    if st.session_state.catalog_dir:
+        try:
+            catalog = Catalog(st.session_state.catalog_dir)
+        except Exception:
+            st.error(
+                "Please make sure that the selected folder exists and that "
+                f"{CATALOG_FNAME} in it is a valid catalog."
+            )
+            return
+
+        try:
+            add_files(catalog)
+            query_catalog(catalog)
+        finally:
+            catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Contains functions for reading per-session acquisition metadata and for
+resampling traces acquired at different frame rates onto a common time base.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+# Acquisition parameters of the original imaging rig
+DEFAULT_FRAME_PERIOD = 0.0661
+DEFAULT_ONSET_FRAME = 33
+
+
+def read_acquisition_info(
+    session_path: str, solenoid_df: pd.DataFrame = None
+) -> dict:
+    """Reads the frame period and odor onset frame for an imaging session.
+
+    Looks for an ..._acquisition.json sidecar file in the session folder
+    first, then for "Frame period" and "Onset frame" columns in the
+    solenoid_order.csv file, and otherwise uses the original rig's values.
+
+    Args:
+        session_path: Path to the session folder.
+        solenoid_df: The solenoid order read from the solenoid file, if any.
+
+    Returns:
+        A dict with "frame_period" (s) and "onset_frame" keys.
+    """
+
+    acquisition_info = {
+        "frame_period": DEFAULT_FRAME_PERIOD,
+        "onset_frame": DEFAULT_ONSET_FRAME,
+    }
+
+    sidecar_files = [
+        x
+        for x in os.listdir(session_path)
+        if "acquisition" in x and x.endswith(".json") and "._" not in x
+    ]
+
+    if sidecar_files:
+        with open(Path(session_path, sidecar_files[0])) as f:
+            sidecar_info = json.load(f)
+        for key in acquisition_info:
+            if key in sidecar_info:
+                acquisition_info[key] = sidecar_info[key]
+
+    elif solenoid_df is not None:
+        if "Frame period" in solenoid_df.columns:
+            acquisition_info["frame_period"] = solenoid_df[
+                "Frame period"
+            ].iloc[0]
+        if "Onset frame" in solenoid_df.columns:
+            acquisition_info["onset_frame"] = solenoid_df["Onset frame"].iloc[
+                0
+            ]
+
+    acquisition_info["frame_period"] = float(acquisition_info["frame_period"])
+    acquisition_info["onset_frame"] = int(acquisition_info["onset_frame"])
+
+    return acquisition_info
+
+
+def scale_frames(n_frames: int, frame_period: float) -> int:
+    """Converts a number of frames on the original rig to the number of frames
+    spanning the same time at another frame period.
+
+    Args:
+        n_frames: The number of frames at DEFAULT_FRAME_PERIOD.
+        frame_period: The frame period (s) of the session.
+
+    Returns:
+        The equivalent number of frames.
+    """
+
+    return int(round(n_frames * DEFAULT_FRAME_PERIOD / frame_period))
+
+
+def make_target_frames(
+    n_frames: int,
+    frame_period: float,
+    onset_frame: int,
+    target_period: float,
+    target_onset_frame: int,
+) -> np.ndarray:
+    """Makes the frame numbers of the common time base that cover the same
+    post-onset time as the original recording.
+
+    Args:
+        n_frames: The number of frames in the original trace.
+        frame_period: The original frame period (s).
+        onset_frame: The original odor onset frame.
+        target_period: The frame period (s) of the common time base.
+        target_onset_frame: The odor onset frame of the common time base.
+
+    Returns:
+        An array of 1-based target frame numbers.
+    """
+
+    post_onset_time = (n_frames - onset_frame) * frame_period
+    n_target_frames = target_onset_frame + int(
+        np.floor(post_onset_time / target_period + 1e-9)
+    )
+
+    return np.arange(1, n_target_frames + 1)
+
+
+def resample_traces(
+    traces: np.ndarray,
+    frame_period: float,
+    onset_frame: int,
+    target_period: float,
+    target_onset_frame: int,
+) -> np.ndarray:
+    """Linearly interpolates many traces onto a common time base at once.
+
+    Times are aligned on odor onset. The interpolation indices and weights
+    are calculated once and applied to every trace in one operation. Target
+    times outside the recording hold the first or last value.
+
+    Args:
+        traces: Array with shape (n_frames, n_traces), one trace per column.
+        frame_period: The original frame period (s).
+        onset_frame: The original odor onset frame.
+        target_period: The frame period (s) of the common time base.
+        target_onset_frame: The odor onset frame of the common time base.
+
+    Returns:
+        Array with shape (n_target_frames, n_traces).
+    """
+
+    n_frames = traces.shape[0]
+    target_frames = make_target_frames(
+        n_frames, frame_period, onset_frame, target_period, target_onset_frame
+    )
+
+    if n_frames == 1:
+        return np.repeat(traces, len(target_frames), axis=0)
+
+    # target times expressed as (fractional) positions in the original trace
+    positions = (
+        (target_frames - target_onset_frame) * target_period / frame_period
+        + onset_frame
+        - 1
+    )
+    positions = np.clip(positions, 0, n_frames - 1)
+
+    left_idx = np.minimum(np.floor(positions).astype(int), n_frames - 2)
+    weights = (positions - left_idx)[:, None]
+
+    return traces[left_idx] * (1 - weights) + traces[left_idx + 1] * weights
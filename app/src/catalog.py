@@ -0,0 +1,332 @@
+"""Contains the SQLite catalog of analyzed imaging sessions, which holds every
+sample's analysis values for each odor so that they can be queried across
+sessions without re-compiling a dataset.
+"""
+
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CATALOG_FNAME = "roi_catalog.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY,
+    exp_name TEXT NOT NULL UNIQUE,
+    date TEXT NOT NULL,
+    animal_id TEXT NOT NULL,
+    roi TEXT NOT NULL,
+    sample_type TEXT,
+    checksum TEXT
+);
+CREATE TABLE IF NOT EXISTS responses (
+    session_id INTEGER NOT NULL
+        REFERENCES sessions(session_id) ON DELETE CASCADE,
+    sample INTEGER NOT NULL,
+    odor TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    value REAL,
+    significant INTEGER NOT NULL,
+    PRIMARY KEY (session_id, sample, odor, measure)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sessions_animal ON sessions(animal_id, date);
+CREATE INDEX IF NOT EXISTS idx_sessions_date ON sessions(date);
+CREATE INDEX IF NOT EXISTS idx_responses_odor
+    ON responses(odor, measure, significant, value);
+CREATE INDEX IF NOT EXISTS idx_responses_measure
+    ON responses(measure, significant, value);
+"""
+
+
+def make_response_df(data_dict: dict) -> pd.DataFrame:
+    """Converts the analysis values of one session into one row per sample,
+    odor and measurement.
+
+    Args:
+        data_dict: Dict with sample names (e.g. "Cell 1") as keys and analysis
+            DataFrames as values, either from ExperimentFile.import_excel()
+            or from RawFolder.analyze_signal().
+
+    Returns:
+        A DataFrame with sample, odor, measure, value and significant columns.
+            Responses are significant if they have a measured latency.
+    """
+
+    sample_dfs = {}
+    for sample_name, analysis_df in data_dict.items():
+        # analyze_signal() output keeps the odor names in an "Odor" row
+        if "Odor" in analysis_df.index:
+            analysis_df = analysis_df.set_axis(
+                analysis_df.loc["Odor"].tolist(), axis=1
+            ).drop(index="Odor")
+        sample_dfs[int(sample_name.split(" ")[-1])] = analysis_df.drop(
+            index="Significant response?", errors="ignore"
+        )
+
+    all_df = pd.concat(sample_dfs, names=["sample", "measure"])
+    values = all_df.apply(pd.to_numeric, errors="coerce").astype(float)
+    values.columns.name = "odor"
+
+    response_df = values.stack(dropna=False).rename("value").reset_index()
+
+    significant = (
+        values.xs("Latency (s)", level="measure")
+        .notna()
+        .stack()
+        .rename("significant")
+    )
+    response_df = response_df.join(significant, on=["sample", "odor"])
+
+    return response_df[["sample", "odor", "measure", "value", "significant"]]
+
+
+class Catalog(object):
+    """An indexed SQLite database of analyzed sessions, samples, odors and
+    measurements.
+
+    Attributes:
+        db_path (Path): The path of the SQLite database file.
+        conn (sqlite3.Connection): The connection to the database.
+    """
+
+    def __init__(self, db_path: str):
+        """Opens (and creates, if needed) the catalog database.
+
+        Args:
+            db_path: The path of the database file, or of a folder to keep a
+                roi_catalog.sqlite file in.
+        """
+
+        db_path = Path(db_path)
+        if db_path.is_dir():
+            db_path = Path(db_path, CATALOG_FNAME)
+
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the connection to the database."""
+
+        self.conn.close()
+
+    def get_checksum(self, exp_name: str) -> str | None:
+        """Gets the checksum of the file a session was added from.
+
+        Args:
+            exp_name: The name of the session.
+
+        Returns:
+            The checksum, or None if the session isn't in the catalog.
+        """
+
+        row = self.conn.execute(
+            "SELECT checksum FROM sessions WHERE exp_name = ?", (exp_name,)
+        ).fetchone()
+
+        return row[0] if row else None
+
+    def add_session(
+        self,
+        exp_name: str,
+        data_dict: dict,
+        checksum: str = None,
+    ):
+        """Adds a session's analysis values to the catalog, replacing the
+        session if it's already there.
+
+        Args:
+            exp_name: The session name, e.g. "YYMMDD_123456-7-8_ROIX".
+            data_dict: Dict with sample names as keys and analysis DataFrames
+                as values, see make_response_df().
+            checksum: The checksum of the _analysis.xlsx file, if any.
+        """
+
+        date, animal_id, roi = exp_name.split("_")[0:3]
+        sample_type = next(iter(data_dict)).split(" ")[0]
+        response_df = make_response_df(data_dict)
+
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM sessions WHERE exp_name = ?", (exp_name,)
+            )
+            session_id = self.conn.execute(
+                "INSERT INTO sessions (exp_name, date, animal_id, roi, "
+                "sample_type, checksum) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    exp_name,
+                    datetime.strptime(date, "%y%m%d").strftime("%Y-%m-%d"),
+                    animal_id,
+                    roi,
+                    sample_type,
+                    checksum,
+                ),
+            ).lastrowid
+
+            values = response_df["value"].to_numpy()
+            self.conn.executemany(
+                "INSERT INTO responses (session_id, sample, odor, measure, "
+                "value, significant) VALUES (?, ?, ?, ?, ?, ?)",
+                zip(
+                    [session_id] * len(response_df),
+                    response_df["sample"].tolist(),
+                    response_df["odor"].tolist(),
+                    response_df["measure"].tolist(),
+                    np.where(np.isnan(values), None, values).tolist(),
+                    response_df["significant"].astype(int).tolist(),
+                ),
+            )
+
+    def add_files(self, files: list, progress_bar=None) -> int:
+        """Adds the sessions from _analysis.xlsx files, skipping files that
+        are already in the catalog unchanged.
+
+        Args:
+            files: A list of _analysis.xlsx files uploaded to Streamlit.
+            progress_bar: Optional stqdm/tqdm progress bar to update.
+
+        Returns:
+            The number of sessions added or replaced.
+        """
+
+        # imported here as experiment.py depends on streamlit
+        from src.experiment import ExperimentFile
+
+        n_added = 0
+        for file in files:
+            experiment_file = ExperimentFile(file, "acute")
+            if self.get_checksum(experiment_file.exp_name) != (
+                experiment_file.file_hash
+            ):
+                self.add_session(
+                    experiment_file.exp_name,
+                    experiment_file.import_excel(),
+                    experiment_file.file_hash,
+                )
+                n_added += 1
+            if progress_bar is not None:
+                progress_bar.update(1)
+
+        return n_added
+
+    def remove_sessions(self, exp_names: list):
+        """Removes sessions, and their responses, from the catalog.
+
+        Args:
+            exp_names: The names of the sessions to remove.
+        """
+
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM sessions WHERE exp_name = ?",
+                [(x,) for x in exp_names],
+            )
+
+    def list_sessions(self) -> pd.DataFrame:
+        """Lists the sessions in the catalog.
+
+        Returns:
+            A DataFrame with one row per session.
+        """
+
+        return pd.read_sql_query(
+            "SELECT exp_name, date, animal_id, roi, sample_type "
+            "FROM sessions ORDER BY date, animal_id, roi",
+            self.conn,
+        )
+
+    def get_options(self) -> dict:
+        """Gets the animal IDs, odors and measures in the catalog.
+
+        Returns:
+            A dict of sorted lists with "animal_ids", "odors" and "measures"
+                keys.
+        """
+
+        return {
+            key: [
+                row[0]
+                for row in self.conn.execute(
+                    f"SELECT DISTINCT {column} FROM {table} ORDER BY {column}"
+                )
+            ]
+            for key, column, table in [
+                ("animal_ids", "animal_id", "sessions"),
+                ("odors", "odor", "responses"),
+                ("measures", "measure", "responses"),
+            ]
+        }
+
+    def query_responses(
+        self,
+        measure: str,
+        animal_ids: list = None,
+        odors: list = None,
+        min_value: float = None,
+        max_value: float = None,
+        significant_only: bool = True,
+        start_date: str = None,
+        end_date: str = None,
+    ) -> pd.DataFrame:
+        """Finds the responses matching the given filters, e.g. all samples
+        from animal X responding to odor 4 with a latency under 1 s.
+
+        Args:
+            measure: The measurement to filter and return, e.g. "Latency (s)".
+            animal_ids: Only include these animals. Includes all by default.
+            odors: Only include these odors. Includes all by default.
+            min_value: Only include values at or above this.
+            max_value: Only include values below this.
+            significant_only: Whether to only include significant responses.
+            start_date: Only include sessions on or after this YYYY-MM-DD date.
+            end_date: Only include sessions on or before this YYYY-MM-DD date.
+
+        Returns:
+            A DataFrame with one row per matching session, sample and odor.
+        """
+
+        conditions = ["r.measure = ?"]
+        params = [measure]
+
+        if animal_ids:
+            conditions.append(
+                f"s.animal_id IN ({', '.join('?' * len(animal_ids))})"
+            )
+            params.extend(animal_ids)
+        if odors:
+            conditions.append(f"r.odor IN ({', '.join('?' * len(odors))})")
+            params.extend(odors)
+        if min_value is not None:
+            conditions.append("r.value >= ?")
+            params.append(min_value)
+        if max_value is not None:
+            conditions.append("r.value < ?")
+            params.append(max_value)
+        if significant_only:
+            conditions.append("r.significant = 1")
+        if start_date:
+            conditions.append("s.date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("s.date <= ?")
+            params.append(end_date)
+
+        query = (
+            "SELECT s.date AS Date, s.animal_id AS 'Animal ID', s.roi AS ROI, "
+            "s.sample_type AS 'Sample type', r.sample AS Sample, "
+            "r.odor AS Odor, r.value AS Value, "
+            "r.significant AS Significant "
+            "FROM responses r JOIN sessions s USING (session_id) "
+            f"WHERE {' AND '.join(conditions)} "
+            "ORDER BY s.date, s.animal_id, s.roi, r.sample, r.odor"
+        )
+        response_df = pd.read_sql_query(query, self.conn, params=params)
+        response_df["Significant"] = response_df["Significant"].astype(bool)
+
+        return response_df.rename(columns={"Value": measure})
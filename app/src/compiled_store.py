@@ -0,0 +1,158 @@
+"""Contains the on-disk store of compiled sessions that is kept next to the
+compiled_dataset_analysis.xlsx summary file, so that sessions can be added to
+or replaced in a compiled dataset without re-importing every session.
+"""
+
+import json
+import os
+import pickle
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+
+class CompiledStore(object):
+    """Stores the compiled values of each session of an acute or chronic
+    dataset as one file per session, plus a manifest of the sessions and the
+    checksums of the .xlsx files they were compiled from.
+
+    Attributes:
+        store_dir (Path): The directory holding the store.
+        dataset_type (str): Chronic or acute experiment type.
+        manifest (dict): The sessions in the store, in the order they were
+            added, with their checksums.
+    """
+
+    def __init__(self, dir_path: str, dataset_type: str):
+        """Initializes an instance of CompiledStore() for the dataset.
+
+        Args:
+            dir_path: The directory holding the summary .xlsx file.
+            dataset_type: Chronic or acute experiment type.
+        """
+
+        self.store_dir = Path(dir_path, f"compiled_{dataset_type}_store")
+        self.dataset_type = dataset_type
+        self.manifest = self.load_manifest()
+
+    @property
+    def _manifest_path(self) -> Path:
+        """The path of the manifest file."""
+
+        return Path(self.store_dir, "manifest.json")
+
+    @property
+    def exp_names(self) -> list:
+        """The names of the sessions in the store, in dataset order. Chronic
+        sessions are sorted by date."""
+
+        exp_names = list(self.manifest["sessions"])
+        if self.dataset_type == "chronic":
+            exp_names = sorted(
+                exp_names,
+                key=lambda x: datetime.strptime(x.split("_")[0], "%y%m%d"),
+            )
+
+        return exp_names
+
+    def load_manifest(self) -> dict:
+        """Loads the manifest, or makes an empty one if there is no store.
+
+        Returns:
+            A dict with the dataset type and a dict of session names and
+            checksums.
+        """
+
+        if self._manifest_path.is_file():
+            with open(self._manifest_path) as f:
+                return json.load(f)
+
+        return {"dataset_type": self.dataset_type, "sessions": {}}
+
+    def save_manifest(self):
+        """Saves the manifest."""
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        with open(self._manifest_path, "w") as f:
+            json.dump(self.manifest, f, indent=4)
+
+    def _get_session_path(self, exp_name: str) -> Path:
+        """Gets the path of the file holding one session."""
+
+        return Path(self.store_dir, f"{exp_name}.pkl")
+
+    def get_changed_files(self, files: list, checksums: list) -> list:
+        """Finds the uploaded files that are new to the store or differ from
+        the version already in it.
+
+        Args:
+            files: A list of .xlsx files uploaded to Streamlit.
+            checksums: The checksum of each file.
+
+        Returns:
+            The files that need to be compiled.
+        """
+
+        changed_files = []
+        for file, checksum in zip(files, checksums):
+            exp_name = "_".join(file.name.split("_")[0:3])
+            if self.manifest["sessions"].get(exp_name) != checksum:
+                changed_files.append(file)
+
+        return changed_files
+
+    def put_sessions(self, sessions: list):
+        """Adds sessions to the store, replacing any session with the same
+        name.
+
+        Args:
+            sessions: The compiled sessions, made by compile_file().
+        """
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        for session in sessions:
+            # writes to a temporary file first so an interrupted write
+            # doesn't corrupt the stored session
+            with tempfile.NamedTemporaryFile(
+                dir=self.store_dir, suffix=".tmp", delete=False
+            ) as f:
+                pickle.dump(session, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, self._get_session_path(session["exp_name"]))
+            self.manifest["sessions"][session["exp_name"]] = session[
+                "checksum"
+            ]
+
+        self.save_manifest()
+
+    def remove_sessions(self, exp_names: list):
+        """Removes sessions from the store.
+
+        Args:
+            exp_names: The names of the sessions to remove.
+        """
+
+        for exp_name in exp_names:
+            self.manifest["sessions"].pop(exp_name, None)
+            self._get_session_path(exp_name).unlink(missing_ok=True)
+
+        self.save_manifest()
+
+    def clear(self):
+        """Removes all sessions from the store."""
+
+        self.remove_sessions(list(self.manifest["sessions"]))
+
+    def get_sessions(self) -> list:
+        """Loads all sessions in the store.
+
+        Returns:
+            The compiled sessions, in dataset order.
+        """
+
+        sessions = []
+        for exp_name in self.exp_names:
+            with open(self._get_session_path(exp_name), "rb") as f:
+                sessions.append(pickle.load(f))
+
+        return sessions
@@ -0,0 +1,255 @@
+"""Contains functions for calculating, saving and displaying pairwise
+signal and noise correlations between samples from one imaging session."""
+
+import numpy as np
+import pandas as pd
+
+
+def make_trial_responses(
+    all_data_df: pd.DataFrame,
+    samples: list,
+    baseline_frames: tuple = (1, 30),
+    response_frames: tuple = (34, 300),
+) -> tuple[np.ndarray, np.ndarray]:
+    """Calculates the response of every sample on every trial.
+
+    The response is the mean fluorescence during the response window minus
+    the mean fluorescence during the baseline window, using the same windows
+    as the avg_means analysis.
+
+    Args:
+        all_data_df: A DataFrame holding fluorescence values from all frames
+            and trials for each odor, from all .txt files.
+        samples: The sample column names.
+        baseline_frames: The first and last frame of the baseline window.
+        response_frames: The first and last frame of the response window.
+
+    Returns:
+        responses: Array with shape (n_trials, n_samples).
+        trial_odors: Array with the odor delivered on each trial.
+    """
+
+    frames = all_data_df["Frame"]
+    trial_groups = all_data_df.groupby("Trial", sort=True)
+
+    baseline = (
+        all_data_df[frames.between(*baseline_frames)]
+        .groupby("Trial", sort=True)[samples]
+        .mean()
+    )
+    response = (
+        all_data_df[frames.between(*response_frames)]
+        .groupby("Trial", sort=True)[samples]
+        .mean()
+    )
+    trial_odors = trial_groups["Odor"].first().to_numpy()
+
+    return (response - baseline).to_numpy(dtype=float), trial_odors
+
+
+def calc_signal_responses(
+    responses: np.ndarray, trial_odors: np.ndarray
+) -> np.ndarray:
+    """Averages trial responses by odor to get each sample's tuning curve.
+
+    Args:
+        responses: Array with shape (n_trials, n_samples).
+        trial_odors: Array with the odor delivered on each trial.
+
+    Returns:
+        Array with shape (n_odors, n_samples).
+    """
+
+    odors, odor_codes = np.unique(trial_odors, return_inverse=True)
+    sums = np.zeros((len(odors), responses.shape[1]))
+    np.add.at(sums, odor_codes, responses)
+    counts = np.bincount(odor_codes, minlength=len(odors))
+
+    return sums / counts[:, None]
+
+
+def calc_noise_residuals(
+    responses: np.ndarray, trial_odors: np.ndarray
+) -> np.ndarray:
+    """Removes the odor-evoked mean from every trial response.
+
+    Residuals are z-scored within each odor so that odors with larger
+    responses don't dominate the pooled noise correlation.
+
+    Args:
+        responses: Array with shape (n_trials, n_samples).
+        trial_odors: Array with the odor delivered on each trial.
+
+    Returns:
+        Array of residuals with shape (n_trials, n_samples).
+    """
+
+    residuals = np.empty_like(responses)
+
+    for odor in np.unique(trial_odors):
+        odor_trials = trial_odors == odor
+        odor_responses = responses[odor_trials]
+        std = odor_responses.std(axis=0)
+        std[std == 0] = 1
+        residuals[odor_trials] = (
+            odor_responses - odor_responses.mean(axis=0)
+        ) / std
+
+    return residuals
+
+
+def blocked_corrcoef(
+    observations: np.ndarray,
+    block_size: int = 512,
+    dtype: type = np.float64,
+    out: np.ndarray = None,
+) -> np.ndarray:
+    """Calculates the Pearson correlation between all pairs of columns.
+
+    Columns are standardized once, then the correlation matrix is filled in
+    square blocks so that only one block product is held in memory at a time
+    on top of the output.
+
+    Args:
+        observations: Array with shape (n_observations, n_variables).
+        block_size: The number of variables per block.
+        dtype: np.float64, or np.float32 to halve memory use.
+        out: Optional preallocated (n_variables, n_variables) array, e.g. a
+            np.memmap, to write the result into.
+
+    Returns:
+        The (n_variables, n_variables) correlation matrix. Variables with no
+        variance have NaN correlations.
+    """
+
+    n_obs, n_vars = observations.shape
+    z = observations.astype(dtype, copy=True)
+    z -= z.mean(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z /= np.sqrt((z**2).sum(axis=0))
+
+    if out is None:
+        out = np.empty((n_vars, n_vars), dtype=dtype)
+
+    for row_start in range(0, n_vars, block_size):
+        row_end = min(row_start + block_size, n_vars)
+        for col_start in range(row_start, n_vars, block_size):
+            col_end = min(col_start + block_size, n_vars)
+            block = z[:, row_start:row_end].T @ z[:, col_start:col_end]
+            out[row_start:row_end, col_start:col_end] = block
+            out[col_start:col_end, row_start:row_end] = block.T
+
+    return out
+
+
+def calc_correlations(
+    all_data_df: pd.DataFrame,
+    samples: list,
+    use_float32: bool = False,
+    baseline_frames: tuple = (1, 30),
+    response_frames: tuple = (34, 300),
+) -> tuple[np.ndarray, np.ndarray]:
+    """A wrapper for calculating signal and noise correlation matrices.
+
+    Args:
+        all_data_df: A DataFrame holding fluorescence values from all frames
+            and trials for each odor, from all .txt files.
+        samples: The sample column names.
+        use_float32: Whether to calculate in float32 instead of float64.
+        baseline_frames: The first and last frame of the baseline window.
+        response_frames: The first and last frame of the response window.
+
+    Returns:
+        signal_corr: Sample × sample correlations of odor tuning curves.
+        noise_corr: Sample × sample correlations of trial-to-trial residuals.
+    """
+
+    dtype = np.float32 if use_float32 else np.float64
+    responses, trial_odors = make_trial_responses(
+        all_data_df, samples, baseline_frames, response_frames
+    )
+
+    signal_corr = blocked_corrcoef(
+        calc_signal_responses(responses, trial_odors), dtype=dtype
+    )
+    noise_corr = blocked_corrcoef(
+        calc_noise_residuals(responses, trial_odors), dtype=dtype
+    )
+
+    return signal_corr, noise_corr
+
+
+def save_correlations(
+    path: str,
+    signal_corr: np.ndarray,
+    noise_corr: np.ndarray,
+    samples: list,
+):
+    """Saves the correlation matrices to a compressed .npz file.
+
+    Args:
+        path: The path of the .npz file to save.
+        signal_corr: The signal correlation matrix.
+        noise_corr: The noise correlation matrix.
+        samples: The sample names, in matrix order.
+    """
+
+    np.savez_compressed(
+        path,
+        signal=signal_corr,
+        noise=noise_corr,
+        samples=np.array(samples),
+    )
+
+
+def load_correlations(file: str) -> dict:
+    """Loads the correlation matrices saved by save_correlations().
+
+    Args:
+        file: The path or uploaded file of the .npz file.
+
+    Returns:
+        A dict with "Signal" and "Noise" matrices and "samples" names.
+    """
+
+    with np.load(file) as npz_file:
+        corr_dict = {
+            "Signal": npz_file["signal"],
+            "Noise": npz_file["noise"],
+            "samples": npz_file["samples"].tolist(),
+        }
+
+    return corr_dict
+
+
+def downsample_matrix(
+    matrix: np.ndarray, max_size: int
+) -> tuple[np.ndarray, int]:
+    """Averages square blocks of a matrix so that it fits in max_size pixels.
+
+    Args:
+        matrix: The square matrix to downsample.
+        max_size: The maximum number of rows/columns to display.
+
+    Returns:
+        The downsampled matrix and the number of samples per block.
+    """
+
+    n_vars = matrix.shape[0]
+    bin_size = int(np.ceil(n_vars / max_size))
+    if bin_size <= 1:
+        return matrix, 1
+
+    # pads with NaN so the matrix divides evenly into blocks
+    n_bins = int(np.ceil(n_vars / bin_size))
+    padded = np.full((n_bins * bin_size, n_bins * bin_size), np.nan)
+    padded[:n_vars, :n_vars] = matrix
+
+    blocks = padded.reshape(n_bins, bin_size, n_bins, bin_size)
+    valid = ~np.isnan(blocks)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        downsampled = np.where(valid, blocks, 0).sum(axis=(1, 3)) / valid.sum(
+            axis=(1, 3)
+        )
+
+    return downsampled, bin_size
@@ -0,0 +1,425 @@
+"""Contains the columnar in-memory model of a compiled acute or chronic
+dataset, used for plotting and for the compiled_dataset_analysis.xlsx
+summary file.
+"""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+from natsort import natsorted
+
+
+def make_long_df(long_pieces: list) -> pd.DataFrame:
+    """Combines the long-format pieces from every file into one DataFrame.
+
+    Experiment, Date, Animal ID, ROI, Sample, Odor and Measure are stored as
+    categoricals. Experiments keep their loading order, and samples and odors
+    are ordered numerically.
+
+    Args:
+        long_pieces: The DataFrames made by ExperimentFile.sort_data().
+
+    Returns:
+        The combined long-format DataFrame.
+    """
+
+    long_df = pd.concat(long_pieces, ignore_index=True)
+
+    for col in ["Experiment", "Date", "Animal ID", "ROI", "Measure"]:
+        long_df[col] = pd.Categorical(
+            long_df[col], categories=long_df[col].unique(), ordered=True
+        )
+
+    long_df["Sample"] = pd.Categorical(
+        long_df["Sample"],
+        categories=sorted(long_df["Sample"].unique()),
+        ordered=True,
+    )
+    long_df["Odor"] = pd.Categorical(
+        long_df["Odor"],
+        categories=natsorted(long_df["Odor"].unique()),
+        ordered=True,
+    )
+
+    return long_df
+
+
+def make_fingerprint(sessions: list, dataset_type: str) -> str:
+    """Makes the hash identifying a compiled dataset.
+
+    Args:
+        sessions: The compiled sessions, made by compile_file(), in dataset
+            order.
+        dataset_type: Chronic or acute experiment type.
+
+    Returns:
+        A hash of the dataset type and the names and checksums of the
+            sessions.
+    """
+
+    checksums = [(x["exp_name"], x["checksum"]) for x in sessions]
+
+    return hashlib.sha256(repr((dataset_type, checksums)).encode()).hexdigest()
+
+
+class CompiledDataset(object):
+    """Holds every session of a compiled dataset as flat arrays instead of
+    one DataFrame per session.
+
+    All values are kept in one long-format table with categorical columns.
+    The significant responses that are plotted are kept as a 2D array with
+    one row per response and one column per measurement, sorted by odor and
+    then by plotting order, with the offsets of each odor and experiment
+    computed once so that plotting only slices arrays.
+
+    Attributes:
+        dataset_type (str): Chronic or acute experiment type.
+        sample_type (str): The sample type, e.g. "Cell", "Glomerulus", or
+            "Grid".
+        measures (list): The measurements that are plotted.
+        long_df (pd.DataFrame): All values, with one row per experiment,
+            sample, odor and measurement.
+        exp_names (list): The experiment names, in dataset order.
+        exp_animals (list): The animal ID of each experiment.
+        sig_animal_ids (list): The animals with significant responses, in
+            plotting order.
+        timepoints (dict): The timepoint position of each experiment,
+            starting from 1. For chronic only.
+        fingerprint (str): A hash of the dataset type and the names and
+            checksums of its sessions, identifying the dataset in caches.
+    """
+
+    def __init__(self, sessions: list, dataset_type: str, measures: list):
+        """Initializes an instance of CompiledDataset() from the compiled
+        sessions.
+
+        Args:
+            sessions: The compiled sessions, made by compile_file(), in
+                dataset order.
+            dataset_type: Chronic or acute experiment type.
+            measures: The measurement names, in the row order of each
+                session's sig_data_df.
+        """
+
+        self.dataset_type = dataset_type
+        self.sample_type = sessions[-1]["sample_type"]
+        self.measures = measures
+        self.long_df = make_long_df([x["long_df"] for x in sessions])
+
+        self.exp_names = [x["exp_name"] for x in sessions]
+        self.exp_animals = [x["animal_id"] for x in sessions]
+        self.timepoints = {}
+        if dataset_type == "chronic":
+            self.timepoints = {
+                exp_name: exp_ct + 1
+                for exp_ct, exp_name in enumerate(self.exp_names)
+            }
+
+        self.fingerprint = make_fingerprint(sessions, dataset_type)
+
+        self._measure_dfs = None
+        self._summary_stats = {}
+        self._make_sig_arrays(sessions)
+
+    def _make_sig_arrays(self, sessions: list):
+        """Flattens the significant responses of every session into arrays
+        sorted by odor, then animal (acute only), then experiment.
+
+        Args:
+            sessions: The compiled sessions, in dataset order.
+        """
+
+        self.odors = list(self.long_df["Odor"].cat.categories)
+        odor_codes = {odor: code for code, odor in enumerate(self.odors)}
+
+        self.sig_animal_ids = []
+        exp_codes, odor_code_pieces, value_pieces = [], [], []
+
+        for exp_ct, session in enumerate(sessions):
+            sig_data_df = session["sig_data_df"]
+            if sig_data_df.empty:
+                continue
+            if session["animal_id"] not in self.sig_animal_ids:
+                self.sig_animal_ids.append(session["animal_id"])
+
+            exp_codes.append(np.full(sig_data_df.shape[1], exp_ct))
+            odor_code_pieces.append(
+                np.array([odor_codes[x] for x in sig_data_df.columns])
+            )
+            value_pieces.append(
+                sig_data_df.loc[self.measures].to_numpy(dtype=float).T
+            )
+
+        if not value_pieces:
+            exp_codes = odor_code_pieces = [np.empty(0, dtype=int)]
+            value_pieces = [np.empty((0, len(self.measures)))]
+
+        exp_codes = np.concatenate(exp_codes).astype(np.int32)
+        odor_codes = np.concatenate(odor_code_pieces).astype(np.int32)
+        values = np.concatenate(value_pieces)
+
+        # acute plots group experiments by animal, in order of appearance
+        animal_ranks = {x: rank for rank, x in enumerate(self.sig_animal_ids)}
+        exp_ranks = np.array(
+            [animal_ranks.get(x, -1) for x in self.exp_animals], dtype=int
+        )
+        if self.dataset_type == "acute":
+            order = np.lexsort((exp_codes, exp_ranks[exp_codes], odor_codes))
+        else:
+            order = np.lexsort((exp_codes, odor_codes))
+
+        self._sig_exp_codes = exp_codes[order]
+        self._sig_values = values[order]
+
+        # start and end rows of each odor, and start rows of each experiment
+        # within the odor
+        sorted_odor_codes = odor_codes[order]
+        self._odor_bounds = np.searchsorted(
+            sorted_odor_codes, np.arange(len(self.odors) + 1)
+        )
+        self._group_starts = {}
+        for odor_code, odor in enumerate(self.odors):
+            start, stop = self._odor_bounds[odor_code : odor_code + 2]
+            odor_exp_codes = self._sig_exp_codes[start:stop]
+            self._group_starts[odor] = np.flatnonzero(
+                np.diff(odor_exp_codes, prepend=-1)
+            )
+
+    def _get_odor_rows(self, odor: str) -> tuple[int, int]:
+        """Gets the start and end rows of an odor's significant responses."""
+
+        if odor not in self._group_starts:
+            return 0, 0
+        odor_code = self.odors.index(odor)
+
+        return tuple(self._odor_bounds[odor_code : odor_code + 2])
+
+    def get_odor_groups(self, odor: str) -> list:
+        """Gets the experiments with significant responses for an odor.
+
+        Args:
+            odor: The odor, e.g. "Odor 1".
+
+        Returns:
+            A list of (animal ID, experiment name) tuples, in plotting order.
+        """
+
+        start, _ = self._get_odor_rows(odor)
+
+        return [
+            (self.exp_animals[exp_code], self.exp_names[exp_code])
+            for exp_code in self._sig_exp_codes[
+                start + self._group_starts.get(odor, np.empty(0, dtype=int))
+            ]
+        ]
+
+    def get_odor_values(self, odor: str, measure: str) -> dict:
+        """Gets the significant response values of one measurement for an
+        odor, grouped by experiment.
+
+        Args:
+            odor: The odor, e.g. "Odor 1".
+            measure: The measurement, e.g. "Latency (s)".
+
+        Returns:
+            A dict with experiment names as keys, in plotting order, and
+                arrays of the values from each sample as values.
+        """
+
+        start, stop = self._get_odor_rows(odor)
+        if start == stop:
+            return {}
+
+        values = self._sig_values[start:stop, self.measures.index(measure)]
+        groups = np.split(values, self._group_starts[odor][1:])
+
+        return {
+            exp_name: group_values
+            for (_, exp_name), group_values in zip(
+                self.get_odor_groups(odor), groups
+            )
+        }
+
+    def get_odor_means(self, odor: str, measure: str) -> dict:
+        """Gets the mean significant response value of one measurement for
+        an odor in each experiment.
+
+        Args:
+            odor: The odor, e.g. "Odor 1".
+            measure: The measurement, e.g. "Latency (s)".
+
+        Returns:
+            A dict with experiment names as keys and mean values as values.
+        """
+
+        start, stop = self._get_odor_rows(odor)
+        if start == stop:
+            return {}
+
+        values = self._sig_values[start:stop, self.measures.index(measure)]
+        group_ids = np.zeros(stop - start, dtype=int)
+        group_ids[self._group_starts[odor][1:]] = 1
+        group_ids = np.cumsum(group_ids)
+        means = np.bincount(group_ids, weights=values) / np.bincount(
+            group_ids
+        )
+
+        return {
+            exp_name: mean
+            for (_, exp_name), mean in zip(self.get_odor_groups(odor), means)
+        }
+
+    def count_odor_responses(self, odor: str) -> int:
+        """Counts the significant responses to an odor, i.e. the number of
+        points in its plots.
+
+        Args:
+            odor: The odor, e.g. "Odor 1".
+
+        Returns:
+            The number of significant responses.
+        """
+
+        start, stop = self._get_odor_rows(odor)
+
+        return int(stop - start)
+
+    def get_summary_stats(self, measure: str) -> pd.DataFrame:
+        """Computes summary statistics of one measurement's significant
+        responses for every odor and experiment in one groupby. The
+        statistics are computed once per measurement and reused.
+
+        Args:
+            measure: The measurement, e.g. "Latency (s)".
+
+        Returns:
+            A DataFrame with (Odor, Experiment) rows in plotting order, and
+                count, mean, sem, median, min, q1, q3 and max columns.
+        """
+
+        if measure in self._summary_stats:
+            return self._summary_stats[measure]
+
+        odor_codes = np.repeat(
+            np.arange(len(self.odors)), np.diff(self._odor_bounds)
+        )
+        values = pd.Series(
+            self._sig_values[:, self.measures.index(measure)],
+            index=pd.MultiIndex.from_arrays(
+                [
+                    np.array(self.odors, dtype=object)[odor_codes],
+                    np.array(self.exp_names, dtype=object)[
+                        self._sig_exp_codes
+                    ],
+                ],
+                names=["Odor", "Experiment"],
+            ),
+        )
+
+        # rows are already sorted in plotting order
+        grouped = values.groupby(level=["Odor", "Experiment"], sort=False)
+        stats = grouped.agg(["count", "mean", "sem", "median", "min", "max"])
+        quantiles = grouped.quantile([0.25, 0.75]).unstack()
+        stats["q1"] = quantiles[0.25]
+        stats["q3"] = quantiles[0.75]
+
+        self._summary_stats[measure] = stats
+
+        return stats
+
+    def get_odor_stats(self, odor: str, measure: str) -> pd.DataFrame:
+        """Gets the summary statistics of one measurement for an odor.
+
+        Args:
+            odor: The odor, e.g. "Odor 1".
+            measure: The measurement, e.g. "Latency (s)".
+
+        Returns:
+            A DataFrame with experiments as rows, in plotting order, and the
+                columns made by get_summary_stats().
+        """
+
+        stats = self.get_summary_stats(measure)
+        if odor not in stats.index.get_level_values("Odor"):
+            return stats.iloc[:0].droplevel("Odor")
+
+        return stats.xs(odor, level="Odor")
+
+    def get_measurement_dfs(self) -> list:
+        """Makes one wide DataFrame per measurement from the long-format
+        data. The DataFrames are made once and reused.
+
+        Returns:
+            A list of DataFrames, one for each measurement, with samples as
+                rows, (measurement, odor) columns, and Date (chronic) or
+                Animal ID and ROI (acute) columns.
+        """
+
+        if self._measure_dfs is not None:
+            return self._measure_dfs
+
+        if self.dataset_type == "chronic":
+            label_cols = ["Date"]
+        else:
+            label_cols = ["Animal ID", "ROI"]
+
+        df_list = []
+
+        for measure, measure_long_df in self.long_df.groupby(
+            "Measure", sort=True, observed=True
+        ):
+            measure_df = measure_long_df.pivot(
+                index=["Experiment", "Sample"], columns="Odor", values="Value"
+            )
+            measure_df.columns = pd.MultiIndex.from_product(
+                [[measure], measure_df.columns.astype(str).tolist()]
+            )
+
+            # adds experiment labels back as columns
+            exp_labels = (
+                measure_long_df.drop_duplicates("Experiment")
+                .set_index("Experiment")[label_cols]
+                .astype(str)
+            )
+            exp_names = measure_df.index.get_level_values("Experiment")
+            for label_col in label_cols:
+                measure_df[label_col] = exp_labels.loc[
+                    exp_names, label_col
+                ].to_numpy()
+
+            measure_df.index = pd.Index(
+                measure_df.index.get_level_values("Sample").astype(int),
+                name=self.sample_type,
+            )
+            df_list.append(measure_df)
+
+        self._measure_dfs = df_list
+
+        return df_list
+
+
+def make_dataset(
+    sessions: list, dataset_type: str, measures: list
+) -> CompiledDataset:
+    """Makes a CompiledDataset with its measurement DataFrames and the
+    summary statistics of every measurement already made, so that it
+    doesn't change once it's shared between user sessions.
+
+    Args:
+        sessions: The compiled sessions, made by compile_file(), in dataset
+            order.
+        dataset_type: Chronic or acute experiment type.
+        measures: The measurement names, in the row order of each session's
+            sig_data_df.
+
+    Returns:
+        The CompiledDataset.
+    """
+
+    dataset = CompiledDataset(sessions, dataset_type, measures)
+    dataset.get_measurement_dfs()
+    for measure in measures:
+        dataset.get_summary_stats(measure)
+
+    return dataset
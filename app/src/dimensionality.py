@@ -0,0 +1,139 @@
+"""Contains functions for population-level dimensionality reduction of the
+trial-averaged traces from one imaging session."""
+
+import numpy as np
+import streamlit as st
+
+
+def stack_avg_means(
+    avg_means_dict: dict, odors: list, baseline_frames: int = 30
+) -> np.ndarray:
+    """Stacks the trial-averaged traces of every sample and odor into one
+    matrix.
+
+    Each sample's trace is converted to deltaF/F using its baseline period so
+    that samples with different brightness can be compared.
+
+    Args:
+        avg_means_dict: Dict with sample names as keys and avg_means
+            DataFrames (one column per odor) as values.
+        odors: The odors to include.
+        baseline_frames: The number of frames at the start of the trace used
+            as baseline.
+
+    Returns:
+        An array with shape (n_odors * n_frames, n_samples), with rows ordered
+        by odor then frame.
+    """
+
+    traces = np.stack(
+        [df[odors].to_numpy(dtype=float) for df in avg_means_dict.values()],
+        axis=-1,
+    )  # (frames, odors, samples)
+
+    baseline = traces[:baseline_frames].mean(axis=0, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        traces = (traces - baseline) / baseline
+    traces = np.nan_to_num(traces, nan=0.0, posinf=0.0, neginf=0.0)
+
+    n_frames, n_odors, n_samples = traces.shape
+
+    return traces.transpose(1, 0, 2).reshape(n_odors * n_frames, n_samples)
+
+
+def randomized_svd(
+    matrix: np.ndarray,
+    n_components: int,
+    n_oversamples: int = 10,
+    n_iter: int = 4,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Computes a truncated SVD with the randomized range finder of Halko,
+    Martinsson & Tropp (2011).
+
+    Args:
+        matrix: The matrix to decompose, shape (m, n).
+        n_components: The number of singular vectors to keep.
+        n_oversamples: Extra random vectors used to improve accuracy.
+        n_iter: The number of power iterations.
+        seed: Seed for the random number generator.
+
+    Returns:
+        A tuple (u, s, vt) with shapes (m, k), (k,) and (k, n).
+    """
+
+    rng = np.random.default_rng(seed)
+    n_random = min(n_components + n_oversamples, *matrix.shape)
+
+    # finds an orthonormal basis approximating the range of the matrix
+    q = matrix @ rng.standard_normal((matrix.shape[1], n_random))
+    q, _ = np.linalg.qr(q)
+    for _ in range(n_iter):
+        q, _ = np.linalg.qr(matrix.T @ q)
+        q, _ = np.linalg.qr(matrix @ q)
+
+    # exact SVD of the small projected matrix
+    u_small, s, vt = np.linalg.svd(q.T @ matrix, full_matrices=False)
+    u = q @ u_small
+
+    return u[:, :n_components], s[:n_components], vt[:n_components]
+
+
+def calc_population_pca(
+    matrix: np.ndarray, n_components: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Runs PCA on a stacked trace matrix, with samples as features.
+
+    Args:
+        matrix: The stacked traces from stack_avg_means().
+        n_components: The number of principal components to keep.
+
+    Returns:
+        scores: The projection of every (odor, frame) row onto the PCs, shape
+            (n_odors * n_frames, n_components).
+        components: The sample loadings of each PC, shape
+            (n_components, n_samples).
+        explained_ratio: The fraction of total variance explained by each PC.
+    """
+
+    centered = matrix - matrix.mean(axis=0)
+    n_components = min(n_components, *centered.shape)
+
+    u, s, vt = randomized_svd(centered, n_components)
+
+    total_var = np.sum(centered**2)
+    explained_ratio = s**2 / total_var if total_var > 0 else np.zeros_like(s)
+
+    return u * s, vt, explained_ratio
+
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def get_population_pca(
+    file_hash: str,
+    odors: tuple,
+    n_components: int,
+    _avg_means_dict: dict,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Gets the population PCA for one session, cached per uploaded file,
+    odor selection and number of components.
+
+    Args:
+        file_hash: Hash of the uploaded avg_means.xlsx file, used as the
+            cache key in place of the (unhashed) data.
+        odors: The odors to include.
+        n_components: The number of principal components to keep.
+        _avg_means_dict: Dict with sample names as keys and avg_means
+            DataFrames as values.
+
+    Returns:
+        The outputs of calc_population_pca(), plus the number of frames per
+        odor.
+    """
+
+    matrix = stack_avg_means(_avg_means_dict, list(odors))
+    scores, components, explained_ratio = calc_population_pca(
+        matrix, n_components
+    )
+    n_frames = matrix.shape[0] // len(odors)
+
+    return scores, components, explained_ratio, n_frames
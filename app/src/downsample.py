@@ -0,0 +1,122 @@
+"""Contains functions for downsampling long traces before plotting, keeping
+the shape of the trace so that peaks and troughs stay visible.
+"""
+
+import numpy as np
+
+# Plotly's default figure width, in pixels
+DEFAULT_MAX_POINTS = 700
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Selects points using the Largest-Triangle-Three-Buckets algorithm.
+
+    The points between the first and last are split into n_out - 2 buckets,
+    and from each bucket the point forming the largest triangle with the
+    previously selected point and the mean of the next bucket is kept.
+
+    Args:
+        x: The x values, in increasing order.
+        y: The y values.
+        n_out: The number of points to keep.
+
+    Returns:
+        The indices of the kept points.
+    """
+
+    n_points = len(x)
+    if n_out >= n_points or n_out < 3:
+        return np.arange(n_points)
+
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n_points - 1
+
+    selected = 0
+    for bucket_ct in range(n_out - 2):
+        start, stop = edges[bucket_ct], edges[bucket_ct + 1]
+
+        # the last bucket looks ahead to the last point
+        if bucket_ct < n_out - 3:
+            next_stop = edges[bucket_ct + 2]
+            next_x = x[stop:next_stop].mean()
+            next_y = y[stop:next_stop].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:stop] - y[selected])
+            - (x[selected] - x[start:stop]) * (next_y - y[selected])
+        )
+        selected = start + np.argmax(np.nan_to_num(areas, nan=-1))
+        keep[bucket_ct + 1] = selected
+
+    return keep
+
+
+def minmax_decimate(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Selects the minimum and maximum point from each of n_out / 2 equally
+    sized buckets.
+
+    Args:
+        y: The y values.
+        n_out: The number of points to keep.
+
+    Returns:
+        The indices of the kept points, in increasing order.
+    """
+
+    n_points = len(y)
+    n_buckets = n_out // 2
+    if n_out >= n_points or n_buckets < 1:
+        return np.arange(n_points)
+
+    bucket_size = -(-n_points // n_buckets)
+    buckets = np.full(n_buckets * bucket_size, np.nan)
+    buckets[:n_points] = y
+    buckets = buckets.reshape(n_buckets, bucket_size)
+
+    # buckets past the end of the trace are all nan
+    filled = ~np.isnan(buckets).all(axis=1)
+    starts = np.arange(n_buckets)[filled] * bucket_size
+    keep = np.concatenate(
+        [
+            starts + np.nanargmin(buckets[filled], axis=1),
+            starts + np.nanargmax(buckets[filled], axis=1),
+        ]
+    )
+
+    return np.unique(keep)
+
+
+def downsample(
+    x: np.ndarray,
+    y: np.ndarray,
+    n_out: int = DEFAULT_MAX_POINTS,
+    method: str = "lttb",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Downsamples a trace to at most n_out points.
+
+    Args:
+        x: The x values, in increasing order.
+        y: The y values.
+        n_out: The maximum number of points to keep.
+        method: "lttb" for Largest-Triangle-Three-Buckets, or "minmax" for
+            min/max decimation.
+
+    Returns:
+        x: The x values of the kept points.
+        y: The y values of the kept points.
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    if method == "lttb":
+        keep = lttb(x, y, n_out)
+    elif method == "minmax":
+        keep = minmax_decimate(y, n_out)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+
+    return x[keep], y[keep]
@@ -0,0 +1,455 @@
+"""Contains functions for reading analysis.xlsx and avg_means.xlsx files,
+including reading many files in parallel worker processes.
+
+Workbooks are read with the fastest available backend: calamine if the
+optional python-calamine package is installed, otherwise a streaming
+read-only openpyxl reader. If a backend fails, the file is read with
+pd.read_excel() instead.
+
+Worker processes send each parsed workbook back as a compact payload of NumPy
+arrays instead of pickled DataFrames, which is rebuilt into the same dict of
+DataFrames that pd.read_excel() returns.
+"""
+
+import io
+import os
+import importlib.util
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+# Codes for the type of each cell value in a payload
+FLOAT_CODE = 0
+INT_CODE = 1
+FALSE_CODE = 2
+TRUE_CODE = 3
+OTHER_CODE = 4
+
+# Strings read as NaN, i.e. pandas' defaults plus "FALSE"
+NA_STRINGS = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+    "FALSE",
+}
+
+# Starting worker processes takes longer than reading a few files serially
+MIN_PARALLEL_FILES = 4
+
+
+def get_excel_backend() -> str:
+    """Gets the fastest available backend for reading .xlsx files.
+
+    Returns:
+        "calamine" if python-calamine is installed, otherwise "openpyxl".
+    """
+
+    if importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+
+    return "openpyxl"
+
+
+def convert_cell(value):
+    """Converts a cell value the same way pd.read_excel() does.
+
+    Args:
+        value: The raw cell value from the backend.
+
+    Returns:
+        NaN for empty and N/A cells, an int for whole-number floats, and the
+        value itself otherwise.
+    """
+
+    if value is None:
+        return np.nan
+    if isinstance(value, str):
+        return np.nan if value in NA_STRINGS else value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+
+    return value
+
+
+def iter_calamine_sheets(file):
+    """Yields the name and rows of every sheet using python-calamine.
+
+    Args:
+        file: The path or file-like object of the .xlsx file.
+
+    Yields:
+        Tuples of (sheet name, iterable of row tuples).
+    """
+
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_object(file)
+    for sheet_name in workbook.sheet_names:
+        yield sheet_name, workbook.get_sheet_by_name(sheet_name).to_python(
+            skip_empty_area=False
+        )
+
+
+def iter_openpyxl_sheets(file):
+    """Yields the name and rows of every sheet using a streaming read-only
+    openpyxl workbook.
+
+    Args:
+        file: The path or file-like object of the .xlsx file.
+
+    Yields:
+        Tuples of (sheet name, iterable of row tuples).
+    """
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            yield worksheet.title, worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def make_sheet_df(
+    sheet_rows, header_row: int, index_col: bool, rows: list = None
+) -> pd.DataFrame:
+    """Makes a DataFrame from the rows of one sheet.
+
+    Args:
+        sheet_rows: Iterable of row tuples from the backend.
+        header_row: The row number holding the column names.
+        index_col: Whether the first column holds the index.
+        rows: The index values of the rows to keep, if index_col is True.
+            Other rows are skipped without converting their cells.
+
+    Returns:
+        The DataFrame of the sheet, as pd.read_excel() would read it.
+    """
+
+    header = None
+    data = []
+    wanted_rows = set(rows) if rows is not None else None
+
+    for i, row in enumerate(sheet_rows):
+        if i < header_row:
+            continue
+        if i == header_row:
+            header = [convert_cell(value) for value in row]
+            continue
+        if wanted_rows is not None and row[0] not in wanted_rows:
+            continue
+        data.append([convert_cell(value) for value in row])
+
+    # drops trailing empty rows
+    while data and all(pd.isna(value) for value in data[-1]):
+        data.pop()
+
+    columns = [
+        f"Unnamed: {i}" if pd.isna(name) else name
+        for i, name in enumerate(header)
+    ]
+
+    if not index_col:
+        return pd.DataFrame(data, columns=columns)
+
+    sheet_df = pd.DataFrame(
+        [row[1:] for row in data],
+        index=pd.Index(
+            [row[0] for row in data],
+            name=None if pd.isna(header[0]) else header[0],
+        ),
+        columns=columns[1:],
+        dtype=object,
+    )
+
+    return sheet_df
+
+
+def read_excel_sheets(
+    file,
+    header_row: int = 0,
+    index_col: bool = False,
+    rows: list = None,
+    backend: str = None,
+) -> dict:
+    """Reads every sheet of a .xlsx file with a fast backend, falling back to
+    pd.read_excel() if the backend fails.
+
+    Args:
+        file: The path, uploaded file or file-like object of the .xlsx file.
+        header_row: The row number holding the column names.
+        index_col: Whether the first column holds the index. If True, cells
+            are kept as objects, like dtype="object" in pd.read_excel().
+        rows: The index values of the rows to keep, if index_col is True.
+        backend: "calamine", "openpyxl" or "pandas". Defaults to the fastest
+            available backend.
+
+    Returns:
+        A dict with sheet names as keys and DataFrames as values.
+    """
+
+    if backend is None:
+        backend = get_excel_backend()
+
+    sheet_readers = {
+        "calamine": iter_calamine_sheets,
+        "openpyxl": iter_openpyxl_sheets,
+    }
+
+    if backend in sheet_readers:
+        try:
+            return {
+                sheet_name: make_sheet_df(
+                    sheet_rows, header_row, index_col, rows
+                )
+                for sheet_name, sheet_rows in sheet_readers[backend](file)
+            }
+        except Exception:
+            if hasattr(file, "seek"):
+                file.seek(0)
+
+    sheets_dict = pd.read_excel(
+        file,
+        sheet_name=None,
+        header=header_row,
+        index_col=0 if index_col else None,
+        na_values="FALSE",
+        dtype="object" if index_col else None,
+    )
+    if index_col and rows is not None:
+        sheets_dict = {
+            sheet_name: sheet_df[sheet_df.index.isin(rows)]
+            for sheet_name, sheet_df in sheets_dict.items()
+        }
+
+    return sheets_dict
+
+
+def read_analysis_excel(file, rows: list = None) -> dict:
+    """Reads every sheet of an analysis.xlsx file.
+
+    Args:
+        file: The path, uploaded file or file-like object of the .xlsx file.
+        rows: The measurements (rows) to read, e.g. ["Latency (s)"]. Reads
+            all rows by default.
+
+    Returns:
+        A dictionary containing measurement values from the analysis.xlsx
+        file, with sample # as keys.
+    """
+
+    data_dict = read_excel_sheets(file, header_row=1, index_col=True, rows=rows)
+
+    return data_dict
+
+
+def read_avg_means_excel(file) -> dict:
+    """Reads every sheet of an avg_means.xlsx file.
+
+    Args:
+        file: The path, uploaded file or file-like object of the .xlsx file.
+
+    Returns:
+        A dict with sample names as keys and DataFrames of the average means
+        as values.
+    """
+
+    return read_excel_sheets(file)
+
+
+def encode_analysis_dict(data_dict: dict) -> dict:
+    """Packs the sheets of an analysis.xlsx file into NumPy arrays.
+
+    The cell values of all sheets are stored in one float64 array, with an
+    int8 array recording whether each value was a float, int or bool so that
+    the original object values can be restored exactly.
+
+    Args:
+        data_dict: The dictionary returned by read_analysis_excel().
+
+    Returns:
+        A dict of NumPy arrays and lists describing the sheets.
+    """
+
+    sheet_names = list(data_dict.keys())
+    first_df = data_dict[sheet_names[0]]
+    same_labels = all(
+        df.index.equals(first_df.index) and df.columns.equals(first_df.columns)
+        for df in data_dict.values()
+    )
+    if not same_labels:
+        # falls back to sending the sheets as they are
+        return {"sheets": data_dict}
+
+    objects = np.stack(
+        [df.to_numpy(dtype=object) for df in data_dict.values()]
+    )
+    flat_objects = objects.ravel()
+
+    values = np.full(flat_objects.shape, np.nan)
+    codes = np.full(flat_objects.shape, OTHER_CODE, dtype=np.int8)
+    others = {}
+
+    for i, value in enumerate(flat_objects):
+        if isinstance(value, (bool, np.bool_)):
+            codes[i] = TRUE_CODE if value else FALSE_CODE
+        elif isinstance(value, (int, np.integer)):
+            values[i] = value
+            codes[i] = INT_CODE
+        elif isinstance(value, (float, np.floating)):
+            values[i] = value
+            codes[i] = FLOAT_CODE
+        else:
+            others[i] = value
+
+    payload = {
+        "sheet_names": sheet_names,
+        "index": first_df.index.tolist(),
+        "index_name": first_df.index.name,
+        "columns": first_df.columns.tolist(),
+        "shape": objects.shape,
+        "values": values,
+        "codes": codes,
+        "others": others,
+    }
+
+    return payload
+
+
+def decode_analysis_payload(payload: dict) -> dict:
+    """Rebuilds the dictionary of DataFrames from encode_analysis_dict().
+
+    Args:
+        payload: The payload made by encode_analysis_dict().
+
+    Returns:
+        A dictionary containing measurement values from the analysis.xlsx
+        file, with sample # as keys.
+    """
+
+    if "sheets" in payload:
+        return payload["sheets"]
+
+    values = payload["values"]
+    codes = payload["codes"]
+
+    flat_objects = values.astype(object)
+    int_cells = codes == INT_CODE
+    flat_objects[int_cells] = values[int_cells].astype(int).tolist()
+    flat_objects[codes == FALSE_CODE] = False
+    flat_objects[codes == TRUE_CODE] = True
+    for i, value in payload["others"].items():
+        flat_objects[i] = value
+
+    objects = flat_objects.reshape(payload["shape"])
+    index = pd.Index(payload["index"], name=payload["index_name"])
+
+    data_dict = {
+        sheet_name: pd.DataFrame(
+            objects[i], index=index, columns=payload["columns"]
+        )
+        for i, sheet_name in enumerate(payload["sheet_names"])
+    }
+
+    return data_dict
+
+
+def parse_analysis_file(file_bytes: bytes, rows: list = None) -> dict:
+    """Reads one analysis.xlsx file in a worker process.
+
+    Args:
+        file_bytes: The contents of the .xlsx file.
+        rows: The measurements (rows) to read. Reads all rows by default.
+
+    Returns:
+        The payload made by encode_analysis_dict().
+    """
+
+    return encode_analysis_dict(
+        read_analysis_excel(io.BytesIO(file_bytes), rows)
+    )
+
+
+def get_n_workers(n_files: int) -> int:
+    """Gets the number of worker processes to use for reading files.
+
+    Args:
+        n_files: The number of files to read.
+
+    Returns:
+        The number of workers, at most one per file and one per CPU.
+    """
+
+    if n_files < MIN_PARALLEL_FILES:
+        return 1
+
+    return max(1, min(n_files, os.cpu_count() or 1))
+
+
+def read_all_analysis_excel(
+    files: list, rows: list = None, progress_bar=None
+) -> list:
+    """Reads many analysis.xlsx files concurrently in a process pool.
+
+    Files are parsed in whichever order the workers finish, but results are
+    returned in the order of the files.
+
+    Args:
+        files: A list of .xlsx files uploaded to Streamlit.
+        rows: The measurements (rows) to read. Reads all rows by default.
+        progress_bar: Optional stqdm/tqdm progress bar with total equal to
+            the number of files, updated as each file is read.
+
+    Returns:
+        A list with the dictionary of DataFrames from each file, in file order.
+    """
+
+    n_workers = get_n_workers(len(files))
+    data_dicts = [None] * len(files)
+
+    if n_workers == 1:
+        for i, file in enumerate(files):
+            data_dicts[i] = read_analysis_excel(file, rows)
+            if progress_bar is not None:
+                progress_bar.update(1)
+        return data_dicts
+
+    # uses fresh processes, as forking the multithreaded Streamlit server
+    # isn't safe
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        futures = {
+            executor.submit(parse_analysis_file, file.getvalue(), rows): i
+            for i, file in enumerate(files)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            data_dicts[i] = decode_analysis_payload(future.result())
+            if progress_bar is not None:
+                progress_bar.set_description(
+                    f"Read {files[i].name.split('_analysis')[0]}",
+                    refresh=False,
+                )
+                progress_bar.update(1)
+
+    return data_dicts
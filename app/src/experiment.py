@@ -6,9 +6,30 @@ from pathlib import Path
 import re
 import os
 import numpy as np
+import json
 import pdb
 
 from src.utils import read_txt_file, save_to_excel, save_to_csv
+from src.correlations import calc_correlations, save_correlations
+from src.grid import infer_grid_shape
+from src.excel_import import (
+    read_analysis_excel,
+    encode_analysis_dict,
+    decode_analysis_payload,
+)
+from src.sidecar import (
+    write_analysis_sidecar,
+    write_avg_means_sidecar,
+    read_analysis_sidecar,
+    calc_checksum,
+)
+from src.parse_cache import ParseCache
+from src.catalog import Catalog
+from src.acquisition import (
+    read_acquisition_info,
+    resample_traces,
+    scale_frames,
+)
 
 
 class RawFolder(object):
@@ -35,6 +56,16 @@ class RawFolder(object):
             values from every frame for every trial and odor for all .txt files.
         session_path (str): The path to the selected folder.
         drop_trials_list (list): Trials to drop, if selected.
+        grid_cols (int): For Grid samples, the number of tiles per row, if
+            given by the user.
+        grid_shape (tuple): For Grid samples, the (rows, columns) geometry
+            of the grid.
+        frame_period (float): The time (s) between imaging frames.
+        onset_frame (int): The frame at which the odor is delivered.
+        original_acquisition (dict): The frame period and onset frame as
+            acquired, if the traces were resampled.
+        analysis_dict (dict): The analysis values of each sample, with sheet
+            names as keys, kept for adding the session to the catalog.
 
     """
 
@@ -46,6 +77,7 @@ class RawFolder(object):
         ROI_id: str,
         sample_type: str,
         drop_trials: bool,
+        grid_cols: int = None,
     ):
         """Initializes an instance of RawFolder() for the selected folder.
 
@@ -56,6 +88,8 @@ class RawFolder(object):
             ROI: Region of Interest.
             sample_type: Type of sample being analysed.
             drop_trial: Whether to drop trials.
+            grid_cols: For Grid samples, the number of tiles per row. Inferred
+                from the number of tiles if not given.
         """
         self.date = date
         self.animal_id = animal_id
@@ -67,6 +101,12 @@ class RawFolder(object):
         self.total_n = None
         self.n_column_labels = None
         self.all_data_df = None
+        self.grid_cols = grid_cols
+        self.grid_shape = None
+        self.frame_period = None
+        self.onset_frame = None
+        self.original_acquisition = None
+        self.analysis_dict = {}
 
         # Sets path to folder holding all the txt files for analysis.
         self.session_path = folder_path
@@ -115,6 +155,35 @@ class RawFolder(object):
                         solenoid_info_df.sort_values(by=["Odor"], inplace=True)
                         self.solenoid_df = solenoid_info_df
 
+        self.get_acquisition_info()
+
+    def get_acquisition_info(self):
+        """Gets the frame period and odor onset frame of the session from an
+        _acquisition.json sidecar or the solenoid order file, if present."""
+
+        acquisition_info = read_acquisition_info(
+            self.session_path, self.solenoid_df
+        )
+        self.frame_period = acquisition_info["frame_period"]
+        self.onset_frame = acquisition_info["onset_frame"]
+
+    @property
+    def _analysis_windows(self) -> dict:
+        """dict: The frame positions bounding the analysis windows.
+
+        The windows span the same times relative to odor onset as the original
+        rig's frames 1-30 (baseline), 34-300 (response), and 41-300 (response
+        onset search), scaled to the session's frame period.
+        """
+        return {
+            "baseline_end": self.onset_frame
+            - scale_frames(3, self.frame_period),
+            "onset_search_start": self.onset_frame
+            + scale_frames(7, self.frame_period),
+            "response_end": self.onset_frame
+            + scale_frames(267, self.frame_period),
+        }
+
     def rename_correct_format(
         self, m: re.Match, filename: str, _ext: str, first: bool = False
     ):
@@ -150,11 +219,13 @@ class RawFolder(object):
         """str: The file name for exporting .csv file."""
         return f"{self.file_prefix}_solenoid_info.csv"
 
-    def rename_txt(self, status: st.status):
+    def rename_txt(self, status: st.status, log=st.write):
         """Renames .txt files if needed.
 
         Args:
             status: st.status container to update progress message
+            log: The function showing progress messages. Background jobs
+                pass their own, as they can't write to the page.
         """
 
         # pulls out txt file names, excluding solenoid file
@@ -171,10 +242,10 @@ class RawFolder(object):
         if os.path.isfile(
             Path(self.session_path, f"{self._exp_name}_000.txt")
         ):
-            st.write(".txt files are already in the correct format.")
+            log(".txt files are already in the correct format.")
 
         else:
-            st.write("Renaming .txt files to the correct format.")
+            log("Renaming .txt files to the correct format.")
             # renames text files
             _ext = ".txt"
             endsWithNumber = re.compile(r"(\d+)" + (re.escape(_ext)) + "$")
@@ -187,7 +258,7 @@ class RawFolder(object):
                 # this renames the first trial text file and adds 000
                 else:
                     self.rename_correct_format(m, filename, _ext, first=True)
-            st.write(".txt files renamed.")
+            log(".txt files renamed.")
 
     def get_txt_file_paths(self) -> list:
         """Creates list of paths for all text files, excluding solenoid info.
@@ -268,6 +339,9 @@ class RawFolder(object):
         )
         self.n_column_labels = new_cols
 
+        if self.sample_type == "Grid":
+            self.grid_shape = infer_grid_shape(self.total_n, self.grid_cols)
+
         self.all_data_df = all_data_df.copy()
 
     def process_txt_data(self, n_count: int, sample_type: str) -> str:
@@ -295,6 +369,7 @@ class RawFolder(object):
 
         # performs analysis for each sample
         analysis_df = self.analyze_signal(avg_means)
+        self.analysis_dict[self.n_column_labels[n_count]] = analysis_df
 
         # Saving to Excel
         sheet_name = self.n_column_labels[n_count]
@@ -328,6 +403,103 @@ class RawFolder(object):
             ~self.all_data_df["Trial"].isin(self.drop_trials_list)
         ]
 
+    def resample_all_data(
+        self, target_period: float, target_onset_frame: int
+    ):
+        """Interpolates every trace in all_data_df onto a common time base.
+
+        All trials and samples are resampled in one batched operation per
+        trial length, so that sessions with trials of different lengths are
+        resampled too. The session's frame period and onset frame are
+        replaced by the target values so that the analysis uses the common
+        time base.
+
+        Args:
+            target_period: The frame period (s) of the common time base.
+            target_onset_frame: The odor onset frame of the common time base.
+        """
+
+        all_data_df = self.all_data_df.sort_values(["Trial", "Frame"])
+        trial_lengths = all_data_df.groupby("Trial", sort=True).size()
+
+        resampled_dfs = [
+            self.resample_trials(
+                all_data_df[all_data_df["Trial"].isin(length_trials.index)],
+                target_period,
+                target_onset_frame,
+            )
+            for _, length_trials in trial_lengths.groupby(trial_lengths)
+        ]
+        resampled_df = pd.concat(resampled_dfs, ignore_index=True)
+        if len(resampled_dfs) > 1:
+            resampled_df.sort_values(
+                ["Trial", "Frame"], inplace=True, ignore_index=True
+            )
+
+        self.original_acquisition = {
+            "frame_period": self.frame_period,
+            "onset_frame": self.onset_frame,
+        }
+        self.frame_period = target_period
+        self.onset_frame = target_onset_frame
+        self.all_data_df = resampled_df
+
+    def resample_trials(
+        self,
+        trials_df: pd.DataFrame,
+        target_period: float,
+        target_onset_frame: int,
+    ) -> pd.DataFrame:
+        """Interpolates the traces of trials with the same number of frames
+        onto a common time base, in one batched operation.
+
+        Args:
+            trials_df: The rows of all_data_df for the trials, sorted by trial
+                and frame.
+            target_period: The frame period (s) of the common time base.
+            target_onset_frame: The odor onset frame of the common time base.
+
+        Returns:
+            The resampled rows, in the format of all_data_df.
+        """
+
+        trials = trials_df["Trial"].unique()
+        n_frames = len(trials_df) // len(trials)
+
+        # (frames, trials × samples) so each column is one trace
+        traces = (
+            trials_df[self.n_column_labels]
+            .to_numpy(dtype=float)
+            .reshape(len(trials), n_frames, len(self.n_column_labels))
+            .transpose(1, 0, 2)
+            .reshape(n_frames, -1)
+        )
+        resampled = resample_traces(
+            traces,
+            self.frame_period,
+            self.onset_frame,
+            target_period,
+            target_onset_frame,
+        )
+        n_target_frames = resampled.shape[0]
+
+        trial_odors = trials_df.groupby("Trial", sort=True)["Odor"].first()
+        resampled_df = pd.DataFrame(
+            resampled.reshape(n_target_frames, len(trials), -1)
+            .transpose(1, 0, 2)
+            .reshape(-1, len(self.n_column_labels)),
+            columns=self.n_column_labels,
+        )
+        resampled_df.insert(
+            0, "Frame", np.tile(range(1, n_target_frames + 1), len(trials))
+        )
+        resampled_df.insert(1, "Trial", np.repeat(trials, n_target_frames))
+        resampled_df.insert(
+            2, "Odor", np.repeat(trial_odors.values, n_target_frames)
+        )
+
+        return resampled_df
+
     def collect_per_sample(
         self, all_data_df: pd.DataFrame, sample: str
     ) -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -463,12 +635,13 @@ class RawFolder(object):
                 baseline_subtracted: The average fluorescence value, with
                     baseline subtracted.
         """
-        baseline = avg_means[:30].mean()
+        windows = self._analysis_windows
+        baseline = avg_means[: windows["baseline_end"]].mean()
 
         # Calculates peak using max value from frames #53-300
-        peak = avg_means[33:300].max()
+        peak = avg_means[self.onset_frame : windows["response_end"]].max()
         deltaF = peak - baseline
-        baseline_stdx3 = avg_means[:30].std() * 2
+        baseline_stdx3 = avg_means[: windows["baseline_end"]].std() * 2
 
         deltaF_blank = deltaF[avg_means.columns[-1]]
         blank_sub_deltaF = deltaF - deltaF_blank
@@ -502,7 +675,10 @@ class RawFolder(object):
         """
 
         # Calculates AUC using sum of values from frames # 1-300
-        auc = (avg_means[:300].sum() - (baseline * 300)) * 0.0661
+        response_end = self._analysis_windows["response_end"]
+        auc = (
+            avg_means[:response_end].sum() - (baseline * response_end)
+        ) * self.frame_period
         auc.clip(lower=0, inplace=True)  # Sets negative AUC values to 0
 
         # Gets AUC_blank from AUC of the last odor
@@ -545,14 +721,18 @@ class RawFolder(object):
         blank_sub_auc = na_template.copy()
         blank_sub_auc[sig_odors] = auc[sig_odors] - auc_blank
 
+        windows = self._analysis_windows
+
         # Calculates time at signal peak using all the frames
         # why does excel sheet have - 2??
-        max_frames = avg_means[33:300].idxmax()
+        max_frames = avg_means[
+            self.onset_frame : windows["response_end"]
+        ].idxmax()
         peak_times = na_template.copy()
-        peak_times[sig_odors] = max_frames[sig_odors] * 0.0661
+        peak_times[sig_odors] = max_frames[sig_odors] * self.frame_period
 
         # Get odor onset - Frame 57
-        odor_onset = 33 * 0.0661
+        odor_onset = self.onset_frame * self.frame_period
 
         # Calculate response onset only for significant odors
         response_onset = na_template.copy()
@@ -561,9 +741,11 @@ class RawFolder(object):
         for sig_odor in sig_odors:
             # Window doesn't start at frame 53 because it can't precede
             #  odor onset
-            window = baseline_subtracted[40:300][sig_odor]
+            window = baseline_subtracted[
+                windows["onset_search_start"] : windows["response_end"]
+            ][sig_odor]
             onset_idx = np.argmax(window >= onset_amp[sig_odor])
-            onset_time = window.index[onset_idx] * 0.0661
+            onset_time = window.index[onset_idx] * self.frame_period
             response_onset[sig_odor] = onset_time
 
         latency = na_template.copy()
@@ -701,6 +883,81 @@ class RawFolder(object):
 
         return response_analyses_df
 
+    def save_correlations(self, use_float32: bool = False):
+        """Calculates sample × sample signal and noise correlations from all
+        trials and saves them to a compressed _correlations.npz file.
+
+        Args:
+            use_float32: Whether to calculate in float32 instead of float64.
+        """
+
+        windows = self._analysis_windows
+        signal_corr, noise_corr = calc_correlations(
+            self.all_data_df,
+            self.n_column_labels,
+            use_float32,
+            baseline_frames=(1, windows["baseline_end"]),
+            response_frames=(self.onset_frame + 1, windows["response_end"]),
+        )
+        save_correlations(
+            Path(self.session_path, f"{self.file_prefix}_correlations.npz"),
+            signal_corr,
+            noise_corr,
+            self.n_column_labels,
+        )
+
+    def save_session_info(self):
+        """Saves the session's sample and acquisition information, including
+        the grid geometry for Grid samples, as _session_info.json."""
+
+        session_info = {
+            "sample_type": self.sample_type,
+            "n_samples": self.total_n,
+            "grid_shape": list(self.grid_shape) if self.grid_shape else None,
+            "frame_period": self.frame_period,
+            "onset_frame": self.onset_frame,
+            "original_acquisition": self.original_acquisition,
+        }
+
+        with open(
+            Path(self.session_path, f"{self.file_prefix}_session_info.json"),
+            "w",
+        ) as f:
+            json.dump(session_info, f, indent=4)
+
+    def save_sidecars(self):
+        """Saves binary .arrow copies of the _analysis.xlsx and
+        _avg_means.xlsx files for faster loading on the plotting pages."""
+
+        write_analysis_sidecar(
+            Path(self.session_path, f"{self.file_prefix}_analysis.xlsx")
+        )
+        write_avg_means_sidecar(
+            Path(self.session_path, f"{self.file_prefix}_avg_means.xlsx")
+        )
+
+    def add_to_catalog(self, catalog_path: str):
+        """Adds the session's analysis values to the SQLite catalog.
+
+        Args:
+            catalog_path: The path of the catalog database, or of the folder
+                holding it.
+        """
+
+        analysis_path = Path(
+            self.session_path, f"{self.file_prefix}_analysis.xlsx"
+        )
+
+        catalog = Catalog(catalog_path)
+        try:
+            catalog.add_session(
+                self.file_prefix,
+                self.analysis_dict,
+                calc_checksum(analysis_path),
+            )
+        finally:
+            catalog.close()
+
     def save_solenoid_info(self):
         """Saves the solenoid info (odor # by trial) as csv."""
         fname = self._csv_filename
@@ -723,14 +980,16 @@ class ExperimentFile(object):
         tuple_dict (dict): A dictionary containing tuples  of
             (sample #, odor #) as keys and the analysis values of that sample
             and odor pair as the values.
+        sidecar: The matching _analysis.arrow file, if uploaded.
     """
 
-    def __init__(self, file: str, dataset_type: str):
+    def __init__(self, file: str, dataset_type: str, sidecar=None):
         """Initializes an instance of ExperimentFile() for the dataset.
 
         Args:
             file: streamlit.runtime.uploaded_file_manager.UploadedFile, csv file
             dataset_type: Chronic or acute experiment type.
+            sidecar: The matching _analysis.arrow file, if uploaded.
             date (str): The date of the experiment.
             animal_id (str): The animal ID from the experiment.
             ROI_id (str): The ROI imaged in the experiment.
@@ -747,24 +1006,47 @@ class ExperimentFile(object):
         self.date, self.animal_id, self.roi = file_parts
         self.exp_name = "_".join(file_parts)
 
+        self.sidecar = sidecar
+        self._file_hash = None
+
         self.sample_type = None
         self.tuple_dict = None
 
-    def import_excel(self) -> dict:
-        """Imports data from each .xlsx file into a dictionary.
+    @property
+    def file_hash(self) -> str:
+        """The checksum of the file contents, used as the parse cache key."""
+
+        if self._file_hash is None:
+            self._file_hash = calc_checksum(self.file)
+
+        return self._file_hash
+
+    def import_excel(self, rows: list = None) -> dict:
+        """Imports data from each .xlsx file into a dictionary. Uses the
+        parse cache if the same file was imported before, and otherwise reads
+        the sidecar file instead if it matches the .xlsx file.
+
+        Args:
+            rows: The measurements (rows) to import, e.g. ["Latency (s)"].
+                Imports all rows by default.
 
         Returns:
             A dictionary containing measurement values from the analysis.xlsx
             file, with sample # as keys.
         """
-        data_dict = pd.read_excel(
-            self.file,
-            sheet_name=None,
-            header=1,
-            index_col=0,
-            na_values="FALSE",
-            dtype="object",
-        )
+        cache = ParseCache()
+        cache_key = cache.make_key(self.file_hash, "analysis", rows)
+        payload = cache.get(cache_key)
+        if payload is not None:
+            return decode_analysis_payload(payload)
+
+        data_dict = None
+        if self.sidecar is not None:
+            data_dict = read_analysis_sidecar(self.sidecar, self.file, rows)
+        if data_dict is None:
+            data_dict = read_analysis_excel(self.file, rows)
+
+        cache.put(cache_key, encode_analysis_dict(data_dict))
 
         return data_dict
 
@@ -776,20 +1058,23 @@ class ExperimentFile(object):
     #     elif acute:
     #         do other stuff
 
-    def sort_data(self, data_dict: dict, df_list: list) -> list:
-        """Converts dicts containing .analysis data into DataFrames for each
-        measurement (e.g. "Time to peak (s)").
+    def sort_data(
+        self, data_dict: dict, measures: list = None
+    ) -> pd.DataFrame:
+        """Converts dicts containing .analysis data into a long-format
+        DataFrame with one row per sample, odor and measurement (e.g.
+        "Time to peak (s)").
 
         Args:
             data_dict: A dictionary containing measurement values from
                 the analysis.xlsx file, with sample # as keys.
-            df_list: A list of DataFrames to hold the values for each
-                measurement.
+            measures: The measurements to keep. Defaults to
+                st.session_state.measures.
 
         Returns:
-            A list of a list of DataFrames, one list for each measurement.
-                Values from each new .xlsx file are appended as new rows in the
-                DataFrames in df_list.
+            A DataFrame with Experiment, Date, Animal ID, ROI, Sample, Odor,
+                Significant, Measure and Value columns. Pieces from each
+                .xlsx file are combined once all files are loaded.
         """
 
         self.tuple_dict = {
@@ -811,29 +1096,33 @@ class ExperimentFile(object):
             "Blank-subtracted DeltaF/F(%)",
         ] = ""
 
-        mega_df = temp_mega_df.copy().T
-        appended_df_list = [[] for x in range(5)]
+        if measures is None:
+            measures = st.session_state.measures
 
-        for measure_ct, measure in enumerate(st.session_state.measures):
-            temp_measure_df = pd.DataFrame(mega_df.loc[measure]).T.stack().T
+        measure_df = temp_mega_df[measures].apply(
+            pd.to_numeric, errors="coerce"
+        )
+        measure_df.index.names = ["Sample", "Odor"]
 
-            if self.dataset_type == "chronic":
-                temp_measure_df["Date"] = self.date
-            else:
-                temp_measure_df["Animal ID"] = self.animal_id
-                temp_measure_df["ROI"] = self.roi
+        # Renaming sample names for better sorting
+        measure_df.rename(
+            index=lambda x: int(x.split(" ")[1]), level=0, inplace=True
+        )
 
-            # Renaming sample names for better sorting
-            temp_measure_df.rename(
-                index=lambda x: int(x.split(" ")[1]), inplace=True
-            )
-            temp_measure_df.index.rename(self.sample_type, inplace=True)
+        # significant responses are the ones with a measured latency
+        measure_df["Significant"] = measure_df["Latency (s)"].notna()
 
-            # Append values from this analysis.xlsx file
-            concat_pd = pd.concat([df_list[measure_ct], temp_measure_df])
-            appended_df_list[measure_ct] = concat_pd
+        long_df = measure_df.reset_index().melt(
+            id_vars=["Sample", "Odor", "Significant"],
+            var_name="Measure",
+            value_name="Value",
+        )
+        long_df.insert(0, "Experiment", self.exp_name)
+        long_df.insert(1, "Date", self.date)
+        long_df.insert(2, "Animal ID", self.animal_id)
+        long_df.insert(3, "ROI", self.roi)
 
-        return appended_df_list
+        return long_df
 
     def make_plotting_dfs(self, data_dict: dict) -> tuple[list, pd.DataFrame]:
         """Makes the DataFrames used for plotting measurements.
@@ -848,7 +1137,17 @@ class ExperimentFile(object):
                 significant responses.
         """
 
-        sig_data_df = pd.DataFrame()
+        cache = ParseCache()
+        cache_key = cache.make_key(
+            self.file_hash,
+            "plotting",
+            tuple(next(iter(data_dict.values())).index),
+        )
+        cached_dfs = cache.get(cache_key)
+        if cached_dfs is not None:
+            return cached_dfs
+
+        sig_data_dfs = []
         sig_odors = []
 
         # drop non-significant colums from each df using NaN values
@@ -866,7 +1165,7 @@ class ExperimentFile(object):
                 ]
             ]
 
-            sig_data_df = pd.concat([sig_data_df, data_df], axis=1)
+            sig_data_dfs.append(data_df)
 
             # gets list of remaining significant odors
             if len(data_df.columns.values) == 0:
@@ -875,4 +1174,9 @@ class ExperimentFile(object):
                 df_sig_odors = data_df.columns.values.tolist()
                 sig_odors.append(df_sig_odors)
 
+        # combines all samples at once rather than growing the df per sample
+        sig_data_df = pd.concat(sig_data_dfs, axis=1)
+
+        cache.put(cache_key, (sig_odors, sig_data_df))
+
         return sig_odors, sig_data_df
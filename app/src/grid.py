@@ -0,0 +1,118 @@
+"""Contains functions for arranging per-sample measurements from Grid sessions
+into spatial response maps."""
+
+import json
+import numpy as np
+import pandas as pd
+
+
+def infer_grid_shape(n_tiles: int, n_cols: int = None) -> tuple[int, int]:
+    """Gets the (rows, columns) geometry of a grid.
+
+    If the number of columns isn't given, uses the most square factorization
+    of the number of tiles.
+
+    Args:
+        n_tiles: The number of grid tiles (samples).
+        n_cols: The number of tiles per row, if known.
+
+    Returns:
+        A tuple (n_rows, n_cols).
+    """
+
+    if not n_cols:
+        n_cols = int(np.ceil(np.sqrt(n_tiles)))
+        # uses an exact factorization if there is one close to square
+        for cols in range(n_cols, n_cols * 2):
+            if n_tiles % cols == 0:
+                n_cols = cols
+                break
+
+    n_rows = int(np.ceil(n_tiles / n_cols))
+
+    return n_rows, n_cols
+
+
+def load_grid_shape(file: str) -> tuple[int, int] | None:
+    """Loads the grid geometry from a _session_info.json file.
+
+    Args:
+        file: The path or uploaded file of the .json file.
+
+    Returns:
+        A tuple (n_rows, n_cols), or None if the session isn't a grid.
+    """
+
+    if hasattr(file, "getvalue"):
+        session_info = json.loads(file.getvalue())
+    else:
+        with open(file) as f:
+            session_info = json.load(f)
+
+    grid_shape = session_info.get("grid_shape")
+
+    return tuple(grid_shape) if grid_shape else None
+
+
+def make_measure_array(
+    analysis_dict: dict, measure: str
+) -> tuple[np.ndarray, list]:
+    """Collects one measurement for every tile and odor into a 2D array.
+
+    Args:
+        analysis_dict: Dict with sample names (e.g. "Grid 1") as keys and the
+            analysis DataFrames from ExperimentFile.import_excel() as values.
+        measure: The measurement to collect. "Significant response?" is
+            converted to 1 (significant) or 0.
+
+    Returns:
+        An array with shape (n_tiles, n_odors) ordered by tile number, and
+        the list of odor names.
+    """
+
+    all_tiles_df = pd.concat(analysis_dict, names=["Sample", "Measure"])
+    measure_df = all_tiles_df.xs(measure, level="Measure")
+
+    # orders tiles by number rather than by sheet order
+    tile_numbers = [int(x.split(" ")[-1]) for x in measure_df.index]
+    measure_df = measure_df.iloc[np.argsort(tile_numbers)]
+
+    if measure == "Significant response?":
+        # significant responses hold the deltaF/F value, others are False/0
+        # whole-number values may have been read as ints
+        values = measure_df.applymap(
+            lambda x: float(
+                isinstance(x, (int, float, np.number))
+                and not isinstance(x, bool)
+                and not np.isnan(x)
+            )
+        ).to_numpy(dtype=float)
+    else:
+        values = measure_df.apply(pd.to_numeric, errors="coerce").to_numpy(
+            dtype=float
+        )
+
+    return values, measure_df.columns.tolist()
+
+
+def make_grid_maps(values: np.ndarray, grid_shape: tuple) -> np.ndarray:
+    """Reshapes per-tile values for all odors into spatial maps at once.
+
+    Tiles are numbered row by row. Missing tiles at the end of the grid are
+    filled with NaN.
+
+    Args:
+        values: Array with shape (n_tiles, n_odors).
+        grid_shape: The grid geometry (n_rows, n_cols).
+
+    Returns:
+        An array with shape (n_odors, n_rows, n_cols).
+    """
+
+    n_rows, n_cols = grid_shape
+    n_tiles, n_odors = values.shape
+
+    padded = np.full((n_rows * n_cols, n_odors), np.nan)
+    padded[:n_tiles] = values[: n_rows * n_cols]
+
+    return padded.T.reshape(n_odors, n_rows, n_cols)
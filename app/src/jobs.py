@@ -0,0 +1,431 @@
+"""Contains the background job layer, which runs long analyses and dataset
+compilations in a thread pool owned by the Streamlit server instead of inside
+the page script. Jobs keep running when widgets are used, the page is
+changed or the browser is refreshed.
+
+Each job keeps its state, its current stage and the progress within that
+stage, which pages poll to show progress and to load the result once the
+job is done. Job functions must not call Streamlit, as they don't run in a
+page script.
+
+Pages only show and poll the jobs started in their own user session, and
+each session keeps its own most recent finished jobs. Starting the same work
+again, e.g. after a refresh, reattaches the session to the job if it's still
+queued or running.
+
+The number of jobs run at once can be set with the ROI_APP_JOB_WORKERS
+environment variable.
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import streamlit as st
+
+DEFAULT_MAX_WORKERS = 2
+
+# finished jobs kept per user session for loading their results, oldest
+# removed first
+MAX_FINISHED_JOBS = 20
+
+# seconds between reruns of a page while it has jobs running
+POLL_INTERVAL = 2
+
+
+class Job(object):
+    """A function run in the background, with its state and progress.
+
+    The progress methods follow tqdm's, so that a job can be passed to
+    functions expecting a stqdm/tqdm progress bar.
+
+    Attributes:
+        job_id (int): The ID of the job.
+        name (str): The name shown for the job, e.g. the session name.
+        kind (str): The kind of job, e.g. "analysis", "acute" or "chronic".
+        key (tuple): Identifies the work done, so that the same work isn't
+            queued twice.
+        owner (str): The ID of the user session that started the job, if
+            any.
+        status (str): "queued", "running", "done" or "error".
+        stage (str): The current stage of the job.
+        n_done (int): The number of steps done in the current stage.
+        n_total (int): The number of steps in the current stage, if known.
+        result: The return value of the job function, once done.
+        error (str): The error message, if the job failed.
+        traceback (str): The traceback of the error, if the job failed.
+        submitted (datetime): When the job was queued.
+        finished (datetime): When the job finished.
+    """
+
+    def __init__(
+        self, job_id: int, name: str, kind: str, key: tuple, owner: str = None
+    ):
+        """Initializes an instance of Job().
+
+        Args:
+            job_id: The ID of the job.
+            name: The name shown for the job.
+            kind: The kind of job.
+            key: Identifies the work done by the job.
+            owner: The ID of the user session that started the job.
+        """
+
+        self.job_id = job_id
+        self.name = name
+        self.kind = kind
+        self.key = key
+        self.owner = owner
+        self.status = "queued"
+        self.stage = "Waiting to start..."
+        self.n_done = 0
+        self.n_total = None
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.submitted = datetime.now()
+        self.finished = None
+
+    @property
+    def is_finished(self) -> bool:
+        """Whether the job is done or failed."""
+
+        return self.status in ("done", "error")
+
+    @property
+    def progress(self) -> float | None:
+        """The fraction of the current stage that is done, if known."""
+
+        if not self.n_total:
+            return None
+
+        return min(self.n_done / self.n_total, 1.0)
+
+    def set_stage(self, stage: str, n_total: int = None):
+        """Starts a new stage of the job.
+
+        Args:
+            stage: The description of the stage.
+            n_total: The number of steps in the stage, if known.
+        """
+
+        self.stage = stage
+        self.n_done = 0
+        self.n_total = n_total
+
+    def update(self, n: int = 1):
+        """Marks steps of the current stage as done."""
+
+        self.n_done += n
+
+    def set_description(self, desc: str, refresh: bool = True):
+        """Updates the description of the current stage."""
+
+        self.stage = desc
+
+    def close(self):
+        """Does nothing, for compatibility with progress bars."""
+
+
+class JobManager(object):
+    """Runs jobs in a thread pool and keeps their state.
+
+    Attributes:
+        max_workers (int): The number of jobs run at once.
+    """
+
+    def __init__(self, max_workers: int = None):
+        """Initializes an instance of JobManager().
+
+        Args:
+            max_workers: The number of jobs run at once. Defaults to
+                ROI_APP_JOB_WORKERS or 2.
+        """
+
+        if max_workers is None:
+            max_workers = int(
+                os.environ.get("ROI_APP_JOB_WORKERS", DEFAULT_MAX_WORKERS)
+            )
+
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="roi_job"
+        )
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def submit(
+        self,
+        name: str,
+        kind: str,
+        key: tuple,
+        fn,
+        *args,
+        owner: str = None,
+        **kwargs,
+    ) -> tuple[Job, bool]:
+        """Queues a job, unless the same work is already queued or running.
+
+        Args:
+            name: The name shown for the job.
+            kind: The kind of job.
+            key: Identifies the work done by the job.
+            fn: The function to run. It's called with the Job as its first
+                argument, followed by args and kwargs.
+            args: Positional arguments passed to fn.
+            owner: The ID of the user session starting the job. Each owner
+                keeps its own MAX_FINISHED_JOBS finished jobs.
+            kwargs: Keyword arguments passed to fn.
+
+        Returns:
+            job: The queued job, or the unfinished job doing the same work.
+            is_new: Whether the job was newly queued.
+        """
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and not job.is_finished:
+                    return job, False
+
+            job = Job(self._next_id, name, kind, key, owner)
+            self._next_id += 1
+            self._jobs[job.job_id] = job
+            self._remove_old_jobs(owner)
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+
+        return job, True
+
+    def _run(self, job: Job, fn, args: tuple, kwargs: dict):
+        """Runs a job function and records its result or error."""
+
+        job.status = "running"
+        job.set_stage("Starting...")
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as error_msg:
+            job.error = f"{error_msg}"
+            job.traceback = traceback.format_exc()
+            job.status = "error"
+        job.finished = datetime.now()
+
+    def _remove_old_jobs(self, owner: str = None):
+        """Removes the oldest finished jobs of an owner past
+        MAX_FINISHED_JOBS, leaving the jobs of other owners."""
+
+        finished = [
+            x
+            for x in self._jobs.values()
+            if x.is_finished and x.owner == owner
+        ]
+        for job in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.job_id]
+
+    def get(self, job_id: int) -> Job | None:
+        """Gets a job by its ID.
+
+        Args:
+            job_id: The ID of the job.
+
+        Returns:
+            The job, or None if it has been removed.
+        """
+
+        return self._jobs.get(job_id)
+
+    def list_jobs(self, kind: str = None) -> list:
+        """Lists the jobs, oldest first.
+
+        Args:
+            kind: Only list jobs of this kind. Lists all jobs by default.
+
+        Returns:
+            A list of Jobs.
+        """
+
+        with self._lock:
+            return [
+                job
+                for job in self._jobs.values()
+                if kind is None or job.kind == kind
+            ]
+
+    def remove(self, job_id: int):
+        """Removes a finished job and its result.
+
+        Args:
+            job_id: The ID of the job.
+        """
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.is_finished:
+                del self._jobs[job_id]
+
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Gets the job manager shared by every user session of the server.
+
+    Returns:
+        The JobManager.
+    """
+
+    return JobManager()
+
+
+def submit_job(
+    name: str, kind: str, key: tuple, fn, *args, **kwargs
+) -> tuple[Job, bool]:
+    """Queues a job with JobManager.submit() as a job of this user session,
+    so that it's shown and polled by the page.
+
+    Args:
+        name: The name shown for the job.
+        kind: The kind of job.
+        key: Identifies the work done by the job.
+        fn: The function to run, called with the Job as its first argument.
+        args: Positional arguments passed to fn.
+        kwargs: Keyword arguments passed to fn.
+
+    Returns:
+        job: The queued job, or the unfinished job doing the same work.
+        is_new: Whether the job was newly queued.
+    """
+
+    if "job_owner" not in st.session_state:
+        st.session_state.job_owner = uuid.uuid4().hex
+
+    job, is_new = get_job_manager().submit(
+        name, kind, key, fn, *args, owner=st.session_state.job_owner, **kwargs
+    )
+
+    if "job_ids" not in st.session_state:
+        st.session_state.job_ids = []
+    if job.job_id not in st.session_state.job_ids:
+        st.session_state.job_ids.append(job.job_id)
+
+    return job, is_new
+
+
+def get_session_jobs(kind: str) -> list:
+    """Lists the jobs of one kind started in this user session.
+
+    Args:
+        kind: The kind of jobs to list.
+
+    Returns:
+        A list of Jobs, oldest first.
+    """
+
+    if "job_ids" not in st.session_state:
+        st.session_state.job_ids = []
+
+    return [
+        job
+        for job in get_job_manager().list_jobs(kind)
+        if job.job_id in st.session_state.job_ids
+    ]
+
+
+def get_conflicting_job(kind: str, key: tuple) -> Job | None:
+    """Gets a queued or running job working on the same folder as key, but
+    with different inputs. The keys of such jobs start with (kind, folder
+    path), followed by the inputs.
+
+    Args:
+        kind: The kind of job.
+        key: The key of the job about to be started.
+
+    Returns:
+        The conflicting job, if any.
+    """
+
+    for job in get_job_manager().list_jobs(kind):
+        if not job.is_finished and job.key[:2] == key[:2] and job.key != key:
+            return job
+
+    return None
+
+
+def show_job(job: Job):
+    """Shows the state and progress of a job.
+
+    Args:
+        job: The job to show.
+    """
+
+    label = f"**{job.name}** ({job.submitted:%H:%M:%S})"
+
+    if job.status == "error":
+        st.error(f"{label}: {job.error}")
+    elif job.status == "done":
+        st.success(
+            f"{label}: {job.stage} Finished at {job.finished:%H:%M:%S}."
+        )
+    else:
+        st.info(f"{label}: {job.stage}")
+        if job.progress is not None:
+            st.progress(
+                job.progress, text=f"{job.n_done} of {job.n_total}"
+            )
+
+
+def show_jobs(kind: str, load_label: str = None) -> Job | None:
+    """Shows the background jobs of one kind started in this user session,
+    with buttons to load the results of finished jobs and to remove them.
+
+    Args:
+        kind: The kind of jobs to show.
+        load_label: The label of the button loading a finished job's
+            result. No button is shown if None.
+
+    Returns:
+        The finished job whose result the user chose to load, if any.
+    """
+
+    jobs = get_session_jobs(kind)
+    if not jobs:
+        return None
+
+    selected_job = None
+    with st.expander("Background jobs", expanded=True):
+        for job in reversed(jobs):
+            show_job(job)
+            if job.is_finished:
+                cols = st.columns(2)
+                if (
+                    load_label
+                    and job.status == "done"
+                    and cols[0].button(load_label, key=f"load_{job.job_id}")
+                ):
+                    selected_job = job
+                if cols[1].button("Remove", key=f"remove_{job.job_id}"):
+                    get_job_manager().remove(job.job_id)
+                    st.session_state.job_ids.remove(job.job_id)
+                    st.rerun()
+
+    return selected_job
+
+
+def poll_jobs(kind: str):
+    """Reruns the page after a short wait while jobs of one kind started in
+    this user session are queued or running, so that their progress and
+    results are shown.
+
+    Should be called at the end of the page script.
+
+    Args:
+        kind: The kind of jobs to wait for.
+    """
+
+    if any(not job.is_finished for job in get_session_jobs(kind)):
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
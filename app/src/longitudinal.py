@@ -0,0 +1,317 @@
+"""Contains the dense longitudinal data model for chronic datasets and the
+vectorized metrics used to follow samples across imaging sessions."""
+
+import numpy as np
+import pandas as pd
+from natsort import natsorted
+
+
+class ChronicTensor(object):
+    """Stores every measurement from a chronic dataset in one dense array
+    with (date, sample, odor, measure) axes.
+
+    Non-significant responses and samples that were not imaged on a given
+    date are stored as NaN.
+
+    Attributes:
+        sample_type (str): The sample type, e.g. "Cell", "Glomerulus", or "Grid".
+        dates (list): The imaging dates, sorted chronologically.
+        samples (list): The sample numbers found across all dates.
+        odors (list): The odors found across all dates.
+        measures (list): The measurement names, in df_list order.
+        date_index (dict): Imaging date as keys and its timepoint position as
+            values.
+        values (np.ndarray): The measurement values with shape
+            (n_dates, n_samples, n_odors, n_measures).
+        present (np.ndarray): Boolean array with shape (n_dates, n_samples),
+            True if the sample was imaged on that date.
+    """
+
+    def __init__(self, df_list: list, measures: list, sample_type: str):
+        """Initializes an instance of ChronicTensor() from the compiled
+        per-measurement DataFrames.
+
+        Args:
+            df_list: A list of DataFrames, one for each measurement, as
+                returned by import_all_excel_data().
+            measures: A list of the measurement names.
+            sample_type: The sample type, e.g. "Cell", "Glomerulus", or "Grid".
+        """
+
+        self.sample_type = sample_type
+        self.measures = list(measures)
+
+        all_dates = pd.concat([df["Date"] for df in df_list])
+        self.dates = sorted(all_dates.astype(str).unique())
+        self.samples = sorted(
+            set().union(*[df.index.unique() for df in df_list])
+        )
+        self.odors = natsorted(
+            set().union(
+                *[
+                    [col[1] for col in df.columns if col[0] == measure]
+                    for df, measure in zip(df_list, self.measures)
+                ]
+            )
+        )
+        self.date_index = {date: ct for ct, date in enumerate(self.dates)}
+
+        self.values = np.full(
+            (
+                len(self.dates),
+                len(self.samples),
+                len(self.odors),
+                len(self.measures),
+            ),
+            np.nan,
+        )
+        self.present = np.zeros(
+            (len(self.dates), len(self.samples)), dtype=bool
+        )
+
+        for measure_ct, (df, measure) in enumerate(zip(df_list, measures)):
+            date_codes = pd.Categorical(
+                df["Date"].astype(str), categories=self.dates
+            ).codes
+            sample_codes = pd.Categorical(
+                df.index, categories=self.samples
+            ).codes
+
+            measure_df = df[measure].reindex(columns=self.odors)
+            measure_values = measure_df.apply(
+                pd.to_numeric, errors="coerce"
+            ).to_numpy(dtype=float)
+
+            self.values[date_codes, sample_codes, :, measure_ct] = (
+                measure_values
+            )
+            self.present[date_codes, sample_codes] = True
+
+    def get_measure(self, measure: str) -> np.ndarray:
+        """Gets the values of one measurement for all dates, samples and odors.
+
+        Args:
+            measure: The measurement name, e.g. "Latency (s)".
+
+        Returns:
+            An array with shape (n_dates, n_samples, n_odors).
+        """
+
+        return self.values[..., self.measures.index(measure)]
+
+    def get_sample(self, sample: int, measure: str) -> pd.DataFrame:
+        """Gets one sample's values for a measurement across all dates.
+
+        Args:
+            sample: The sample number.
+            measure: The measurement name.
+
+        Returns:
+            A DataFrame with dates as rows and odors as columns.
+        """
+
+        sample_values = self.get_measure(measure)[
+            :, self.samples.index(sample), :
+        ]
+
+        return pd.DataFrame(sample_values, index=self.dates, columns=self.odors)
+
+    @property
+    def responsive(self) -> np.ndarray:
+        """np.ndarray: Boolean (date, sample, odor) array, True where the
+        sample had a significant response (a latency was measured)."""
+        return ~np.isnan(self.get_measure("Latency (s)"))
+
+
+def get_response_values(tensor: ChronicTensor, measure: str) -> np.ndarray:
+    """Gets measurement values with non-significant responses filled in.
+
+    Non-significant responses count as 0 for amplitude measures, matching the
+    mean values shown in the chronic plots. Samples that were not imaged on a
+    date stay NaN.
+
+    Args:
+        tensor: The chronic dataset tensor.
+        measure: The measurement name.
+
+    Returns:
+        An array with shape (n_dates, n_samples, n_odors).
+    """
+
+    values = tensor.get_measure(measure).copy()
+
+    if measure == "Blank-subtracted DeltaF/F(%)" or measure == "Blank sub AUC":
+        values[np.isnan(values)] = 0
+
+    values[~tensor.present] = np.nan
+
+    return values
+
+
+def calc_response_stability(
+    tensor: ChronicTensor, measure: str = "Blank-subtracted DeltaF/F(%)"
+) -> pd.DataFrame:
+    """Calculates how stable each sample's odor responses are over time.
+
+    Args:
+        tensor: The chronic dataset tensor.
+        measure: The measurement used for tuning and variability metrics.
+
+    Returns:
+        A DataFrame with samples as rows and the following columns:
+            Sessions imaged: The number of dates the sample was imaged.
+            Response probability: The fraction of imaged sessions × odors
+                with a significant response.
+            Tuning correlation: The mean correlation between the sample's odor
+                tuning curves in consecutive sessions.
+            CV: The mean coefficient of variation of the measurement across
+                sessions, over all odors with at least two responses.
+    """
+
+    responsive = tensor.responsive & tensor.present[:, :, None]
+    sessions_imaged = tensor.present.sum(axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        response_prob = responsive.sum(axis=(0, 2)) / (
+            sessions_imaged * len(tensor.odors)
+        )
+
+        # correlates tuning curves (odor axis) between consecutive sessions
+        tuning = get_response_values(tensor, measure)
+        tuning = tuning - _nanmean(tuning, axis=2)[:, :, None]
+        prev_tuning, next_tuning = tuning[:-1], tuning[1:]
+        tuning_r = np.sum(prev_tuning * next_tuning, axis=2) / np.sqrt(
+            np.sum(prev_tuning**2, axis=2) * np.sum(next_tuning**2, axis=2)
+        )
+
+        # coefficient of variation across sessions, significant responses only
+        sig_values = np.where(responsive, tensor.get_measure(measure), np.nan)
+        n_responses = responsive.sum(axis=0)
+        sig_mean = _nanmean(sig_values, axis=0)
+        sig_std = np.sqrt(_nanmean((sig_values - sig_mean) ** 2, axis=0))
+        cv = np.abs(sig_std / sig_mean)
+        cv[n_responses < 2] = np.nan
+
+    stability_df = pd.DataFrame(
+        {
+            "Sessions imaged": sessions_imaged,
+            "Response probability": response_prob,
+            "Tuning correlation": _nanmean(tuning_r, axis=0),
+            "CV": _nanmean(cv, axis=1),
+        },
+        index=pd.Index(tensor.samples, name=tensor.sample_type),
+    )
+
+    return stability_df
+
+
+def calc_population_drift(
+    tensor: ChronicTensor, measure: str = "Blank-subtracted DeltaF/F(%)"
+) -> pd.DataFrame:
+    """Calculates the session-to-session population vector correlation
+    (representational drift).
+
+    Each session's population vector holds the measurement for every
+    sample × odor pair. Each pair of sessions is only compared over samples
+    that were imaged in both sessions. All pairwise sums are computed as
+    masked matrix products so every pair of sessions is handled at once.
+
+    Args:
+        tensor: The chronic dataset tensor.
+        measure: The measurement used to build population vectors.
+
+    Returns:
+        A symmetric DataFrame of Pearson correlations with dates as rows and
+        columns.
+    """
+
+    values = get_response_values(tensor, measure).reshape(
+        len(tensor.dates), -1
+    )
+    mask = ~np.isnan(values)
+    x = np.where(mask, values, 0)
+    m = mask.astype(float)
+
+    n = m @ m.T
+    sum_x = x @ m.T
+    sum_xx = (x * x) @ m.T
+    sum_xy = x @ x.T
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = n * sum_xy - sum_x * sum_x.T
+        var = n * sum_xx - sum_x**2
+        drift = cov / np.sqrt(var * var.T)
+
+    return pd.DataFrame(drift, index=tensor.dates, columns=tensor.dates)
+
+
+def calc_drift_by_lag(drift_df: pd.DataFrame) -> pd.Series:
+    """Averages population vector correlations by the number of sessions
+    between timepoints.
+
+    Args:
+        drift_df: The session × session correlations from
+            calc_population_drift().
+
+    Returns:
+        A Series with session lag as index and mean correlation as values.
+    """
+
+    drift = drift_df.to_numpy()
+    lags = range(1, len(drift))
+    lag_means = [_nanmean(np.diagonal(drift, offset=lag)) for lag in lags]
+
+    return pd.Series(
+        lag_means, index=pd.Index(lags, name="Session lag"), name="Mean r"
+    )
+
+
+def calc_response_turnover(tensor: ChronicTensor) -> pd.DataFrame:
+    """Calculates the fraction of sample × odor pairs gaining or losing
+    significant responses between consecutive sessions.
+
+    Only samples imaged in both sessions of a transition are counted.
+
+    Args:
+        tensor: The chronic dataset tensor.
+
+    Returns:
+        A DataFrame with each session (from the second onward) as rows and
+        the fractions of pairs that Gained, Lost, or kept (Stable) a response
+        compared to the previous session.
+    """
+
+    responsive = tensor.responsive
+    both_present = (tensor.present[:-1] & tensor.present[1:])[:, :, None]
+    prev_resp, next_resp = responsive[:-1], responsive[1:]
+
+    n_pairs = both_present.sum(axis=(1, 2)) * len(tensor.odors)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        turnover_df = pd.DataFrame(
+            {
+                "Gained": (~prev_resp & next_resp & both_present).sum(
+                    axis=(1, 2)
+                )
+                / n_pairs,
+                "Lost": (prev_resp & ~next_resp & both_present).sum(
+                    axis=(1, 2)
+                )
+                / n_pairs,
+                "Stable": (prev_resp & next_resp & both_present).sum(
+                    axis=(1, 2)
+                )
+                / n_pairs,
+            },
+            index=pd.Index(tensor.dates[1:], name="Date"),
+        )
+
+    return turnover_df
+
+
+def _nanmean(values: np.ndarray, axis: int = None) -> np.ndarray | float:
+    """Takes the mean ignoring NaN without warning on all-NaN slices."""
+
+    mask = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(mask, values, 0).sum(axis=axis) / mask.sum(axis=axis)
@@ -0,0 +1,152 @@
+"""Contains the disk-backed cache of parsed .xlsx files, keyed by a hash of
+the file contents, so that re-uploaded files aren't parsed again.
+
+The cache directory and size limit can be set with the ROI_APP_CACHE_DIR and
+ROI_APP_CACHE_MB environment variables. Setting ROI_APP_CACHE_MB to 0 turns
+the cache off.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(Path.home(), ".cache", "roi_app", "parse_cache")
+DEFAULT_CACHE_MB = 500
+
+
+class ParseCache(object):
+    """Stores parsed results as pickle files in a directory, evicting the
+    least recently used files once the directory exceeds its size limit.
+
+    Attributes:
+        cache_dir (Path): The directory holding the cached files.
+        max_bytes (int): The size limit of the cache directory.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None):
+        """Initializes an instance of ParseCache().
+
+        Args:
+            cache_dir: The directory holding the cached files. Defaults to
+                ROI_APP_CACHE_DIR or ~/.cache/roi_app/parse_cache.
+            max_bytes: The size limit of the cache directory. Defaults to
+                ROI_APP_CACHE_MB or 500 MB.
+        """
+
+        if cache_dir is None:
+            cache_dir = os.environ.get("ROI_APP_CACHE_DIR", DEFAULT_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(
+                float(os.environ.get("ROI_APP_CACHE_MB", DEFAULT_CACHE_MB))
+                * 1024**2
+            )
+
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache is turned on."""
+
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(file_hash: str, kind: str, *params) -> str:
+        """Makes the cache key for one parsed result.
+
+        Args:
+            file_hash: The hash of the file contents.
+            kind: The kind of result, e.g. "analysis" or "avg_means".
+            params: Any parameters the result depends on.
+
+        Returns:
+            The key, used as the cache file name.
+        """
+
+        params_hash = hashlib.sha256(repr(params).encode()).hexdigest()[:16]
+
+        return f"{file_hash}_{kind}_{params_hash}"
+
+    def _get_path(self, key: str) -> Path:
+        """Gets the path of the cache file for a key."""
+
+        return Path(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str):
+        """Gets a cached result and marks it as recently used.
+
+        Args:
+            key: The key from make_key().
+
+        Returns:
+            The cached result, or None if it isn't cached.
+        """
+
+        if not self.enabled:
+            return None
+
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except (
+            OSError,
+            pickle.UnpicklingError,
+            EOFError,
+            AttributeError,
+            ImportError,
+        ):
+            return None
+
+        return value
+
+    def put(self, key: str, value):
+        """Caches a result, then evicts old results if the cache is full.
+
+        Args:
+            key: The key from make_key().
+            value: The result to cache. Must be picklable.
+        """
+
+        if not self.enabled:
+            return
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # writes to a temporary file first so readers never see a
+            # partially written file
+            with tempfile.NamedTemporaryFile(
+                dir=self.cache_dir, suffix=".tmp", delete=False
+            ) as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(f.name, self._get_path(key))
+        except OSError:
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used results until the cache fits in
+        its size limit."""
+
+        try:
+            cache_files = [
+                (x.stat().st_mtime, x.stat().st_size, x)
+                for x in self.cache_dir.glob("*.pkl")
+            ]
+        except OSError:
+            return
+
+        total_bytes = sum(size for _, size, _ in cache_files)
+        for _, size, path in sorted(cache_files):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total_bytes -= size
+            except OSError:
+                pass
+
@@ -1,13 +1,38 @@
 """Contains functions for creating and formatting plots."""
 
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import plotly.io as pio
 from math import nan
+import colorsys
+from collections import defaultdict
+from itertools import compress
+import numpy as np
 import pandas as pd
 
+from src.dataset import CompiledDataset
+from src.downsample import downsample
+
 pio.templates.default = "plotly_white"
 import pdb
 
+# spacing of the points of each imaging session, as fractions of the space
+# given to each animal (acute) or timepoint (chronic)
+ACUTE_BOX_GAP = 0.4
+CHRONIC_BOX_WIDTH = 0.7
+POINT_JITTER = 0.3
+MEAN_LINE_WIDTH = 0.55
+
+# base colors of the animals in acute plots, repeated for larger cohorts
+ACUTE_BASE_COLORS = [
+    "#EDAE49",
+    "#003D5B",
+    "#D1495B",
+    "#00798C",
+    "#DF7C52",
+    "#30638E",
+]
+
 
 def get_odor_colors() -> dict:
     """Creates fixed colors for 8 odors.
@@ -30,14 +55,27 @@ def get_odor_colors() -> dict:
 
 
 def plot_avg_amps(
-    avg_means_df: pd.DataFrame, odors_to_plot: list
+    avg_means_df: pd.DataFrame,
+    odors_to_plot: list,
+    max_points: int = None,
+    frame_range: tuple = None,
+    method: str = "lttb",
 ) -> go.Figure:
     """Plots the mean fluorescence amplitude of every odor for one sample.
 
+    By default every frame is plotted as an SVG trace. If max_points is set,
+    the traces are drawn with WebGL and each is downsampled to at most
+    max_points points within frame_range, so that the plot stays fast for
+    long sessions. Narrowing frame_range shows more of the frames in it.
+
     Args:
         avg_means_df: DataFrame containing the mean fluorescence amplitudes
             for the sample.
         odors_to_plot: List of odors for which to generate plots.
+        max_points: The maximum number of points per trace. Plots every
+            frame if None.
+        frame_range: The first and last frames to plot, if downsampling.
+        method: The downsampling method, see downsample().
 
     Returns:
         A plot containing one trace for each mean fluorescence amplitude per
@@ -47,19 +85,45 @@ def plot_avg_amps(
     odor_colors = get_odor_colors()
     fig = go.Figure()
 
+    frames = avg_means_df["Frame"]
+    if max_points is not None and frame_range is not None:
+        in_range = frames.between(*frame_range).to_numpy()
+        frames = frames[in_range]
+    else:
+        in_range = slice(None)
+
     for odor in odors_to_plot:
-        fig.add_trace(
-            go.Scatter(
-                x=avg_means_df["Frame"],
-                y=avg_means_df[odor],
-                line=dict(color=odor_colors[f"Odor {odor}"]),
-                name=odor,
+        if max_points is None:
+            fig.add_trace(
+                go.Scatter(
+                    x=frames,
+                    y=avg_means_df[odor],
+                    line=dict(color=odor_colors[f"Odor {odor}"]),
+                    name=odor,
+                )
+            )
+        else:
+            x, y = downsample(
+                frames,
+                avg_means_df[odor].to_numpy()[in_range],
+                max_points,
+                method,
+            )
+            fig.add_trace(
+                go.Scattergl(
+                    x=x,
+                    y=y,
+                    mode="lines",
+                    line=dict(color=odor_colors[f"Odor {odor}"]),
+                    name=odor,
+                )
             )
-        )
 
     fig.update_xaxes(
         title_text="Frame",
     )
+    if max_points is not None and frame_range is not None:
+        fig.update_xaxes(range=list(frame_range))
     fig.update_yaxes(
         title_text="Mean amplitude",
     )
@@ -69,195 +133,555 @@ def plot_avg_amps(
 
 
 def set_color_scales(dataset_type: str) -> dict:
-    """Creates fixed color scales used for plotting.
+    """Creates fixed color scales used for plotting. Acute color scales are
+    made by make_acute_color_scale() instead.
 
     Args:
-        dataset_type: Chronic or acute dataset.
+        dataset_type: Chronic dataset.
 
     Returns:
-        A dict with timepoints as keys and hex color codes as items.
+        A dict with a list of marker colors, which timepoints take in turn,
+            and the line color.
     """
 
-    if dataset_type == "acute":
-        #  This creates color scales for 12 animals with 2 ROIs each
-        colorscale = {
-            "marker": {
-                1: ["rgba(237, 174, 73, 0.5)", "rgba(244, 206, 144, 0.5)"],
-                2: ["rgba(0, 61, 91, 0.5)", "rgba(0, 109, 163, 0.5)"],
-                3: ["rgba(209, 73, 91, 0.5)", "rgba(222, 124, 137, 0.5)"],
-                4: ["rgba(0, 121, 140, 0.5)", "rgba(0, 177, 204, 0.5)"],
-                5: ["rgba(223, 124, 82, 0.5)", "rgba(233, 164, 134, 0.5)"],
-                6: ["rgba(48, 99, 142, 0.5)", "rgba(73, 139, 193, 0.5)"],
-                7: ["rgba(237, 174, 73, 0.5)", "rgba(244, 206, 144, 0.5)"],
-                8: ["rgba(0, 61, 91, 0.5)", "rgba(0, 109, 163, 0.5)"],
-                9: ["rgba(209, 73, 91, 0.5)", "rgba(222, 124, 137, 0.5)"],
-                10: ["rgba(0, 121, 140, 0.5)", "rgba(0, 177, 204, 0.5)"],
-                11: ["rgba(223, 124, 82, 0.5)", "rgba(233, 164, 134, 0.5)"],
-                12: ["rgba(48, 99, 142, 0.5)", "rgba(73, 139, 193, 0.5)"],
-            },
-            "lines": {
-                1: ["#95610F", "#EDAE49"],
-                2: ["#001B29", "#003D5B"],
-                3: ["#621822", "#D1495B"],
-                4: ["#004752", "#00798C"],
-                5: ["#793416", "#DF7C52"],
-                6: ["#1A354C", "#30638E"],
-                7: ["#95610F", "#EDAE49"],
-                8: ["#001B29", "#003D5B"],
-                9: ["#621822", "#D1495B"],
-                10: ["#004752", "#00798C"],
-                11: ["#793416", "#DF7C52"],
-                12: ["#1A354C", "#30638E"],
-            },
-        }
-    elif dataset_type == "chronic":
-        #  This creates color scales for 20 timepoints
+    if dataset_type == "chronic":
+        #  This creates a color scale of 10 timepoints, repeated for later
+        #  timepoints by get_chronic_marker_colors()
         colorscale = {
-            "marker": {
-                1: "rgba(162, 255, 255, 0.5)",
-                2: "rgba(126, 233, 255, 0.5)",
-                3: "rgba(87, 202, 255, 0.5)",
-                4: "rgba(36, 172, 255, 0.5)",
-                5: "rgba(0, 142, 227, 0.5)",
-                6: "rgba(0, 114, 196, 0.5)",
-                7: "rgb(0, 87, 165, 0.5)",
-                8: "rgba(0, 62, 135, 0.5)",
-                9: "rgba(0, 38, 107, 0.5)",
-                10: "rgba(0, 15, 79, 0.5)",
-                11: "rgba(162, 255, 255, 0.5)",
-                12: "rgba(126, 233, 255, 0.5)",
-                13: "rgba(87, 202, 255, 0.5)",
-                14: "rgba(36, 172, 255, 0.5)",
-                15: "rgba(0, 142, 227, 0.5)",
-                16: "rgba(0, 114, 196, 0.5)",
-                17: "rgb(0, 87, 165, 0.5)",
-                18: "rgba(0, 62, 135, 0.5)",
-                19: "rgba(0, 38, 107, 0.5)",
-                20: "rgba(0, 15, 79, 0.5)"
-                # 10: "#000f4f",
-            },
+            "marker": [
+                "rgba(162, 255, 255, 0.5)",
+                "rgba(126, 233, 255, 0.5)",
+                "rgba(87, 202, 255, 0.5)",
+                "rgba(36, 172, 255, 0.5)",
+                "rgba(0, 142, 227, 0.5)",
+                "rgba(0, 114, 196, 0.5)",
+                "rgb(0, 87, 165, 0.5)",
+                "rgba(0, 62, 135, 0.5)",
+                "rgba(0, 38, 107, 0.5)",
+                "rgba(0, 15, 79, 0.5)",
+                # "#000f4f",
+            ],
             "lines": "#000f4f",
         }
 
     return colorscale
 
 
-def set_colors_legends(
-    dataset_type: str,
-    color_scale: dict,
-    animal_ct: int,
-    exp_ct: int,
-    x_interval: str,
-) -> tuple[str, str, int]:
-    """Sets the colors and groups for plot legends.
+def get_chronic_marker_colors(color_scale: dict, timepoints: list) -> list:
+    """Gets the marker color of each chronic timepoint, cycling through the
+    color scale so that any number of timepoints can be plotted.
+
+    Args:
+        color_scale: The chronic color scale made by set_color_scales().
+        timepoints: The timepoint of each experiment, starting at 1.
+
+    Returns:
+        The marker color of each experiment.
+    """
+
+    marker_colors = color_scale["marker"]
+
+    return [marker_colors[(x - 1) % len(marker_colors)] for x in timepoints]
+
+
+def make_fig(traces: list, layout: dict, validate: bool = False) -> go.Figure:
+    """Makes a figure from trace and layout dicts in one step.
+
+    Plotly checks every property of every trace and shape when they are
+    added to a figure, which takes most of the time when making plots with
+    many traces. The plots made here only set known properties, so the
+    checks are skipped by default.
+
+    Args:
+        traces: The trace dicts, e.g. {"type": "scatter", "x": x, ...}.
+        layout: The layout dict, including any shapes.
+        validate: Whether Plotly checks the traces and layout.
+
+    Returns:
+        The figure.
+    """
+
+    return go.Figure(data=traces, layout=layout, _validate=validate)
+
+
+def jitter_points(positions: np.ndarray, box_width: float) -> np.ndarray:
+    """Spreads points horizontally around their positions, as go.Box() does
+    with boxpoints="all". A fixed seed is used so that the same data always
+    gives the same plot.
 
     Args:
-        dataset_type: Chronic or acute dataset.
-        color_scale: Color values to assign to traces.
-        animal_ct: For acute only, the animal being plotted.
-        exp_ct: For acute only, the experimental session being plotted.
-        x_interval: For chronic only, the timepoint being plotted.
+        positions: The x position of each point.
+        box_width: The width of the column of points, in x axis units.
 
     Returns:
-        marker_color: The color of the marker for data points.
-        line_color: The color of the line connecting data points.
-        legend_group: The group the trace belongs to in the legends.
+        The jittered x positions.
     """
 
-    if dataset_type == "acute":
-        marker_color = color_scale["marker"][animal_ct + 1][exp_ct]
-        line_color = color_scale["lines"][animal_ct + 1][exp_ct]
-        legend_group = animal_ct
-    elif dataset_type == "chronic":
-        marker_color = color_scale["marker"][x_interval]
-        line_color = color_scale["lines"]
-        legend_group = exp_ct
+    rng = np.random.default_rng(0)
+    offsets = rng.uniform(-1, 1, len(positions)) * POINT_JITTER * box_width
+
+    return positions + offsets / 2
+
 
-    return marker_color, line_color, legend_group
+def make_point_traces(
+    exp_names: list,
+    exp_values: dict,
+    positions: list,
+    marker_colors: list,
+    line_colors: list,
+    legend_groups: list,
+    box_width: float,
+) -> list:
+    """Makes one trace per legend group holding the measurement values of
+    every imaging session in the group, with per-point positions and colors.
+
+    Each group's trace is the legend entry of its first session, and the
+    other sessions of the group get an empty trace for their legend entry,
+    so that clicking any entry hides the values of its whole group.
+
+    Args:
+        exp_names: The imaging sessions being plotted, in plotting order.
+        exp_values: Dict with imaging sessions as keys and arrays of their
+            measurement values as values.
+        positions: The x position of each session's points.
+        marker_colors: The marker color of each session's points.
+        line_colors: The marker outline color of each session's points.
+        legend_groups: The legend group of each session.
+        box_width: The width of each column of points, in x axis units.
+
+    Returns:
+        A list of trace dicts.
+    """
+
+    counts = [len(exp_values[exp_name]) for exp_name in exp_names]
+    if exp_names:
+        y = np.concatenate([exp_values[exp_name] for exp_name in exp_names])
+    else:
+        y = np.empty(0)
+
+    legend_groups = [str(x) for x in legend_groups]
+    x = jitter_points(np.repeat(positions, counts), box_width)
+    text = np.repeat(exp_names, counts)
+    point_marker_colors = np.repeat(marker_colors, counts)
+    point_line_colors = np.repeat(line_colors, counts)
+    point_groups = np.repeat(legend_groups, counts)
+
+    traces = []
+    added_groups = set()
+    for exp_name, marker_color, line_color, legend_group in zip(
+        exp_names, marker_colors, line_colors, legend_groups
+    ):
+        if legend_group in added_groups:
+            # legend entry only, the values are in the group's trace
+            traces.append(
+                {
+                    "type": "scatter",
+                    "mode": "markers",
+                    "x": [None],
+                    "y": [None],
+                    "marker": {
+                        "color": marker_color,
+                        "size": 12,
+                        "line": {"color": line_color, "width": 2},
+                    },
+                    "name": exp_name,
+                    "legendgroup": legend_group,
+                }
+            )
+            continue
+
+        added_groups.add(legend_group)
+        in_group = point_groups == legend_group
+        traces.append(
+            {
+                "type": "scatter",
+                "mode": "markers",
+                "x": x[in_group],
+                "y": y[in_group],
+                "text": text[in_group],
+                "hovertemplate": "%{text}<br />%{y}<extra></extra>",
+                "marker": {
+                    "color": point_marker_colors[in_group],
+                    "size": 12,
+                    "line": {
+                        "color": point_line_colors[in_group],
+                        "width": 2,
+                    },
+                },
+                "name": exp_name,
+                "legendgroup": legend_group,
+            }
+        )
+
+    return traces
+
+
+def make_summary_traces(
+    stats: pd.DataFrame,
+    positions: list,
+    marker_colors: list,
+    line_colors: list,
+    legend_groups: list,
+    box_width: float,
+) -> list:
+    """Makes one box per imaging session from its summary statistics, plus
+    one trace per legend group with the mean and SEM of its sessions,
+    instead of plotting every value.
+
+    The boxes show the median and quartiles, with whiskers from the minimum
+    to the maximum value.
+
+    Args:
+        stats: The summary statistics of each imaging session, in plotting
+            order, made by CompiledDataset.get_summary_stats().
+        positions: The x position of each session's box.
+        marker_colors: The fill color of each session's box.
+        line_colors: The line color of each session's box.
+        legend_groups: The legend group of each session.
+        box_width: The width of each box, in x axis units.
+
+    Returns:
+        A list of trace dicts.
+    """
+
+    traces = [
+        {
+            "type": "box",
+            "x": [position],
+            "q1": [exp_stats.q1],
+            "median": [exp_stats.median],
+            "q3": [exp_stats.q3],
+            "lowerfence": [exp_stats.min],
+            "upperfence": [exp_stats.max],
+            "width": box_width,
+            "fillcolor": marker_color,
+            "line": {"color": line_color},
+            "name": exp_stats.Index,
+            "legendgroup": str(legend_group),
+        }
+        for exp_stats, position, marker_color, line_color, legend_group in zip(
+            stats.itertuples(),
+            positions,
+            marker_colors,
+            line_colors,
+            legend_groups,
+        )
+    ]
+
+    # the mean and SEM of every session of a legend group are one trace
+    legend_groups = np.array([str(x) for x in legend_groups])
+    positions = np.asarray(positions)
+    line_colors = np.asarray(line_colors)
+    text = np.array(
+        [
+            f"{exp_name}<br />n = {count}, SEM = {sem:.4g}"
+            for exp_name, count, sem in zip(
+                stats.index, stats["count"], stats["sem"]
+            )
+        ]
+    )
+    means = stats["mean"].to_numpy()
+    sems = stats["sem"].to_numpy()
+
+    for legend_group in dict.fromkeys(legend_groups):
+        in_group = legend_groups == legend_group
+        traces.append(
+            {
+                "type": "scatter",
+                "mode": "markers",
+                "x": positions[in_group],
+                "y": means[in_group],
+                "error_y": {
+                    "type": "data",
+                    "array": sems[in_group],
+                    "color": "#444444",
+                },
+                "text": text[in_group],
+                "hovertemplate": "%{text}<br />mean = %{y}<extra></extra>",
+                "marker": {
+                    "color": line_colors[in_group],
+                    "symbol": "diamond",
+                    "size": 8,
+                },
+                "legendgroup": legend_group,
+                "showlegend": False,
+            }
+        )
+
+    return traces
+
+
+def make_measure_layout(measure: str, x_title: str) -> dict:
+    """Makes the layout shared by the acute and chronic measurement plots.
+
+    Args:
+        measure: The measure being plotted.
+        x_title: The x axis title, e.g. "Animal ID" or the chronic interval.
+
+    Returns:
+        The layout dict.
+    """
+
+    layout = {
+        "title": {"text": measure, "x": 0.4, "xanchor": "center"},
+        "xaxis": {
+            "title": {"text": f"<br />{x_title}"},
+            "showticklabels": True,
+        },
+        "yaxis": {"title": {"text": measure}},
+        "legend": {"title": {"text": "Experiment ID<br />"}},
+        "showlegend": True,
+    }
+
+    if measure == "Time to peak (s)":
+        layout["yaxis"]["rangemode"] = "tozero"
+
+    return layout
+
+
+def make_acute_color_scale(n_animals: int, n_rois: int) -> dict:
+    """Creates color scales for any number of animals and ROIs.
+
+    Animals take the base colors in turn. The ROIs of an animal get
+    increasingly light shades of its color for markers, and increasingly
+    dark shades for lines, ending at the base color.
+
+    Args:
+        n_animals: The number of animals plotted.
+        n_rois: The largest number of ROIs plotted for one animal.
+
+    Returns:
+        A dict with "marker" and "lines" keys, each holding a list of colors
+            for every animal, with one color per ROI.
+    """
+
+    color_scale = {"marker": [], "lines": []}
+
+    for animal_ct in range(n_animals):
+        base_color = ACUTE_BASE_COLORS[animal_ct % len(ACUTE_BASE_COLORS)]
+        hue, lightness, saturation = colorsys.rgb_to_hls(
+            *[int(base_color[i : i + 2], 16) / 255 for i in (1, 3, 5)]
+        )
+
+        marker_colors, line_colors = [], []
+        for roi_ct in range(n_rois):
+            # goes from 0 for the first ROI to 1 for the last
+            shade = roi_ct / max(n_rois - 1, 1)
+            marker_rgb = colorsys.hls_to_rgb(
+                hue, lightness + (1 - lightness) * 0.3 * shade, saturation
+            )
+            line_rgb = colorsys.hls_to_rgb(
+                hue, lightness * (0.5 + 0.5 * shade), saturation
+            )
+            marker_colors.append(
+                "rgba({}, {}, {}, 0.5)".format(
+                    *[round(x * 255) for x in marker_rgb]
+                )
+            )
+            line_colors.append(
+                "#{:02X}{:02X}{:02X}".format(
+                    *[round(x * 255) for x in line_rgb]
+                )
+            )
+
+        color_scale["marker"].append(marker_colors)
+        color_scale["lines"].append(line_colors)
+
+    return color_scale
+
+
+def get_acute_positions(sig_odor_exps: dict) -> tuple[list, float]:
+    """Places the points of each imaging session on the acute x axis.
+
+    The axis has one category per animal, centered at 0, 1, 2... Within a
+    category, the animal's ROIs are side by side columns, like grouped
+    boxes. Animals with fewer ROIs keep their empty columns so that columns
+    line up across animals.
+
+    Args:
+        sig_odor_exps: Dict of animal IDs with lists of significant odor
+            experiments.
+
+    Returns:
+        positions: The x position of each experiment, in plotting order.
+        box_width: The width of each column, in x axis units.
+    """
+
+    roi_cols = max([len(x) for x in sig_odor_exps.values()], default=1)
+    box_width = (1 - ACUTE_BOX_GAP) / roi_cols
+    first_col = -(1 - ACUTE_BOX_GAP) / 2 + box_width / 2
+
+    positions = [
+        animal_ct + first_col + exp_ct * box_width
+        for animal_ct, exps in enumerate(sig_odor_exps.values())
+        for exp_ct in range(len(exps))
+    ]
+
+    return positions, box_width
+
+
+def make_mean_line_traces(
+    positions: list,
+    means: list,
+    colors: list,
+    legend_groups: list,
+    line_width: float,
+) -> list:
+    """Makes the mean lines of all imaging sessions as line traces, with one
+    trace per legend group and line color holding every such line.
+
+    Args:
+        positions: The x position of each mean line's center.
+        means: The mean value of each line.
+        colors: The color of each line.
+        legend_groups: The legend group of each line's session, so that the
+            line is hidden with its points.
+        line_width: The length of each line, in x axis units.
+
+    Returns:
+        A list of trace dicts.
+    """
+
+    # lines of the same group and color are joined into one trace, split by
+    # None
+    segments = defaultdict(lambda: ([], []))
+    for position, mean, color, legend_group in zip(
+        positions, means, colors, legend_groups
+    ):
+        x, y = segments[(str(legend_group), color)]
+        x.extend([position - line_width / 2, position + line_width / 2, None])
+        y.extend([mean, mean, None])
+
+    return [
+        {
+            "type": "scatter",
+            "mode": "lines",
+            "x": x,
+            "y": y,
+            "line": {"color": color, "width": 4},
+            "hoverinfo": "skip",
+            "legendgroup": legend_group,
+            "showlegend": False,
+        }
+        for (legend_group, color), (x, y) in segments.items()
+    ]
 
 
 def plot_acute_odor_measure_fig(
-    sig_odor_exps: list,
-    data_dict: dict,
+    sig_odor_exps: dict,
+    dataset: CompiledDataset,
     odor: str,
     measure: str,
-    total_animals: int,
-    plot_groups: bool,
-    total_cols: int,
+    summary: bool = False,
 ) -> go.Figure:
     """Plots the values for specified odor and measurement, acute experiment.
 
-    Wrapper function for add_measure_trace().
+    Each animal has one column of points per ROI, placed by
+    get_acute_positions(), with a line at the mean of each column that has
+    more than one point. If summary is True, each column is instead a box
+    made from summary statistics, see make_summary_traces().
 
     Args:
-        sig_odor_exps: List of significant odor experiments.
-        data_dict: All significant data for the dataset.
+        sig_odor_exps: Dict of animal IDs with lists of significant odor
+            experiments.
+        dataset: The CompiledDataset holding all data for the dataset.
         odor: The odor being plotted.
         measure: The measure being plotted.
-        total_animals: Total number of animals in the dataset.
-        plot_groups: Whether plot has groups for multiple ROIs.
-        total_cols: Total number of columns, if multiple ROIs exist.
+        summary: Whether to plot summary boxes instead of every value.
 
     Returns:
         A plot for the measurement, containing data for every animal and odor.
     """
 
-    measure_fig = go.Figure()
-    color_scale = set_color_scales("acute")
+    positions, box_width = get_acute_positions(sig_odor_exps)
+    color_scale = make_acute_color_scale(
+        len(sig_odor_exps), max(map(len, sig_odor_exps.values()), default=1)
+    )
 
+    exp_names, marker_colors, line_colors, legend_groups = [], [], [], []
     for animal_ct, animal_id in enumerate(sig_odor_exps.keys()):
         for exp_ct, sig_experiment in enumerate(sig_odor_exps[animal_id]):
-            exp_odor_df = data_dict[animal_id][sig_experiment][odor]
-
-            add_measure_trace(
-                measure_fig,
-                exp_ct,
-                sig_experiment,
-                "acute",
-                animal_id,
-                exp_odor_df.loc[measure],
-                animal_ct,
-            )
+            exp_names.append(sig_experiment)
+            marker_colors.append(color_scale["marker"][animal_ct][exp_ct])
+            line_colors.append(color_scale["lines"][animal_ct][exp_ct])
+            legend_groups.append(animal_ct)
+
+    layout = make_measure_layout(measure, "Animal ID")
+    layout["xaxis"].update(
+        tickvals=list(range(len(sig_odor_exps))),
+        ticktext=list(sig_odor_exps.keys()),
+        range=[-0.5, len(sig_odor_exps) - 0.5],
+        zeroline=False,
+    )
 
-            # only adds mean line if there is more than one pt
-            if isinstance(exp_odor_df.loc[measure], pd.Series):
-                add_acute_mean_line(
-                    measure_fig,
-                    total_animals,
-                    total_cols,
-                    plot_groups,
-                    animal_ct,
-                    exp_ct,
-                    color_scale,
-                    measure,
-                    exp_odor_df,
-                )
+    if summary:
+        traces = make_summary_traces(
+            dataset.get_odor_stats(odor, measure).loc[exp_names],
+            positions,
+            marker_colors,
+            line_colors,
+            legend_groups,
+            box_width,
+        )
+
+        return make_fig(traces, layout)
+
+    exp_values = dataset.get_odor_values(odor, measure)
+    exp_means = dataset.get_odor_means(odor, measure)
+
+    # only adds mean line if there is more than one pt
+    has_mean = [len(exp_values[x]) > 1 for x in exp_names]
+
+    traces = make_point_traces(
+        exp_names,
+        exp_values,
+        positions,
+        marker_colors,
+        line_colors,
+        legend_groups,
+        box_width,
+    )
+    traces.extend(
+        make_mean_line_traces(
+            list(compress(positions, has_mean)),
+            [exp_means[x] for x in compress(exp_names, has_mean)],
+            list(compress(line_colors, has_mean)),
+            list(compress(legend_groups, has_mean)),
+            MEAN_LINE_WIDTH * box_width,
+        )
+    )
 
-    return measure_fig
+    return make_fig(traces, layout)
 
 
 def plot_chronic_odor_measure_fig(
     sig_odor_exps: list,
-    data_dict: dict,
+    dataset: CompiledDataset,
     odor: str,
     measure: str,
     sorted_dates: list,
+    interval: str,
+    summary: bool = False,
 ) -> go.Figure:
     """Plots the values for specified odor and measurement, chronic experiment.
 
-    Wrapper function for add_measure_trace().
+    If summary is True, each timepoint is a box made from summary statistics
+    instead of every value, see make_summary_traces().
 
     Args:
         sig_odor_exps: List of significant odor experiments.
-        data_dict: All significant data for the dataset.
+        dataset: The CompiledDataset holding all data for the dataset.
         odor: The odor being plotted.
         measure: The measure being plotted.
         sorted_dates: A list of experiments, sorted by date.
+        interval: The timepoint type being plotted.
+        summary: Whether to plot summary boxes instead of every value.
 
     Returns:
         A plot for the measurement, containing data for timepoint and odor.
     """
-    measure_fig = go.Figure()
+
+    color_scale = set_color_scales("chronic")
 
     # generates list holding the mean values for plotting later
     # fills non-sig sessions with 0 or nan depending on measure
@@ -267,344 +691,369 @@ def plot_chronic_odor_measure_fig(
     elif measure == "Latency (s)" or measure == "Time to peak (s)":
         avgs = [nan] * len(sorted_dates)
 
-    for exp_ct, sig_experiment in enumerate(sig_odor_exps):
-        # gets the timepoint position of the experiment
-        interval_ct = sorted_dates.index(sig_experiment) + 1
-        exp_odor_df = data_dict[sig_experiment][odor]
-
-        add_measure_trace(
-            measure_fig,
-            exp_ct,
-            sig_experiment,
-            "chronic",
-            interval_ct,
-            exp_odor_df.loc[measure],
+    # gets the timepoint position of each experiment
+    positions = [dataset.timepoints[x] for x in sig_odor_exps]
+    marker_colors = get_chronic_marker_colors(color_scale, positions)
+    line_colors = [color_scale["lines"]] * len(sig_odor_exps)
+    legend_groups = list(range(len(sig_odor_exps)))
+
+    if summary:
+        stats = dataset.get_odor_stats(odor, measure).loc[sig_odor_exps]
+        exp_counts = stats["count"].to_dict()
+        exp_means = stats["mean"].to_dict()
+
+        traces = make_summary_traces(
+            stats,
+            positions,
+            marker_colors,
+            line_colors,
+            legend_groups,
+            CHRONIC_BOX_WIDTH,
+        )
+
+    else:
+        exp_values = dataset.get_odor_values(odor, measure)
+        exp_counts = {x: len(exp_values[x]) for x in sig_odor_exps}
+        exp_means = dataset.get_odor_means(odor, measure)
+
+        traces = make_point_traces(
+            sig_odor_exps,
+            exp_values,
+            positions,
+            marker_colors,
+            line_colors,
+            legend_groups,
+            CHRONIC_BOX_WIDTH,
         )
 
+    for sig_experiment, interval_ct in zip(sig_odor_exps, positions):
         # only adds mean value to list for plotting if
         # there is more than one pt per exp
-        if isinstance(exp_odor_df.loc[measure], pd.Series):
-            avgs[interval_ct - 1] = exp_odor_df.loc[measure].values.mean()
-
-    add_chronic_means(measure_fig, sorted_dates, measure, avgs)
-
-    return measure_fig
+        if exp_counts[sig_experiment] > 1:
+            avgs[interval_ct - 1] = exp_means[sig_experiment]
 
+    traces.extend(make_chronic_mean_traces(sorted_dates, measure, avgs))
 
-def add_acute_mean_line(
-    fig: go.Figure,
-    total_animals: int,
-    total_cols: int,
-    plot_groups: bool,
-    animal_ct: int,
-    exp_ct: int,
-    color_scale: dict,
-    measure: str,
-    exp_odor_df: pd.DataFrame,
-):
-    """Adds mean line to the points for each imaging session.
-
-    Args:
-        fig: Figure to which to add mean lines.
-        total_animals: Total number of animals being plotted, for positioning.
-        total_cols: Total number of columns, if multiple ROIs exist.
-        plot_groups: Whether plot has groups for multiple ROIs.
-        animal_ct: The animal to which to add mean lines.
-        exp_ct: The experiment number (for ordering) to which to add mean lines.
-        color_scale: Color values to assign to mean lines.
-        measure: The measure for which to add mean lines.
-        exp_odor_df: The data being plotted.
-
-    """
-    x0, x1 = position_acute_mean_line(
-        total_animals,
-        total_cols,
-        plot_groups,
-        animal_ct,
-        exp_ct,
+    layout = make_measure_layout(measure, interval)
+    layout["xaxis"].update(
+        tickvals=list(range(1, len(sorted_dates) + 1)),
+        range=[0.5, len(sorted_dates) + 1],
     )
 
-    fig.add_shape(
-        type="line",
-        line=dict(
-            color=color_scale["lines"][animal_ct + 1][exp_ct],
-            width=4,
-        ),
-        xref="x domain",
-        x0=x0,
-        x1=x1,
-        y0=exp_odor_df.loc[measure].values.mean(),
-        y1=exp_odor_df.loc[measure].values.mean(),
-    )
+    return make_fig(traces, layout)
 
 
-def add_chronic_means(
-    measure_fig: go.Figure, sorted_dates: list, measure: str, avgs: list
-):
-    """Adds mean point to the points for each imaging timepoint.
+def make_chronic_mean_traces(
+    sorted_dates: list, measure: str, avgs: list
+) -> list:
+    """Makes the traces of the mean value at each imaging timepoint.
 
     Args:
-        measure_fig: Figure to which to add mean points.
         sorted_dates: A list of experiments, sorted by date.
         measure: The measure for which to add mean lines.
         avgs: The average values being added.
 
+    Returns:
+        A list of trace dicts.
     """
 
     # makes x-axis values for mean trace
     x_vals = list(range(1, len(sorted_dates) + 1))
 
     # adds mean line
-    measure_fig.add_trace(
-        go.Scatter(
-            x=x_vals,
-            y=avgs,
-            mode="lines",
-            line=dict(color="orange", dash="dot"),
-            name="Mean",
-        )
-    )
+    traces = [
+        {
+            "type": "scatter",
+            "x": x_vals,
+            "y": avgs,
+            "mode": "lines",
+            "line": {"color": "orange", "dash": "dot"},
+            "name": "Mean",
+        }
+    ]
 
     # adds mean point dots for latency and time to peak
     if measure == "Latency (s)" or measure == "Time to peak (s)":
-        measure_fig.add_trace(
-            go.Scatter(
-                x=x_vals,
-                y=avgs,
-                mode="markers",
-                marker=dict(color="orange"),
-                name="Single Mean",
-            )
+        traces.append(
+            {
+                "type": "scatter",
+                "x": x_vals,
+                "y": avgs,
+                "mode": "markers",
+                "marker": {"color": "orange"},
+                "name": "Single Mean",
+            }
         )
 
+    return traces
+
 
-def add_measure_trace(
-    fig: go.Figure,
-    exp_ct: int,
-    sig_experiment: str,
-    dataset_type: str,
-    x_interval: str,
-    y_values: pd.Series | float,
-    animal_ct: int = None,
-):
-    """Plots the measurement values for each imaging session.
+def plot_drift_matrix(drift_df: pd.DataFrame) -> go.Figure:
+    """Plots the session × session population vector correlations.
 
     Args:
-        fig: Figure to which to add measurement value points.
-        exp_ct: The experiment number (for ordering) to which to add mean lines.
-        sig_experiment: The name of the imaging session being plotted.
-        dataset_type: Chronic or acute dataset.
-        x_interval: The animal (acute) or timepoint (chronic) being plotted.
-        y_values: The measurement values to plot.
-        animal_ct: The animal (for ordering) to plot.
-    """
+        drift_df: Symmetric DataFrame of correlations with dates as rows and
+            columns.
 
-    # checks whether values need to be put in artificial list
-    if isinstance(y_values, pd.Series):
-        x = [x_interval] * len(y_values.values)
-        y = y_values.values.tolist()
-    else:
-        x = [x_interval]
-        y = [y_values]
+    Returns:
+        A heatmap of the population vector correlations.
+    """
 
-    color_scale = set_color_scales(dataset_type)
-    marker_color, line_color, legend_group = set_colors_legends(
-        dataset_type, color_scale, animal_ct, exp_ct, x_interval
+    fig = go.Figure(
+        go.Heatmap(
+            z=drift_df.values,
+            x=drift_df.columns.tolist(),
+            y=drift_df.index.tolist(),
+            zmin=-1,
+            zmax=1,
+            colorscale="RdBu_r",
+            colorbar=dict(title="r"),
+        )
     )
 
-    fig.add_trace(
-        go.Box(
-            x=x,
-            y=y,
-            line=dict(color="rgba(0,0,0,0)"),
-            fillcolor="rgba(0,0,0,0)",
-            boxpoints="all",
-            pointpos=0,
-            marker_color=marker_color,
-            marker=dict(
-                # opacity=0.5,
-                line=dict(
-                    color=line_color,
-                    width=2,
-                ),
-                size=12,
-            ),
-            name=sig_experiment,
-            legendgroup=legend_group,
-            offsetgroup=exp_ct if dataset_type == "acute" else None,
-        ),
+    fig.update_xaxes(title_text="Date", type="category")
+    fig.update_yaxes(title_text="Date", type="category", autorange="reversed")
+    fig.update_layout(
+        title={
+            "text": "Population vector correlation",
+            "x": 0.4,
+            "xanchor": "center",
+        },
     )
 
+    return fig
 
-def get_acute_plot_params(all_roi_counts: list) -> tuple[bool, int]:
-    """Counts the number of ROIs (columns) and animals plotted for each odor.
 
-    Determines whether the plot has groups for multiple ROIs, and also counts
-    total number of columns. If groups are present,animals with one ROI still
-    have two columns.
+def plot_response_turnover(turnover_df: pd.DataFrame) -> go.Figure:
+    """Plots the fraction of responses gained, lost, or kept over sessions.
 
     Args:
-        all_roi_counts: A list of the number of ROIs imaged.
+        turnover_df: DataFrame with dates as rows and Gained, Lost and Stable
+            fractions as columns.
 
     Returns:
-        plot_groups: Whether the plotted values need to be separated by groups
-            for multiple ROIs.
-        total_cols: Total number of columns of plotted points.
+        A plot containing one line per turnover type.
     """
 
-    if 2 in all_roi_counts:
-        plot_groups = True
-        zeroes = all_roi_counts.count(0)
-        total_cols = (len(all_roi_counts) - zeroes) * 2
+    turnover_colors = {
+        "Gained": "#29E990",
+        "Lost": "#E41E4F",
+        "Stable": "#1A6FF2",
+    }
+    fig = go.Figure()
 
-    else:
-        plot_groups = False
-        total_cols = sum(all_roi_counts)
+    for turnover_type in turnover_df.columns:
+        fig.add_trace(
+            go.Scatter(
+                x=turnover_df.index.tolist(),
+                y=turnover_df[turnover_type],
+                mode="lines+markers",
+                line=dict(color=turnover_colors[turnover_type]),
+                name=turnover_type,
+            )
+        )
 
-    return plot_groups, total_cols
+    fig.update_xaxes(title_text="Date", type="category")
+    fig.update_yaxes(title_text="Fraction of sample × odor pairs")
+    fig.update_layout(
+        title={
+            "text": "Response turnover from previous session",
+            "x": 0.4,
+            "xanchor": "center",
+        },
+    )
 
+    return fig
 
-def position_acute_mean_line(
-    total_animals: int,
-    total_cols: int,
-    plot_groups: bool,
-    animal_ct: int,
-    exp_ct: int,
-) -> tuple[float, float]:
-    """Calculates the positioning values for mean lines depending on whether
-        each animal has multiple ROIs.
 
-    The values here are hard-coded and super finicky and will likely need to
-    be adjusted if anything drastically changes with the plots.
+def plot_pc_trajectories(
+    scores: np.ndarray,
+    odors: list,
+    n_frames: int,
+    pcs: tuple = (0, 1),
+) -> go.Figure:
+    """Plots the trajectory of each odor's population response in PC space.
 
     Args:
-        total_animals: Total number of animals being plotted, for positioning.
-        total_cols: Total number of columns, if multiple ROIs exist.
-        plot_groups: Whether plot has groups for multiple ROIs.
-        animal_ct: The animal to which to add mean lines.
-        exp_ct: The experiment number (for ordering) to which to add mean lines.
+        scores: The PC scores of every (odor, frame) row, ordered by odor then
+            frame.
+        odors: The odors, in the same order as the rows of scores.
+        n_frames: The number of frames per odor.
+        pcs: The indices of the two (or three) PCs to plot.
 
     Returns:
-        x0: The starting x position for the mean line.
-        x1: The ending x position for the mean line.
+        A 2D or 3D plot containing one trajectory per odor.
     """
 
-    if plot_groups:
-        start = (1 / total_cols) / 1.6
-        line_width = (1 / total_animals) / 6
-        within_group_interval = (1 / total_animals) / 8
-        between_group_interval = (1 / total_animals) / 1.95
+    odor_colors = get_odor_colors()
+    odor_scores = scores.reshape(len(odors), n_frames, -1)
+    fig = go.Figure()
 
+    for odor_ct, odor in enumerate(odors):
+        trajectory = odor_scores[odor_ct]
+        if len(pcs) == 3:
+            trace = go.Scatter3d(
+                x=trajectory[:, pcs[0]],
+                y=trajectory[:, pcs[1]],
+                z=trajectory[:, pcs[2]],
+                mode="lines",
+                line=dict(color=odor_colors[f"Odor {odor}"], width=4),
+                name=odor,
+            )
+        else:
+            trace = go.Scatter(
+                x=trajectory[:, pcs[0]],
+                y=trajectory[:, pcs[1]],
+                mode="lines",
+                line=dict(color=odor_colors[f"Odor {odor}"]),
+                name=odor,
+            )
+        fig.add_trace(trace)
+
+    if len(pcs) == 3:
+        fig.update_layout(
+            scene=dict(
+                xaxis_title=f"PC{pcs[0] + 1}",
+                yaxis_title=f"PC{pcs[1] + 1}",
+                zaxis_title=f"PC{pcs[2] + 1}",
+            )
+        )
     else:
-        start = (1 / total_animals) / 3.5
-        line_width = (1 / total_animals) / 3
-        between_group_interval = (1 / total_animals) / 1.4
+        fig.update_xaxes(title_text=f"PC{pcs[0] + 1}")
+        fig.update_yaxes(title_text=f"PC{pcs[1] + 1}")
+    fig.update_layout(legend_title_text="Odor Number<br />")
 
-    animal1_roi1_x0 = start
-    animal1_roi1_x1 = start + line_width
+    return fig
 
-    if plot_groups:
-        animal1_roi2_x0 = animal1_roi1_x1 + within_group_interval
-        animal1_roi2_x1 = animal1_roi2_x0 + line_width
 
-    # sets positioning variable depending on animal and exp count
+def plot_explained_variance(explained_ratio: np.ndarray) -> go.Figure:
+    """Plots the fraction of variance explained by each PC.
 
-    # # this is for the very first data point
-    if animal_ct == 0:
-        if exp_ct == 0:
-            x0 = animal1_roi1_x0
-            x1 = animal1_roi1_x1
-        else:
-            x0 = animal1_roi2_x0
-            x1 = animal1_roi2_x1
+    Args:
+        explained_ratio: The fraction of total variance explained by each PC.
 
-    # for the first data point in subsequent animals
-    else:
-        if exp_ct == 0:
-            if plot_groups:
-                x0 = (
-                    animal1_roi2_x1
-                    + (animal_ct * (between_group_interval))
-                    + (animal_ct - 1)
-                    * ((line_width * 2) + within_group_interval)
-                )
-            else:
-                x0 = (
-                    animal1_roi1_x1
-                    + (animal_ct * (between_group_interval))
-                    + (animal_ct - 1) * line_width
-                )
+    Returns:
+        A bar plot of explained variance with the cumulative sum as a line.
+    """
 
-        # if this is not exp_ct=0, then obviously plot_groups == True
-        else:
-            x0 = (
-                animal1_roi2_x1
-                + (animal_ct * (between_group_interval))
-                + (animal_ct - 1) * ((line_width * 2) + within_group_interval)
-                + line_width
-                + within_group_interval
-            )
+    pc_labels = [f"PC{x}" for x in range(1, len(explained_ratio) + 1)]
+    fig = go.Figure()
 
-        x1 = x0 + line_width
+    fig.add_trace(
+        go.Bar(
+            x=pc_labels,
+            y=explained_ratio,
+            marker_color="#1A6FF2",
+            name="Explained",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=pc_labels,
+            y=np.cumsum(explained_ratio),
+            mode="lines+markers",
+            line=dict(color="orange"),
+            name="Cumulative",
+        )
+    )
 
-    return x0, x1
+    fig.update_yaxes(title_text="Fraction of variance explained", range=[0, 1])
 
+    return fig
 
-def format_fig(
-    fig: go.Figure,
-    measure: str,
-    dataset_type: str,
-    interval: str = None,
-    sorted_dates: list = None,
-):
-    """Formats the legend, axes, and titles of the figure.
+
+def plot_correlation_matrix(
+    corr_matrix: np.ndarray, title: str, bin_size: int = 1
+) -> go.Figure:
+    """Plots a sample × sample correlation matrix as a heatmap.
 
     Args:
-        fig: Figure being formatted.
-        measure: The measure being plotted.
-        dataset_type: Chronic or acute dataset.
-        interval: The timepoint type being plotted, chronic only.
-        sorted_dates: The experiment names, sorted by date, chronic only.
+        corr_matrix: The (possibly downsampled) correlation matrix.
+        title: The title of the plot.
+        bin_size: The number of samples averaged into each displayed pixel.
 
+    Returns:
+        A heatmap of the correlations.
     """
-    #  below is code from stack overflow to hide duplicate legends
-    names = set()
-    fig.for_each_trace(
-        lambda trace: trace.update(showlegend=False)
-        if (trace.name in names)
-        else names.add(trace.name)
+
+    # labels pixels with the first sample number of each bin
+    sample_labels = list(range(1, corr_matrix.shape[0] * bin_size + 1, bin_size))
+
+    fig = go.Figure(
+        go.Heatmap(
+            z=corr_matrix,
+            x=sample_labels,
+            y=sample_labels,
+            zmin=-1,
+            zmax=1,
+            colorscale="RdBu_r",
+            colorbar=dict(title="r"),
+        )
     )
 
-    fig.update_xaxes(
-        showticklabels=True,
-        title_text="<br />Animal ID"
-        if dataset_type == "acute"
-        else f"<br />{interval}",
+    fig.update_xaxes(title_text="Sample")
+    fig.update_yaxes(title_text="Sample", autorange="reversed")
+    fig.update_layout(
+        title={"text": title, "x": 0.4, "xanchor": "center"},
+        width=700,
+        height=650,
     )
-    if dataset_type == "chronic":
-        fig.update_xaxes(
-            tickvals=list(range(1, len(sorted_dates) + 1)),
-            range=[0.5, len(sorted_dates) + 1],
-        )
 
-    fig.update_yaxes(
-        title_text=measure,
+    return fig
+
+
+def plot_grid_maps(
+    grid_maps: np.ndarray, odors: list, measure: str
+) -> go.Figure:
+    """Plots one spatial response map per odor for a Grid session.
+
+    Args:
+        grid_maps: Array with shape (n_odors, n_rows, n_cols) from
+            make_grid_maps().
+        odors: The odor names, in the same order as grid_maps.
+        measure: The measure being plotted.
+
+    Returns:
+        A figure with one heatmap per odor sharing one color scale.
+    """
+
+    n_plot_cols = min(4, len(odors))
+    n_plot_rows = int(np.ceil(len(odors) / n_plot_cols))
+    fig = make_subplots(
+        rows=n_plot_rows,
+        cols=n_plot_cols,
+        subplot_titles=odors,
+        horizontal_spacing=0.03,
+        vertical_spacing=0.08,
     )
 
-    if measure == "Time to peak (s)":
+    for odor_ct, grid_map in enumerate(grid_maps):
+        fig.add_trace(
+            go.Heatmap(
+                z=grid_map,
+                coloraxis="coloraxis",
+                hovertemplate="Row %{y}, Column %{x}: %{z}<extra></extra>",
+            ),
+            row=odor_ct // n_plot_cols + 1,
+            col=odor_ct % n_plot_cols + 1,
+        )
+
+    fig.update_xaxes(showticklabels=False, constrain="domain")
+    fig.update_yaxes(showticklabels=False, autorange="reversed")
+
+    # keeps every heatmap's tiles square
+    for odor_ct in range(len(odors)):
+        axis_suffix = "" if odor_ct == 0 else odor_ct + 1
         fig.update_yaxes(
-            rangemode="tozero",
+            scaleanchor=f"x{axis_suffix}",
+            row=odor_ct // n_plot_cols + 1,
+            col=odor_ct % n_plot_cols + 1,
         )
 
     fig.update_layout(
-        title={
-            "text": measure,
-            "x": 0.4,
-            "xanchor": "center",
-        },
-        legend_title_text="Experiment ID<br />",
-        showlegend=True,
+        title={"text": measure, "x": 0.4, "xanchor": "center"},
+        coloraxis=dict(colorscale="Viridis", colorbar=dict(title="")),
+        height=250 * n_plot_rows + 100,
     )
 
-    if dataset_type == "acute":
-        fig.update_layout(boxmode="group", boxgap=0.4)
+    return fig
@@ -2,31 +2,82 @@
 
 import numpy as np
 import pandas as pd
+import plotly.graph_objects as go
 from collections import defaultdict
 from stqdm import stqdm
 import streamlit as st
 from datetime import datetime
+from pathlib import Path
 
-from src.utils import save_to_excel
-
-from src.plotting import (
-    get_acute_plot_params,
-    plot_acute_odor_measure_fig,
-    plot_chronic_odor_measure_fig,
-    format_fig,
-)
+from src.utils import save_sheets_to_excel
 
 from src.experiment import ExperimentFile
+from src.excel_import import (
+    read_all_analysis_excel,
+    read_avg_means_excel,
+    encode_analysis_dict,
+    decode_analysis_payload,
+)
+from src.parse_cache import ParseCache
+from src.compiled_store import CompiledStore
+from src.dataset import CompiledDataset, make_dataset, make_fingerprint
+from src.shared_cache import get_shared_cache
+from src.report import (
+    IMAGE_FORMATS,
+    can_export_images,
+    export_dataset_report,
+)
+from src.sidecar import (
+    calc_checksum,
+    match_sidecars,
+    read_analysis_sidecar,
+    read_avg_means_sidecar,
+)
 
 import pdb
 
+# above this many samples for an odor, the Auto plot style plots summary
+# boxes instead of every sample
+SUMMARY_PLOT_THRESHOLD = 5000
+PLOT_STYLES = ["Auto", "All samples", "Summary"]
+
 
-def load_avg_means(file: str) -> tuple[dict, list]:
+def read_avg_means(file: str, file_hash: str, sidecar=None) -> dict:
+    """Reads the average means from the parse cache, the sidecar file or the
+    .xlsx file, in that order.
+
+    Args:
+        file: The path to the .xlsx file containing the average means.
+        file_hash: The checksum of the .xlsx file.
+        sidecar: The matching _avg_means.arrow file, if any.
+
+    Returns:
+        Dict containing the average means from avg_means.xlsx file.
+    """
+
+    cache = ParseCache()
+    cache_key = cache.make_key(file_hash, "avg_means")
+    avg_means_dict = cache.get(cache_key)
+
+    if avg_means_dict is None:
+        if sidecar is not None:
+            avg_means_dict = read_avg_means_sidecar(sidecar, file)
+        if avg_means_dict is None:
+            avg_means_dict = read_avg_means_excel(file)
+        cache.put(cache_key, avg_means_dict)
+
+    return avg_means_dict
+
+
+def load_avg_means(file: str, sidecar=None) -> tuple[dict, list]:
     """Loads the average means from an experiment into a dictionary, with sheet
-    names/sample # as keys, DataFrame as values.
+    names/sample # as keys, DataFrame as values. Files already loaded by any
+    user are taken from the shared cache.
 
     Args:
         file: The path to the .xlsx file containing the average means.
+        sidecar: The matching _avg_means.arrow file, if any. It's read instead
+            of the .xlsx file if it matches.
 
     Returns:
         avg_means_dict: Dict containing the average means from avg_means.xlsx
@@ -34,7 +85,10 @@ def load_avg_means(file: str) -> tuple[dict, list]:
         odor_list: The list of odors found in the .xlsx file.
     """
 
-    avg_means_dict = pd.read_excel(file, sheet_name=None)
+    file_hash = calc_checksum(file)
+    avg_means_dict = get_shared_cache().get_or_make(
+        ("avg_means", file_hash), read_avg_means, file, file_hash, sidecar
+    )
     st.info(
         f"Avg means loaded successfully for {len(avg_means_dict)} " "samples."
     )
@@ -68,125 +122,324 @@ def make_empty_containers(dataset_type: str) -> list:
     # makes list to hold all significant odors
     all_sig_odors = []
 
+    # holds the CompiledDataset once all sessions have been added
+    dataset = None
+
     if dataset_type == "chronic":
-        data_dict = {}
-        dict_list = [nosig_exps, all_sig_odors, data_dict, all_exps]
+        dict_list = [nosig_exps, all_sig_odors, dataset, all_exps]
     elif dataset_type == "acute":
-        data_dict = defaultdict(dict)
         dict_list = [
             nosig_exps,
             all_sig_odors,
-            data_dict,
+            dataset,
         ]
 
     return dict_list
 
 
-def load_file(
-    file: str,
-    df_list: list,
-    dict_list: list,
-    dataset_type: str,
-) -> tuple[list, list, str]:
-    """Creates an ExperimentFile object for each imported file, then processes
+def get_compiled_rows(measures: list = None) -> list:
+    """Gets the analysis.xlsx rows needed to compile a dataset.
+
+    Args:
+        measures: The measurements to compile. Defaults to
+            st.session_state.measures.
+
+    Returns:
+        The "Significant response?" row and the measurement rows.
+    """
+
+    if measures is None:
+        measures = st.session_state.measures
+
+    return ["Significant response?"] + measures
+
+
+def compile_file(
+    file: str, dataset_type: str, excel_dict: dict = None, measures=None
+) -> dict:
+    """Creates an ExperimentFile object for an imported file, then processes
     the file for Excel saving and plotting.
 
     Args:
         file: streamlit.runtime.uploaded_file_manager.UploadedFile, csv file
-        df_list: A list of DataFrames to hold the DataFrames for each
-            analysis measurement.
+        dataset_type: Chronic or acute experiment type.
+        excel_dict: The measurement values already read from the file, if
+            any. Otherwise the file is read here.
+        measures: The measurements to compile. Defaults to
+            st.session_state.measures.
+
+    Returns:
+        A dict holding the compiled session: its exp_name, animal_id,
+            sample_type and checksum, the long-format DataFrame made by
+            ExperimentFile.sort_data() as long_df, and the sig_odors and
+            sig_data_df made by ExperimentFile.make_plotting_dfs().
+    """
+
+    loaded_file = ExperimentFile(file, dataset_type)
+
+    if excel_dict is None:
+        excel_dict = loaded_file.import_excel(get_compiled_rows(measures))
+    long_df = loaded_file.sort_data(excel_dict, measures)
+    sig_odors, sig_data_df = loaded_file.make_plotting_dfs(excel_dict)
+
+    session = {
+        "exp_name": loaded_file.exp_name,
+        "animal_id": loaded_file.animal_id,
+        "sample_type": loaded_file.sample_type,
+        "checksum": loaded_file.file_hash,
+        "long_df": long_df,
+        "sig_odors": sig_odors,
+        "sig_data_df": sig_data_df,
+    }
+
+    return session
+
+
+def add_session(session: dict, dict_list: list, dataset_type: str) -> list:
+    """Adds a compiled session to the containers of significant experiment
+    and odor ids. The session's data is added to the CompiledDataset made
+    once all sessions have been added.
+
+    Args:
+        session: The compiled session, made by compile_file().
         dict_list: A list of lists and dictionary that contains experimental
         data and the ids of significant experiments and odors.
         dataset_type: Chronic or acute experiment type.
 
     Returns:
-        appended_df_list: A list of a list of DataFrames, one list for each
-            measurement contained in analysis.xlsx. Values from each file are
-            appended as new rows in the DataFrames via ExperimentFile.sort_data().
-        appended_dict_list: A list of lists and dictionary containing experimental
-            data and the ids of significant experiments and odors. Experiment
-            and odor ids from each file are appended as new items in the list,
-            and significant data are appended with the experiment name as keys
-            in the dictionary, all done via ExperimentFile.sort_data().
-        bar_text: The text to display on the progress bar.
+        A list of lists containing experimental data and the ids of
+            significant experiments and odors. Experiment and odor ids from
+            the session are appended as new items in the list.
     """
 
     if dataset_type == "acute":
-        nosig_exps, all_sig_odors, data_dict = dict_list
+        nosig_exps, all_sig_odors, dataset = dict_list
     elif dataset_type == "chronic":
-        nosig_exps, all_sig_odors, data_dict, all_exps = dict_list
+        nosig_exps, all_sig_odors, dataset, all_exps = dict_list
 
-    loaded_file = ExperimentFile(file, dataset_type)
-    bar_text = f"Loading data from {loaded_file.exp_name}"
-
-    excel_dict = loaded_file.import_excel()
-    appended_df_list = loaded_file.sort_data(excel_dict, df_list)
-    sig_odors, sig_data_df = loaded_file.make_plotting_dfs(excel_dict)
-
-    all_sig_odors.append(sig_odors)
+    all_sig_odors.append(session["sig_odors"])
 
     if dataset_type == "chronic":
-        all_exps.append(loaded_file.exp_name)
-
-    if not sig_data_df.empty:
-        if dataset_type == "acute":
-            data_dict[loaded_file.animal_id][
-                loaded_file.exp_name
-            ] = sig_data_df
-        elif dataset_type == "chronic":
-            data_dict[loaded_file.exp_name] = sig_data_df
-    if sig_data_df.empty:
-        nosig_exps.append(loaded_file.exp_name)
+        all_exps.append(session["exp_name"])
+
+    if session["sig_data_df"].empty:
+        nosig_exps.append(session["exp_name"])
 
     if dataset_type == "acute":
-        appended_dict_list = nosig_exps, all_sig_odors, data_dict
+        appended_dict_list = [nosig_exps, all_sig_odors, dataset]
     elif dataset_type == "chronic":
-        appended_dict_list = nosig_exps, all_sig_odors, data_dict, all_exps
+        appended_dict_list = [nosig_exps, all_sig_odors, dataset, all_exps]
+
+    return appended_dict_list
+
+
+def read_all_analysis_data(
+    files: list, sidecars: list, rows: list, progress_bar
+) -> list:
+    """Reads the analysis values of all files. Files imported before are
+    taken from the parse cache, then matching sidecar files are used where
+    possible, and the remaining .xlsx files are read concurrently and added
+    to the cache.
+
+    Args:
+        files: A list of .xlsx files uploaded to Streamlit.
+        sidecars: A list of _analysis.arrow files uploaded to Streamlit.
+        rows: The measurements (rows) to read.
+        progress_bar: stqdm progress bar with total equal to the number of
+            files.
+
+    Returns:
+        A list with the dictionary of DataFrames from each file, in file order.
+    """
+
+    cache = ParseCache()
+    cache_keys = [
+        cache.make_key(calc_checksum(file), "analysis", rows) for file in files
+    ]
 
-    return appended_df_list, appended_dict_list, bar_text
+    excel_dicts = []
+    for file, sidecar, cache_key in zip(
+        files, match_sidecars(files, sidecars), cache_keys
+    ):
+        excel_dict = None
+        payload = cache.get(cache_key)
+        if payload is not None:
+            excel_dict = decode_analysis_payload(payload)
+        elif sidecar is not None:
+            excel_dict = read_analysis_sidecar(sidecar, file, rows)
+            if excel_dict is not None:
+                cache.put(cache_key, encode_analysis_dict(excel_dict))
+        if excel_dict is not None:
+            progress_bar.update(1)
+        excel_dicts.append(excel_dict)
+
+    excel_files = [
+        file
+        for file, excel_dict in zip(files, excel_dicts)
+        if excel_dict is None
+    ]
+    read_dicts = iter(
+        read_all_analysis_excel(excel_files, rows, progress_bar)
+    )
 
+    for i, excel_dict in enumerate(excel_dicts):
+        if excel_dict is None:
+            excel_dicts[i] = next(read_dicts)
+            cache.put(cache_keys[i], encode_analysis_dict(excel_dicts[i]))
 
-def import_all_excel_data(dataset_type: str, files: list) -> tuple[list, list]:
+    return excel_dicts
+
+
+def import_all_excel_data(
+    dataset_type: str,
+    files: list,
+    sidecars: list = None,
+    store: CompiledStore = None,
+    measures: list = None,
+    job=None,
+) -> tuple[list, list, pd.DataFrame]:
     """A wrapper for looping through all selected .xlsx files for importing
-    and processing via load_file.
+    and processing via compile_file.
+
+    The values from each .xlsx file are collected as long-format pieces and
+    combined once after all files are loaded, so compiling N files doesn't
+    copy the growing dataset N times. Files with a matching sidecar are
+    read from it, and the rest are read concurrently in worker processes.
+
+    If a compiled store is given, only files that are new to the store or
+    changed since they were stored are compiled, and the returned dataset
+    holds every session in the store.
 
-    New data for each .xlsx file are appended onto existing DataFrames and
-    dictionary via ExperimentFile.sort_data(), called by load_file.
+    Compiled sessions and datasets are kept in the shared cache, so files
+    and datasets already compiled by any user aren't compiled again.
 
     Args:
         dataset_type: Chronic or acute experiment type.
         files: A list of .xlsx files uploaded to Streamlit.
+        sidecars: An optional list of _analysis.arrow files uploaded to
+            Streamlit.
+        store: An optional CompiledStore to add the files to.
+        measures: The measurements to compile. Defaults to
+            st.session_state.measures.
+        job: An optional background Job to report reading progress to,
+            instead of showing a stqdm progress bar.
 
     Returns:
-        appended_df_list: A list of a list of DataFrames, one list for each
-            measurement contained in analysis.xlsx
-        appended_dict_list: A list of dictionaries containing experimental
-            data and the ids of significant experiments and odors.
-        bar_text: The text to display on the progress bar.
+        dict_list: A list containing the ids of significant experiments and
+            odors, and the CompiledDataset holding the experimental data.
+        df_list: A list of DataFrames, one for each measurement contained in
+            analysis.xlsx, with samples as rows and odors as columns.
+        long_df: A long-format DataFrame with one row per experiment, sample,
+            odor and measurement.
     """
 
     dict_list = make_empty_containers(dataset_type)
-
-    # makes df for each measurement, for summary csv
-    df_list = [pd.DataFrame() for x in range(5)]
+    if measures is None:
+        measures = st.session_state.measures
 
     if dataset_type == "chronic":
         files = sort_files_by_date(files)
 
+    if store is not None:
+        files = store.get_changed_files(
+            files, [calc_checksum(file) for file in files]
+        )
+
+    shared_cache = get_shared_cache()
+    session_keys = [
+        (
+            "session",
+            dataset_type,
+            file.name,
+            calc_checksum(file),
+            tuple(measures),
+        )
+        for file in files
+    ]
+    sessions = [shared_cache.get(key) for key in session_keys]
+    read_files = [
+        file for file, session in zip(files, sessions) if session is None
+    ]
+
     # adds progress bar
-    load_bar = stqdm(files, desc="Loading ")
-    for file in load_bar:
-        # Get and append new values for each .xlsx file
-        appended_df_list, appended_dict_list, bar_text = load_file(
-            file, df_list, dict_list, dataset_type
+    if job is None:
+        read_bar = stqdm(total=len(read_files), desc="Reading ")
+    else:
+        read_bar = job
+        read_bar.set_stage("Reading files", len(read_files))
+    excel_dicts = iter(
+        read_all_analysis_data(
+            read_files, sidecars, get_compiled_rows(measures), read_bar
         )
-        load_bar.set_description(bar_text, refresh=True)
+    )
+    read_bar.close()
+
+    # compiles files in their sorted order, whichever finished reading first
+    for file_ct, file in enumerate(files):
+        if sessions[file_ct] is None:
+            sessions[file_ct] = compile_file(
+                file, dataset_type, next(excel_dicts), measures
+            )
+            shared_cache.put(session_keys[file_ct], sessions[file_ct])
 
-        # Save new data to be passed in again via the next loop
-        df_list = appended_df_list
-        dict_list = appended_dict_list
+    if store is not None:
+        store.put_sessions(sessions)
+        sessions = store.get_sessions()
 
-    return dict_list, df_list
+    for session in sessions:
+        dict_list = add_session(session, dict_list, dataset_type)
+
+    dataset = shared_cache.get_or_make(
+        ("dataset", make_fingerprint(sessions, dataset_type), tuple(measures)),
+        make_dataset,
+        sessions,
+        dataset_type,
+        measures,
+    )
+    dict_list[2] = dataset
+
+    # makes df for each measurement, for summary csv
+    df_list = dataset.get_measurement_dfs()
+
+    return dict_list, df_list, dataset.long_df
+
+
+def make_compile_job_key(
+    dataset_type: str,
+    dir_path: str,
+    files: list,
+    sidecars: list,
+    append: bool,
+    remove: list,
+) -> tuple:
+    """Makes the key identifying a dataset compilation job, so that a job is
+    only reattached to when its folder, files and options are the same.
+
+    Args:
+        dataset_type: Chronic or acute experiment type.
+        dir_path: The folder the compiled dataset is saved in.
+        files: The .xlsx files uploaded to Streamlit.
+        sidecars: The _analysis.arrow files uploaded to Streamlit.
+        append: Whether the files are added to the compiled store.
+        remove: The experiments removed from the compiled store.
+
+    Returns:
+        The key, starting with (dataset_type, dir_path).
+    """
+
+    return (
+        dataset_type,
+        dir_path,
+        tuple(sorted((file.name, calc_checksum(file)) for file in files)),
+        tuple(
+            sorted(
+                (sidecar.name, calc_checksum(sidecar))
+                for sidecar in sidecars or []
+            )
+        ),
+        bool(append),
+        tuple(sorted(remove)),
+    )
 
 
 def sort_files_by_date(files: list) -> list:
@@ -207,55 +460,35 @@ def sort_files_by_date(files: list) -> list:
     return sorted_files
 
 
-def get_odor_data(odor: str, dataset_type: str, data_dict: str):
+def get_odor_data(odor: str, dataset_type: str, dataset: CompiledDataset):
     """Collects the data for odors with significant responses.
 
     Args:
         odor: The odor for which to collect data.
         dataset_type: Chronic or acute experiment type.
-        data_dict: The dictionary containing all significant data for the
-            dataset.
+        dataset: The CompiledDataset holding all data for the dataset.
 
     Returns:
-        If acute dataset, a list containing: a list of significant odor
-            experiments, a list of the number of ROIs imaged, and the number
-            of total animals imaged.
+        If acute dataset, a dict of animal IDs with lists of significant
+            odor experiments.
         If chronic dataset, returns a list of experiments with significant
             responses for the odor.
     """
 
+    odor_groups = dataset.get_odor_groups(odor)
+
     if dataset_type == "acute":
         # makes list of experiments that have sig responses for
         # the odor
-        sig_odor_exps = {}
-
-        # makes list of number of ROIs per animal
-        all_roi_counts = []
-
-        for animal_id in data_dict:
-            animal_exp_list = []
-
-            for experiment in data_dict[animal_id].keys():
-                if odor in data_dict[animal_id][experiment]:
-                    animal_exp_list.append(experiment)
-                    sig_odor_exps[animal_id] = animal_exp_list
+        sig_odor_exps = defaultdict(list)
+        for animal_id, experiment in odor_groups:
+            sig_odor_exps[animal_id].append(experiment)
 
-            roi_count = len(animal_exp_list)
-            all_roi_counts.append(roi_count)
-
-        total_animals = len(sig_odor_exps)
-
-        data = [sig_odor_exps, all_roi_counts, total_animals]
+        data = dict(sig_odor_exps)
 
     elif dataset_type == "chronic":
         # makes list of experiments that have sig responses for the odor
-        sig_odor_exps = []
-
-        for experiment in data_dict.keys():
-            if odor in data_dict[experiment]:
-                sig_odor_exps.append(experiment)
-
-        data = sig_odor_exps
+        data = [experiment for _, experiment in odor_groups]
 
     return data
 
@@ -263,10 +496,8 @@ def get_odor_data(odor: str, dataset_type: str, data_dict: str):
 def sort_measurements_df(
     dir_path: str,
     xlsx_fname: str,
-    df_list: list,
-    sample_type: str,
+    dataset: CompiledDataset,
     measures: list,
-    dataset_type: str,
     animal_id: str = None,
 ):
     """Saves the DataFrames for each measurement as a sheet in a summary
@@ -275,13 +506,15 @@ def sort_measurements_df(
     Args:
         dir_path: Path to the directory for saving the .xlsx file.
         xlsx_fname: Name of the .xlsx file to save.
-        df_list: List containing DataFrames for each measurement.
-        sample_type: The sample type, e.g. "Cell", "Glomerulus", or "Grid".
+        dataset: The CompiledDataset holding all data for the dataset.
         measures: A list of the measurement names.
-        dataset_type: Chronic or acute dataset.
         animal_id: The animal ID, if it's a chronic dataset.
     """
 
+    df_list = dataset.get_measurement_dfs()
+    sample_type = dataset.sample_type
+    dataset_type = dataset.dataset_type
+
     sheetname_list = [
         "Baseline",
         "Blank-subtracted DeltaFF(%)",
@@ -290,7 +523,7 @@ def sort_measurements_df(
         "Time to peak (s)",
     ]
 
-    odors_list = [f"Odor {x}" for x in range(1, 8)]
+    sheet_dfs = {}
 
     for df_ct, df in enumerate(df_list):
         measure = measures[df_ct]
@@ -299,107 +532,100 @@ def sort_measurements_df(
         else:
             df = df.reset_index().set_index(["Animal ID", "ROI", sample_type])
         df.sort_index(inplace=True)
-        df = df.reindex(sorted(df.columns), axis=1)
-
-        # Manually add back empty/non-sig odor columns to reduce confusion
-        for odor in odors_list:
-            if (measure, odor) not in df.columns:
-                df[(measure, odor)] = np.nan
 
-        # Drop odor 8/blank from df
-        if (measure, "Odor 8") in df.columns:
-            df.drop(columns=[(measure, "Odor 8")], inplace=True)
+        # Adds back empty/non-sig odor columns to reduce confusion, drops
+        # odor 8/blank and reorders the odor columns in one step
         columns_list = [(f"{measure}", f"Odor {x}") for x in range(1, 8)]
-
-        df = df[columns_list]  # Reorders Odor columns list
-        sheetname = sheetname_list[df_ct]
-        add_label = False
-
-        if dataset_type == "chronic":
-            add_label = True
-
-        save_to_excel(
-            dir_path, sheetname, xlsx_fname, df, animal_id, add_label
-        )
+        sheet_dfs[sheetname_list[df_ct]] = df.reindex(columns=columns_list)
+
+    # writes and formats all sheets in one pass
+    save_sheets_to_excel(
+        dir_path,
+        xlsx_fname,
+        sheet_dfs,
+        animal_id,
+        add_label=dataset_type == "chronic",
+    )
 
 
-def generate_plots(
-    sig_odors: list,
-    nosig_exps: list,
+def make_odor_measure_fig(
+    odor: str,
+    measure: str,
     dataset_type: str,
-    data_dict: dict,
-    measures_list: list,
+    dataset: CompiledDataset,
     sorted_dates: list = None,
     interval: str = None,
-) -> dict:
-    """Creates plots for each odor.
+    summary: bool = False,
+) -> go.Figure:
+    """Creates the plot of one measurement for one odor.
 
     Args:
-        sig_odors: List of odors with significant responses.
-        nosig_exps: List of experiments with no significant responses.
+        odor: The odor to plot.
+        measure: The measurement to plot.
         dataset_type: Chronic or acute dataset.
-        data_dict: Data for all significant responses.
-        measures_list: A list of the measurement names.
+        dataset: The CompiledDataset holding all data for the dataset.
         sorted_dates: A list of experiments, sorted by date. For chronic only.
         interval: User-selected interval type, for chronic only.
+        summary: Whether to plot summary boxes instead of every value.
 
     Returns:
-        A dict of dicts, with odor then measurement as keys, and plots as items.
+        The formatted plot.
     """
 
-    plots_list = defaultdict(dict)
+    # imported when the first plot is made, as importing src.plotting loads
+    # the Plotly template
+    from src.plotting import (
+        plot_acute_odor_measure_fig,
+        plot_chronic_odor_measure_fig,
+    )
 
-    # adds progress bar
-    odor_bar = stqdm(sig_odors, desc="Plotting ")
+    odor_data = get_odor_data(odor, dataset_type, dataset)
 
-    for odor in odor_bar:
-        odor_data = get_odor_data(odor, dataset_type, data_dict)
+    if dataset_type == "chronic":
+        measure_fig = plot_chronic_odor_measure_fig(
+            odor_data,
+            dataset,
+            odor,
+            measure,
+            sorted_dates,
+            interval,
+            summary,
+        )
 
-        if dataset_type == "chronic":
-            sig_odor_exps = odor_data
-        else:
-            sig_odor_exps = odor_data[0]
-            all_roi_counts = odor_data[1]
-            total_animals = odor_data[2]
-            plot_groups, total_cols = get_acute_plot_params(all_roi_counts)
-
-        for measure in measures_list:
-            if measure != "Baseline":
-                if dataset_type == "chronic":
-                    measure_fig = plot_chronic_odor_measure_fig(
-                        sig_odor_exps,
-                        data_dict,
-                        odor,
-                        measure,
-                        sorted_dates,
-                    )
+    else:
+        measure_fig = plot_acute_odor_measure_fig(
+            odor_data,
+            dataset,
+            odor,
+            measure,
+            summary,
+        )
 
-                    format_fig(
-                        measure_fig,
-                        measure,
-                        "chronic",
-                        interval,
-                        sorted_dates,
-                    )
+    return measure_fig
 
-                else:
-                    measure_fig = plot_acute_odor_measure_fig(
-                        sig_odor_exps,
-                        data_dict,
-                        odor,
-                        measure,
-                        total_animals,
-                        plot_groups,
-                        total_cols,
-                    )
 
-                    format_fig(measure_fig, measure, "acute")
+def set_up_plots(
+    nosig_exps: list,
+    dataset_type: str,
+    dataset: CompiledDataset,
+    sorted_dates: list = None,
+    interval: str = None,
+) -> dict:
+    """Sets up the plots for each odor. The plots themselves are only made
+    when an odor is selected for display, by display_plots().
 
-                plots_list[odor][measure] = measure_fig
+    Args:
+        nosig_exps: List of experiments with no significant responses.
+        dataset_type: Chronic or acute dataset.
+        dataset: The CompiledDataset holding all data for the dataset.
+        sorted_dates: A list of experiments, sorted by date. For chronic only.
+        interval: User-selected interval type, for chronic only.
 
-        odor_bar.set_description(f"Plotting {odor}", refresh=True)
+    Returns:
+        A dict of the arguments passed to make_odor_measure_fig() for every
+            odor and measurement.
+    """
 
-    st.info("All plots generated.")
     if len(nosig_exps) != 0:
         st.warning(
             "No plots have been generated for the "
@@ -408,17 +634,22 @@ def generate_plots(
             f"{nosig_exps}"
         )
 
-    return plots_list
+    return {
+        "dataset_type": dataset_type,
+        "dataset": dataset,
+        "sorted_dates": sorted_dates,
+        "interval": interval,
+    }
 
 
 def show_plots_sliders(
     plots_list: dict, selected_odor: str, sig_odors: list, measures: list
 ):
-    """Shows the slider for selecting odor number for displaying plots.
+    """Shows the slider for selecting odor number for displaying plots, and
+    the choice of plot style.
 
     Args:
-        plots_list: A dict of dicts, with odor then measurement as keys,
-            and plots as items.
+        plots_list: The plot settings made by set_up_plots().
         selected_odor: The odor for which to display plots.
         sig_odors: Significant odors with available plots to display.
         measures: The names of measurements.
@@ -433,22 +664,133 @@ def show_plots_sliders(
         )
 
         if selected_odor:
+            plot_style = st.radio(
+                "Plot style:",
+                options=PLOT_STYLES,
+                horizontal=True,
+                help="Summary plots show one box per imaging session, with "
+                "the mean and SEM, instead of every sample. Auto uses "
+                f"summary plots above {SUMMARY_PLOT_THRESHOLD} samples.",
+            )
+
             display_plots(
                 plot_measures,
                 plots_list,
                 selected_odor,
+                use_summary_plot(
+                    plot_style, plots_list["dataset"], selected_odor
+                ),
+            )
+
+
+def use_summary_plot(
+    plot_style: str, dataset: CompiledDataset, odor: str
+) -> bool:
+    """Checks whether an odor is plotted as summary boxes.
+
+    Args:
+        plot_style: The selected plot style, one of PLOT_STYLES.
+        dataset: The CompiledDataset holding all data for the dataset.
+        odor: The odor being plotted.
+
+    Returns:
+        True for summary plots, False for plots of every sample.
+    """
+
+    if plot_style == "Auto":
+        return dataset.count_odor_responses(odor) > SUMMARY_PLOT_THRESHOLD
+
+    return plot_style == "Summary"
+
+
+def show_report_export(
+    plots_list: dict, sig_odors: list, measures: list, dir_path: str
+):
+    """Shows the options for exporting the plots of every odor to an HTML
+    report, saved to the selected directory as compiled_dataset_report.html.
+
+    Args:
+        plots_list: The plot settings made by set_up_plots().
+        sig_odors: Significant odors with available plots to display.
+        measures: The names of measurements.
+        dir_path: The directory to save the report in.
+    """
+
+    if not plots_list:
+        return
+
+    plot_measures = measures.copy()
+    plot_measures.remove("Baseline")
+
+    with st.expander("Export all plots"):
+        plot_style = st.radio(
+            "Plot style:",
+            options=PLOT_STYLES,
+            horizontal=True,
+            key="report_plot_style",
+        )
+        image_formats = st.multiselect(
+            "Also save each plot as:",
+            options=IMAGE_FORMATS,
+            disabled=not can_export_images(),
+            help="Saving PNG and SVG files needs the kaleido package.",
+        )
+
+        if st.button("Export report"):
+            bar = stqdm(
+                total=len(sig_odors) * len(plot_measures),
+                desc="Exporting plots ",
+            )
+            report_path = export_dataset_report(
+                Path(dir_path, "compiled_dataset_report.html"),
+                plots_list,
+                sig_odors,
+                plot_measures,
+                [
+                    odor
+                    for odor in sig_odors
+                    if use_summary_plot(
+                        plot_style, plots_list["dataset"], odor
+                    )
+                ],
+                image_formats,
+                bar,
             )
+            st.info(f"Report saved to {report_path}")
 
 
-def display_plots(measures_list: list, plots_list: dict, selected_odor: str):
-    """Displays the plots for the selected odor.
+def display_plots(
+    measures_list: list,
+    plots_list: dict,
+    selected_odor: str,
+    summary: bool = False,
+):
+    """Displays the plots for the selected odor, making any plots that
+    aren't in the shared cache yet.
 
     Args:
         measures_list: The names of measurements.
-        plots_list: A dict of dicts, with odor then measurement as keys,
-            and plots as items.
+        plots_list: The plot settings made by set_up_plots().
         selected_odor: The odor for which to display plots.
+        summary: Whether to plot summary boxes instead of every value.
     """
 
+    shared_cache = get_shared_cache()
+
     for measure in measures_list:
-        st.plotly_chart(plots_list[selected_odor][measure])
+        measure_fig = shared_cache.get_or_make(
+            (
+                "figure",
+                plots_list["dataset"].fingerprint,
+                selected_odor,
+                measure,
+                plots_list["interval"],
+                summary,
+            ),
+            make_odor_measure_fig,
+            selected_odor,
+            measure,
+            summary=summary,
+            **plots_list,
+        )
+        st.plotly_chart(measure_fig)
@@ -0,0 +1,296 @@
+"""Contains functions for exporting every plot of a dataset or imaging session
+to one self-contained HTML report, and optionally to PNG or SVG files.
+
+Figures are made in parallel worker processes, which each get the dataset
+once when they start. The report holds one copy of the Plotly JavaScript
+bundle and is written section by section as figures are made, in plotting
+order.
+"""
+
+import html
+import importlib.util
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import plotly.io as pio
+
+IMAGE_FORMATS = ["png", "svg"]
+
+# Smaller reports are made in the Streamlit process, as starting worker
+# processes takes longer than making the figures
+MIN_PARALLEL_FIGURES = 100
+
+# set in each worker process by init_worker()
+_worker_state = {}
+
+
+def can_export_images() -> bool:
+    """Checks whether the optional kaleido package, needed to save PNG and SVG
+    files, is installed.
+
+    Returns:
+        True if kaleido is installed.
+    """
+
+    return importlib.util.find_spec("kaleido") is not None
+
+
+def init_worker(
+    make_fig, fig_kwargs: dict, image_dir: str, image_formats: list
+):
+    """Stores the figure function and the arguments shared by every figure
+    in the worker process.
+
+    Args:
+        make_fig: The function that makes each figure.
+        fig_kwargs: Keyword arguments passed to make_fig for every figure,
+            e.g. the dataset.
+        image_dir: The folder to save image files in, if any.
+        image_formats: The image file formats to save, e.g. ["png"].
+    """
+
+    pio.templates.default = "plotly_white"
+    _worker_state.update(
+        make_fig=make_fig,
+        fig_kwargs=fig_kwargs,
+        image_dir=image_dir,
+        image_formats=image_formats,
+    )
+
+
+def render_figure(task: tuple) -> str:
+    """Makes one figure, saves its image files and converts it to HTML.
+
+    Args:
+        task: The figure's file name and the keyword arguments passed to the
+            figure function for this figure only.
+
+    Returns:
+        The HTML div of the figure, without the Plotly JavaScript bundle.
+    """
+
+    fig_name, fig_kwargs = task
+    fig = _worker_state["make_fig"](
+        **fig_kwargs, **_worker_state["fig_kwargs"]
+    )
+
+    for image_format in _worker_state["image_formats"]:
+        fig.write_image(
+            Path(_worker_state["image_dir"], f"{fig_name}.{image_format}")
+        )
+
+    return pio.to_html(fig, full_html=False, include_plotlyjs=False)
+
+
+def get_n_workers(n_figures: int, image_formats: list) -> int:
+    """Gets the number of worker processes to use for making figures.
+
+    Args:
+        n_figures: The number of figures to make.
+        image_formats: The image file formats to save. Saving images is
+            slow, so any number of figures is made in parallel.
+
+    Returns:
+        The number of workers, at most one per figure and one per CPU.
+    """
+
+    if n_figures < MIN_PARALLEL_FIGURES and not image_formats:
+        return 1
+
+    return max(1, min(n_figures, os.cpu_count() or 1))
+
+
+def write_report(
+    report_path: str,
+    title: str,
+    sections: list,
+    make_fig,
+    fig_kwargs: dict,
+    image_formats: list = None,
+    progress_bar=None,
+) -> Path:
+    """Makes every figure and writes them to one HTML report.
+
+    Args:
+        report_path: The path of the .html file to write.
+        title: The report title.
+        sections: A list of (heading, figures) tuples, where figures is a
+            list of (file name, keyword arguments of make_fig) tuples.
+        make_fig: The function that makes each figure.
+        fig_kwargs: Keyword arguments passed to make_fig for every figure.
+        image_formats: Image file formats to also save each figure as, in a
+            folder next to the report. Needs kaleido.
+        progress_bar: Optional stqdm/tqdm progress bar with total equal to
+            the number of figures, updated as each figure is written.
+
+    Returns:
+        The path of the report.
+    """
+
+    # plotly.offline imports IPython if it's installed, which is slow
+    from plotly.offline import get_plotlyjs
+
+    report_path = Path(report_path)
+    image_formats = image_formats or []
+    image_dir = Path(report_path.parent, f"{report_path.stem}_images")
+    if image_formats:
+        image_dir.mkdir(exist_ok=True)
+
+    tasks = [task for _, figures in sections for task in figures]
+    init_args = (make_fig, fig_kwargs, str(image_dir), image_formats)
+    n_workers = get_n_workers(len(tasks), image_formats)
+
+    with open(report_path, "w", encoding="utf-8") as report:
+        report.write(
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8' />\n"
+            f"<title>{html.escape(title)}</title>\n"
+            f"<script type='text/javascript'>{get_plotlyjs()}</script>\n"
+            f"</head>\n<body>\n<h1>{html.escape(title)}</h1>\n"
+        )
+
+        if n_workers == 1:
+            init_worker(*init_args)
+            fig_divs = map(render_figure, tasks)
+            executor = None
+        else:
+            # uses fresh processes, as forking the multithreaded Streamlit
+            # server isn't safe
+            executor = ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_worker,
+                initargs=init_args,
+            )
+            fig_divs = executor.map(render_figure, tasks)
+
+        try:
+            for heading, figures in sections:
+                report.write(f"<h2>{html.escape(heading)}</h2>\n")
+                for _ in figures:
+                    report.write(f"{next(fig_divs)}\n")
+                    report.flush()
+                    if progress_bar is not None:
+                        progress_bar.update(1)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        report.write("</body>\n</html>\n")
+
+    return report_path
+
+
+def export_dataset_report(
+    report_path: str,
+    plots_list: dict,
+    sig_odors: list,
+    measures: list,
+    summary_odors: list = None,
+    image_formats: list = None,
+    progress_bar=None,
+) -> Path:
+    """Exports the plots of every measurement for every odor of a compiled
+    acute or chronic dataset.
+
+    Args:
+        report_path: The path of the .html file to write.
+        plots_list: The plot settings made by set_up_plots().
+        sig_odors: The odors with significant responses.
+        measures: The measurements to plot.
+        summary_odors: The odors to plot as summary boxes instead of every
+            value.
+        image_formats: Image file formats to also save each figure as.
+        progress_bar: Optional stqdm/tqdm progress bar with total equal to
+            len(sig_odors) * len(measures).
+
+    Returns:
+        The path of the report.
+    """
+
+    # imported here so that worker processes only import it when needed
+    from src.processing import make_odor_measure_fig
+
+    summary_odors = summary_odors or []
+    sections = [
+        (
+            odor,
+            [
+                (
+                    f"{odor}_{measure}".replace(" ", "_").replace("/", "_"),
+                    {
+                        "odor": odor,
+                        "measure": measure,
+                        "summary": odor in summary_odors,
+                    },
+                )
+                for measure in measures
+            ],
+        )
+        for odor in sig_odors
+    ]
+
+    return write_report(
+        report_path,
+        f"{plots_list['dataset_type'].capitalize()} dataset plots",
+        sections,
+        make_odor_measure_fig,
+        plots_list,
+        image_formats,
+        progress_bar,
+    )
+
+
+def export_session_report(
+    report_path: str,
+    data: dict,
+    odors_to_plot: list,
+    title: str,
+    image_formats: list = None,
+    progress_bar=None,
+) -> Path:
+    """Exports the mean amplitude plot of every sample of one imaging
+    session.
+
+    Args:
+        report_path: The path of the .html file to write.
+        data: Dict with samples as keys and avg_means DataFrames as values,
+            made by load_avg_means().
+        odors_to_plot: List of odors to plot.
+        title: The report title, e.g. the session name.
+        image_formats: Image file formats to also save each figure as.
+        progress_bar: Optional stqdm/tqdm progress bar with total equal to
+            the number of samples.
+
+    Returns:
+        The path of the report.
+    """
+
+    from src.plotting import plot_avg_amps
+
+    sections = [
+        (
+            sample,
+            [
+                (
+                    sample.replace(" ", "_"),
+                    {
+                        "avg_means_df": avg_means_df,
+                        "odors_to_plot": list(odors_to_plot),
+                    },
+                )
+            ],
+        )
+        for sample, avg_means_df in data.items()
+    ]
+
+    return write_report(
+        report_path,
+        title,
+        sections,
+        plot_avg_amps,
+        {},
+        image_formats,
+        progress_bar,
+    )
@@ -0,0 +1,205 @@
+"""Contains the in-memory cache shared by every user session of the server,
+so that a workbook, compiled dataset or figure opened by several users is
+only parsed, compiled or made once and held in memory once.
+
+Values are keyed by hashes of the data they are made from, and must not be
+changed once cached. The least recently used values are evicted once the
+estimated size of the cache exceeds its limit, which can be set with the
+ROI_APP_SHARED_CACHE_MB environment variable. Setting it to 0 turns the
+cache off.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+DEFAULT_CACHE_MB = 1024
+
+
+def estimate_size(value, seen: set = None) -> int:
+    """Estimates the memory used by a value and everything it holds. Objects
+    held more than once are only counted once.
+
+    Args:
+        value: The value, e.g. a dict of DataFrames, a CompiledDataset or a
+            Plotly figure.
+        seen: The ids of the objects already counted.
+
+    Returns:
+        The estimated size in bytes.
+    """
+
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k, seen) + estimate_size(v, seen)
+            for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(
+            estimate_size(x, seen) for x in value
+        )
+    # Plotly figures and traces
+    if hasattr(value, "to_plotly_json"):
+        return estimate_size(value.to_plotly_json(), seen)
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + estimate_size(vars(value), seen)
+
+    return sys.getsizeof(value)
+
+
+class SharedCache(object):
+    """Stores values in memory, evicting the least recently used values once
+    their estimated size exceeds the limit. It's safe to use from several
+    threads, and a value requested by several users at once is only made
+    once.
+
+    Attributes:
+        max_bytes (int): The size limit of the cache.
+        n_bytes (int): The estimated size of the cached values.
+        hits (int): The number of values found in the cache.
+        misses (int): The number of values made because they weren't cached.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        """Initializes an instance of SharedCache().
+
+        Args:
+            max_bytes: The size limit of the cache. Defaults to
+                ROI_APP_SHARED_CACHE_MB or 1024 MB.
+        """
+
+        if max_bytes is None:
+            max_bytes = int(
+                float(
+                    os.environ.get("ROI_APP_SHARED_CACHE_MB", DEFAULT_CACHE_MB)
+                )
+                * 1024**2
+            )
+
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._entries
+
+    def get(self, key: tuple):
+        """Gets a cached value and marks it as recently used.
+
+        Args:
+            key: The cache key, starting with the kind of value, e.g.
+                ("avg_means", file checksum).
+
+        Returns:
+            The value, or None if it isn't cached.
+        """
+
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return self._entries[key][0]
+
+    def put(self, key: tuple, value):
+        """Caches a value, then evicts the least recently used values until
+        the cache is within its limit. Values larger than the limit aren't
+        cached.
+
+        Args:
+            key: The cache key.
+            value: The value to cache.
+        """
+
+        if self.max_bytes <= 0:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.n_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.n_bytes += size
+            while self.n_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.n_bytes -= evicted_size
+
+    def get_or_make(self, key: tuple, make_value, *args, **kwargs):
+        """Gets a cached value, or makes and caches it if it isn't cached.
+        Requests for the same key made while it's being made wait for it
+        instead of making it again.
+
+        Args:
+            key: The cache key.
+            make_value: The function that makes the value.
+            args: Positional arguments passed to make_value.
+            kwargs: Keyword arguments passed to make_value.
+
+        Returns:
+            The value.
+        """
+
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            value = self.get(key)
+            if value is None:
+                with self._lock:
+                    self.misses += 1
+                value = make_value(*args, **kwargs)
+                self.put(key, value)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+
+        return value
+
+    def clear(self):
+        """Removes all values from the cache."""
+
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+
+@st.cache_resource
+def get_shared_cache() -> SharedCache:
+    """Gets the cache shared by every user session of the server.
+
+    Returns:
+        The SharedCache.
+    """
+
+    return SharedCache()
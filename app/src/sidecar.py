@@ -0,0 +1,249 @@
+"""Contains functions for writing and reading binary Arrow sidecar files that
+hold the same data as a session's _analysis.xlsx and _avg_means.xlsx files.
+
+Each sidecar stores the SHA-256 checksum of the .xlsx file it was made from,
+and is only used in place of that .xlsx file if the checksum matches.
+"""
+
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pathlib import Path
+
+from src.excel_import import (
+    read_analysis_excel,
+    read_avg_means_excel,
+    encode_analysis_dict,
+    decode_analysis_payload,
+)
+
+SIDECAR_SUFFIX = ".arrow"
+
+
+def calc_checksum(file) -> str:
+    """Calculates the SHA-256 checksum of a file.
+
+    Args:
+        file: The path or uploaded file.
+
+    Returns:
+        The hex digest of the file contents.
+    """
+
+    if hasattr(file, "getvalue"):
+        return hashlib.sha256(file.getvalue()).hexdigest()
+
+    sha256 = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+
+    return sha256.hexdigest()
+
+
+def get_sidecar_name(xlsx_name: str) -> str:
+    """Gets the sidecar file name for an .xlsx file name.
+
+    Args:
+        xlsx_name: e.g. "YYMMDD--123456-7-8_ROIX_analysis.xlsx".
+
+    Returns:
+        e.g. "YYMMDD--123456-7-8_ROIX_analysis.arrow".
+    """
+
+    return f"{Path(xlsx_name).stem}{SIDECAR_SUFFIX}"
+
+
+def match_sidecars(files: list, sidecars: list) -> list:
+    """Pairs uploaded .xlsx files with their uploaded sidecar files by name.
+
+    Args:
+        files: A list of .xlsx files uploaded to Streamlit.
+        sidecars: A list of sidecar files uploaded to Streamlit.
+
+    Returns:
+        A list with the matching sidecar, or None, for each .xlsx file.
+    """
+
+    sidecars_by_name = {sidecar.name: sidecar for sidecar in sidecars or []}
+
+    return [sidecars_by_name.get(get_sidecar_name(x.name)) for x in files]
+
+
+def write_table(path: str, table: pa.Table, metadata: dict):
+    """Writes a table with JSON-encoded metadata as an Arrow IPC file.
+
+    Args:
+        path: The path of the file to write.
+        table: The table to write.
+        metadata: The metadata to store in the table schema.
+    """
+
+    table = table.replace_schema_metadata(
+        {key: json.dumps(value) for key, value in metadata.items()}
+    )
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_table(sidecar) -> tuple[pa.Table, dict]:
+    """Reads an Arrow IPC sidecar file, memory-mapping it if it's on disk.
+
+    Args:
+        sidecar: The path or uploaded file of the sidecar.
+
+    Returns:
+        The table and its decoded metadata.
+    """
+
+    if hasattr(sidecar, "getvalue"):
+        source = pa.BufferReader(sidecar.getvalue())
+    else:
+        source = pa.memory_map(str(sidecar), "r")
+
+    table = pa.ipc.open_file(source).read_all()
+    metadata = {
+        key.decode(): json.loads(value)
+        for key, value in (table.schema.metadata or {}).items()
+    }
+
+    return table, metadata
+
+
+def write_analysis_sidecar(xlsx_path: str):
+    """Writes the sidecar file for an _analysis.xlsx file.
+
+    Cell values are stored as the float64 values and int8 type codes from
+    encode_analysis_dict().
+
+    Args:
+        xlsx_path: The path of the _analysis.xlsx file.
+    """
+
+    payload = encode_analysis_dict(read_analysis_excel(xlsx_path))
+    if "sheets" in payload or payload["others"]:
+        # sheets that can't be stored as numbers stay in .xlsx only
+        return
+
+    table = pa.table({"values": payload["values"], "codes": payload["codes"]})
+    metadata = {
+        key: payload[key]
+        for key in ["sheet_names", "index", "index_name", "columns", "shape"]
+    }
+    metadata["checksum"] = calc_checksum(xlsx_path)
+
+    write_table(Path(xlsx_path).with_suffix(SIDECAR_SUFFIX), table, metadata)
+
+
+def write_avg_means_sidecar(xlsx_path: str):
+    """Writes the sidecar file for an _avg_means.xlsx file.
+
+    All sheets are stored in one table, with a "sheet" column holding the
+    sheet each row came from.
+
+    Args:
+        xlsx_path: The path of the _avg_means.xlsx file.
+    """
+
+    avg_means_dict = read_avg_means_excel(xlsx_path)
+    columns = next(iter(avg_means_dict.values())).columns.tolist()
+
+    avg_means_df = pd.concat(avg_means_dict, names=["sheet", None])
+    avg_means_df.columns = [str(x) for x in columns]
+    avg_means_df = avg_means_df.reset_index(level="sheet")
+    avg_means_df["sheet"] = avg_means_df["sheet"].astype("category")
+
+    table = pa.Table.from_pandas(avg_means_df, preserve_index=False)
+    metadata = {
+        "sheet_names": list(avg_means_dict.keys()),
+        "columns": columns,
+        "checksum": calc_checksum(xlsx_path),
+    }
+
+    write_table(Path(xlsx_path).with_suffix(SIDECAR_SUFFIX), table, metadata)
+
+
+def check_sidecar(metadata: dict, xlsx_file) -> bool:
+    """Checks that a sidecar was made from the given .xlsx file.
+
+    Args:
+        metadata: The decoded metadata of the sidecar.
+        xlsx_file: The path or uploaded file of the .xlsx file.
+
+    Returns:
+        True if the checksums match.
+    """
+
+    return metadata.get("checksum") == calc_checksum(xlsx_file)
+
+
+def read_analysis_sidecar(sidecar, xlsx_file, rows: list = None) -> dict:
+    """Reads the analysis values from a sidecar file.
+
+    Args:
+        sidecar: The path or uploaded file of the sidecar.
+        xlsx_file: The path or uploaded file of the matching _analysis.xlsx.
+        rows: The measurements (rows) to keep. Keeps all rows by default.
+
+    Returns:
+        The same dictionary as read_analysis_excel(), or None if the sidecar
+        can't be read or doesn't match the .xlsx file.
+    """
+
+    try:
+        table, metadata = read_table(sidecar)
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return None
+
+    if not check_sidecar(metadata, xlsx_file):
+        return None
+
+    payload = dict(metadata)
+    payload["values"] = table.column("values").to_numpy()
+    payload["codes"] = table.column("codes").to_numpy().astype(np.int8)
+    payload["shape"] = tuple(metadata["shape"])
+    payload["others"] = {}
+
+    data_dict = decode_analysis_payload(payload)
+    if rows is not None:
+        data_dict = {
+            sheet_name: sheet_df[sheet_df.index.isin(rows)]
+            for sheet_name, sheet_df in data_dict.items()
+        }
+
+    return data_dict
+
+
+def read_avg_means_sidecar(sidecar, xlsx_file) -> dict:
+    """Reads the average means from a sidecar file.
+
+    Args:
+        sidecar: The path or uploaded file of the sidecar.
+        xlsx_file: The path or uploaded file of the matching _avg_means.xlsx.
+
+    Returns:
+        The same dictionary as read_avg_means_excel(), or None if the sidecar
+        can't be read or doesn't match the .xlsx file.
+    """
+
+    try:
+        table, metadata = read_table(sidecar)
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return None
+
+    if not check_sidecar(metadata, xlsx_file):
+        return None
+
+    avg_means_df = table.to_pandas()
+    avg_means_dict = {}
+    for sheet_name, sheet_df in avg_means_df.groupby(
+        "sheet", sort=False, observed=True
+    ):
+        sheet_df = sheet_df.drop(columns="sheet").reset_index(drop=True)
+        sheet_df.columns = metadata["columns"]
+        avg_means_dict[sheet_name] = sheet_df
+
+    return {x: avg_means_dict[x] for x in metadata["sheet_names"]}
@@ -1,13 +1,11 @@
 """Contains helper utilities for processing experiment folders and data saving.
 """
 
+from copy import copy
 from pathlib import Path
 import pandas as pd
 import os
-import openpyxl
 import streamlit as st
-import tkinter as tk
-from tkinter.filedialog import askdirectory
 
 
 import pdb
@@ -97,36 +95,91 @@ def save_to_excel(
     format_workbook(xlsx_path, animal_id, add_label)
 
 
-def format_workbook(xlsx_path, animal_id=None, add_label=False):
-    """Adds borders to Excel spreadsheets.
+def save_sheets_to_excel(
+    dir_path,
+    xlsx_fname,
+    sheet_dfs,
+    animal_id=None,
+    add_label=False,
+):
+    """Saves measurement dfs as one sheet per measurement type into a new
+    Excel file, opening and writing the file only once.
+
+    Each sheet is formatted as it is written, instead of reloading the file
+    with format_workbook() after every sheet. By default, to_excel sets NaN
+    values to "" using na_rep="".
 
     Args:
-        xlsx_path (str): Path to the Excel file to be formatted.
+        dir_path (str): A path to directory to save file.
+        xlsx_fname (str): The name of the xlsx file to save dfs to.
+        sheet_dfs (dict): The dfs to save, with sheet names as keys.
+        animal_id (str): The animal id to use for file name formating.
+        add_label (bool): If True add label to each sheet (default False).
+    """
+
+    xlsx_path = Path(dir_path, xlsx_fname)
+    with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
+        for sheetname, df in sheet_dfs.items():
+            df.to_excel(writer, sheetname)
+            format_sheet(writer.sheets[sheetname], animal_id, add_label)
+
+
+def format_sheet(sheet, animal_id=None, add_label=False):
+    """Adds borders to one Excel worksheet.
+
+    Args:
+        sheet (openpyxl.worksheet.worksheet.Worksheet): The sheet to format.
         animal_id (str): ID of the animal to be used in the format.
         add_label (bool): If True adds label to A1 cell.
     """
 
-    wb = openpyxl.load_workbook(xlsx_path)
+    from openpyxl.styles import Border, PatternFill, Side
 
     # Initialize formatting styles
-    no_fill = openpyxl.styles.PatternFill(fill_type=None)
-    side = openpyxl.styles.Side(border_style="thin")
-    border = openpyxl.styles.borders.Border(
+    no_fill = PatternFill(fill_type=None)
+    side = Side(border_style="thin")
+    border = Border(
         left=side,
         right=side,
         top=side,
         bottom=side,
     )
 
-    # Loop through all cells in all worksheets
-    for sheet in wb.worksheets:
-        if add_label:
-            sheet["A1"] = animal_id
-        for row in sheet:
-            for cell in row:
+    if add_label:
+        sheet["A1"] = animal_id
+
+    # Setting a style looks it up in the workbook's style lists, so each
+    # distinct starting style is only restyled once and then copied
+    new_styles = {}
+    for row in sheet:
+        for cell in row:
+            # merged cells have no style until one is set
+            old_style = tuple(cell._style) if cell._style else None
+            if old_style in new_styles:
+                cell._style = copy(new_styles[old_style])
+            else:
                 # Apply colorless and borderless styles
                 cell.fill = no_fill
                 cell.border = border
+                new_styles[old_style] = copy(cell._style)
+
+
+def format_workbook(xlsx_path, animal_id=None, add_label=False):
+    """Adds borders to Excel spreadsheets.
+
+    Args:
+        xlsx_path (str): Path to the Excel file to be formatted.
+        animal_id (str): ID of the animal to be used in the format.
+        add_label (bool): If True adds label to A1 cell.
+    """
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(xlsx_path)
+
+    # Loop through all cells in all worksheets
+    for sheet in wb.worksheets:
+        format_sheet(sheet, animal_id, add_label)
 
     # Save workbook
     wb.save(xlsx_path)
@@ -192,12 +245,16 @@ def make_pick_folder_button() -> bool:
 
 
 def pop_folder_selector() -> str:
-    """Pops up a dialog to select a folder.
+    """Pops up a dialog to select a folder. Tk is only imported and started
+    here, so the app runs without a display until a folder is picked.
 
     Returns:
         The path to the selected folder
     """
 
+    import tkinter as tk
+    from tkinter.filedialog import askdirectory
+
     # Set up tkinter
     root = tk.Tk()
     root.withdraw()